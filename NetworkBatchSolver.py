@@ -0,0 +1,508 @@
+# Standard libs
+from time import perf_counter
+from typing import Any
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkComponents import Link
+from NetworkComponents import Node
+from NetworkComponents import TimeBlock
+
+from NetworkHelpers import TimeBlockTypes
+
+from NetworkPathComputer import NetworkPathComputer
+
+from NetworkTopology import Topology
+
+import NetworkTracing
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class HopTimes:
+    def __init__(self, arrivalTimes: np.ndarray, queueStopTimes: np.ndarray,
+            processingStopTimes: np.ndarray,
+            transmissionStopTimes: np.ndarray,
+            propagationStopTimes: np.ndarray):
+        """ Start/stop times of every packet at a single hop.
+
+        All arrays share the same shape, with packets along the last axis.
+        The stop time of each delay is the start time of the next one, i.e.
+
+        arrival -> queue stop -> processing stop -> transmission stop
+            -> propagation stop (arrival at the next node)
+        """
+        self.__arrivalTimes = arrivalTimes
+        self.__queueStopTimes = queueStopTimes
+        self.__processingStopTimes = processingStopTimes
+        self.__transmissionStopTimes = transmissionStopTimes
+        self.__propagationStopTimes = propagationStopTimes
+
+    def get_arrival_times(self):
+        return self.__arrivalTimes
+
+    def get_queue_stop_times(self):
+        return self.__queueStopTimes
+
+    def get_processing_stop_times(self):
+        return self.__processingStopTimes
+
+    def get_transmission_stop_times(self):
+        return self.__transmissionStopTimes
+
+    def get_propagation_stop_times(self):
+        return self.__propagationStopTimes
+
+class BatchPathResult:
+    def __init__(self, nodeNames: List[str], injectionTimes: np.ndarray,
+            hopTimesList: List[HopTimes],
+            destinationName: Optional[str] = None):
+        """ Every per-hop time of a packet train sent along a path.
+
+        The time arrays are shaped (..., packets, hops), where hop `i` is the
+            step from `nodeNames[i]` to the next node on the path (for a
+            circuit switched segment, the whole segment is a single hop). The
+            last hop goes to `destinationName`.
+        """
+        self.__nodeNames = nodeNames
+        self.__destinationName = destinationName
+        self.__injectionTimes = injectionTimes
+
+        self.__arrivalTimes = np.stack(
+                [h.get_arrival_times() for h in hopTimesList], axis=-1)
+        self.__queueStopTimes = np.stack(
+                [h.get_queue_stop_times() for h in hopTimesList], axis=-1)
+        self.__processingStopTimes = np.stack(
+                [h.get_processing_stop_times() for h in hopTimesList], axis=-1)
+        self.__transmissionStopTimes = np.stack(
+                [h.get_transmission_stop_times() for h in hopTimesList],
+                axis=-1)
+        self.__propagationStopTimes = np.stack(
+                [h.get_propagation_stop_times() for h in hopTimesList],
+                axis=-1)
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_node_names(self):
+        """ Names of the nodes each hop starts from. """
+        return self.__nodeNames
+
+    def get_next_node_names(self):
+        """ Names of the nodes each hop goes to (the last one is None if the
+                destination isn't known). """
+        return self.__nodeNames[1:] + [self.__destinationName]
+
+    def get_num_hops(self):
+        return len(self.__nodeNames)
+
+    def get_num_packets(self):
+        return self.__arrivalTimes.shape[-2]
+
+    def get_injection_times(self):
+        return self.__injectionTimes
+
+    def get_arrival_times(self):
+        """ Time each packet arrived at the node of each hop (queue start). """
+        return self.__arrivalTimes
+
+    def get_queue_stop_times(self):
+        """ Queue stop / processing start times. """
+        return self.__queueStopTimes
+
+    def get_processing_stop_times(self):
+        """ Processing stop / transmission start times. """
+        return self.__processingStopTimes
+
+    def get_transmission_stop_times(self):
+        """ Transmission stop / propagation start times. """
+        return self.__transmissionStopTimes
+
+    def get_propagation_stop_times(self):
+        """ Propagation stop times (i.e. arrival at the next node). """
+        return self.__propagationStopTimes
+
+    def get_queuing_delays(self):
+        return self.__queueStopTimes - self.__arrivalTimes
+
+    def get_delivery_times(self):
+        """ Time each packet arrived at the final node of the path. """
+        return self.__propagationStopTimes[..., -1]
+
+    def get_end_to_end_delays(self):
+        """ Delivery time minus injection time for each packet. """
+        return self.get_delivery_times() - self.__injectionTimes
+
+    def get_last_transmission_stops(self):
+        """ The transmission stop time of the last packet at each hop.
+
+        Pass this as `lastTransmissionStops` to continue the same packet
+            train in a later call (e.g. when solving it in chunks).
+        """
+        return self.__transmissionStopTimes[..., -1, :]
+
+    def get_time_blocks(self, packetNum: int, hop: int):
+        """ Returns the time blocks of a single packet at a single hop.
+
+        The list has the same layout as the one returned by
+            `NetworkPathComputer.compute_path_step` (i.e. the queue block is
+            only present if the packet actually had to wait).
+        """
+        t0 = float(self.__arrivalTimes[..., packetNum, hop])
+        t1 = float(self.__queueStopTimes[..., packetNum, hop])
+        t2 = float(self.__processingStopTimes[..., packetNum, hop])
+        t3 = float(self.__transmissionStopTimes[..., packetNum, hop])
+        t4 = float(self.__propagationStopTimes[..., packetNum, hop])
+
+        blocks: List[TimeBlock] = []
+        if t1 > t0:
+            blocks.append(TimeBlock(TimeBlockTypes.QUEUING_DELAY, t0, t1))
+        blocks.append(TimeBlock(TimeBlockTypes.PROCESSING_DELAY, t1, t2))
+        blocks.append(TimeBlock(TimeBlockTypes.TRANSMISSION_DELAY, t2, t3))
+        blocks.append(TimeBlock(TimeBlockTypes.PROPAGATION_DELAY, t3, t4))
+        return blocks
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class NetworkBatchSolver:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def solve_hop(arrivalTimes: np.ndarray, packetSizes: np.ndarray,
+            processingDelay: float, link: Link,
+            lastTransmissionStop: Optional[np.ndarray] = None,
+            transmissionRates: Optional[np.ndarray] = None):
+        """ Computes the times of a whole packet train at a single hop.
+
+        Uses the same store-and-forward model as `compute_path_step`: a packet
+            can't start processing until the previous packet has finished
+            transmitting, so
+
+            depart[k] = max(arrival[k], depart[k - 1]) + service[k]
+
+            where service = processing delay + transmission delay. Rather than
+            looping over the packets, this is solved in closed form,
+
+            depart[k] = C[k] + max(arrival[j] - C[j - 1] for j <= k)
+
+            where C is the running sum of the service times.
+
+        ARGS:
+        - arrivalTimes: Arrival time of each packet at the node (packets on
+                the last axis, in queue order).
+        - packetSizes: The size of each packet in bits (broadcastable to
+                `arrivalTimes`).
+        - processingDelay: The processing delay of the node (seconds), or an
+                array of them (broadcastable to `arrivalTimes`).
+        - link: The link the packets are transmitted over.
+        - lastTransmissionStop: Transmission stop time of the packet ahead of
+                the train (if any), e.g. from a previous chunk.
+        - transmissionRates: Rates to transmit at instead of the link's own
+                (bits / second, broadcastable to `arrivalTimes`).
+
+        RETURNS:
+        - A `HopTimes` object.
+        """
+        t0 = np.asarray(arrivalTimes, dtype=np.float64)
+        if t0.shape[-1] == 0:
+            # An empty train, there's nothing to solve
+            return HopTimes(t0, t0.copy(), t0.copy(), t0.copy(), t0.copy())
+
+        packetSizes = np.asarray(packetSizes, dtype=np.float64)
+        if transmissionRates is None:
+            transmissionDelays = link.get_transmission_delay(packetSizes)
+        else:
+            transmissionDelays = packetSizes/transmissionRates
+        transmissionDelays = np.broadcast_to(transmissionDelays, t0.shape)
+
+        if lastTransmissionStop is None:
+            lastTransmissionStop = np.full(t0.shape[:-1], -np.inf)
+        else:
+            lastTransmissionStop = np.asarray(lastTransmissionStop,
+                    dtype=np.float64)
+
+        previousStops = NetworkBatchSolver.__get_previous_stops(t0,
+                processingDelay + transmissionDelays, lastTransmissionStop)
+
+        # Same arithmetic as `compute_path_step` from here on
+        queuingDelays = np.where(previousStops > t0, previousStops - t0, 0.0)
+        t1 = t0 + queuingDelays
+        t2 = t1 + processingDelay
+        t3 = t2 + transmissionDelays
+        t4 = t3 + link.get_propagation_delay()
+
+        return HopTimes(t0, t1, t2, t3, t4)
+
+    @staticmethod
+    def solve_circuit(arrivalTimes: np.ndarray, packetSizes: np.ndarray,
+            nodesList: List[Node], linksList: List[Link],
+            lastTransmissionStop: Optional[np.ndarray] = None):
+        """ Computes the times of a whole packet train sent over a circuit.
+
+        A circuit switched segment is solved as a single hop, in closed form:
+
+        - The circuit is set up when the first packet reaches the segment,
+            taking the sum of the nodes' circuit setup delays. Packets that
+            arrive before it's up wait for it (this shows as queuing).
+        - The packets then stream through at the circuit's rate (the lowest
+            reserved rate of the segment's links), one after the other,
+            without being processed or stored at the nodes along the way.
+        - Each packet reaches the end of the segment after the propagation
+            delays of all its links.
+
+        ARGS:
+        - arrivalTimes: Arrival time of each packet at the first node of the
+                segment (packets on the last axis, in queue order).
+        - packetSizes: The size of each packet in bits.
+        - nodesList: The circuit switched nodes of the segment.
+        - linksList: The links between them (and to the node the segment
+                ends at).
+        - lastTransmissionStop: Transmission stop time of the packet ahead of
+                the train. If given, the circuit is already set up.
+
+        RETURNS:
+        - A `HopTimes` object.
+        """
+        t0 = np.asarray(arrivalTimes, dtype=np.float64)
+        if t0.shape[-1] == 0:
+            # An empty train, there's nothing to solve
+            return HopTimes(t0, t0.copy(), t0.copy(), t0.copy(), t0.copy())
+
+        circuitRate = min(link.get_reserved_rate() for link in linksList)
+        transmissionDelays = np.broadcast_to(
+                np.asarray(packetSizes, dtype=np.float64)/circuitRate,
+                t0.shape)
+
+        if lastTransmissionStop is None:
+            setupDelay = sum(node.get_circuit_setup_delay()
+                    for node in nodesList)
+            lastTransmissionStop = t0[..., 0] + setupDelay
+        else:
+            lastTransmissionStop = np.asarray(lastTransmissionStop,
+                    dtype=np.float64)
+
+        previousStops = NetworkBatchSolver.__get_previous_stops(t0,
+                transmissionDelays, lastTransmissionStop)
+
+        queuingDelays = np.where(previousStops > t0, previousStops - t0, 0.0)
+        t1 = t0 + queuingDelays
+        t3 = t1 + transmissionDelays
+        t4 = t3 + sum(link.get_propagation_delay() for link in linksList)
+
+        return HopTimes(t0, t1, t1, t3, t4)
+
+    @staticmethod
+    def solve_path(path: List[Node], packetSizes: np.ndarray,
+            injectionTimes: Optional[np.ndarray] = None,
+            lastTransmissionStops: Optional[Sequence[np.ndarray]] = None,
+            topology: Optional[Topology] = None,
+            hopCache: Optional[Any] = None):
+        """ Computes every per-hop time of a packet train sent along a path.
+
+        This is the batch equivalent of repeatedly calling
+            `compute_path_step` for every packet and every hop. Unlike the
+            per-packet code, the node queues and `Packet` objects are left
+            untouched.
+
+        The results match the per-packet code up to floating point rounding,
+            and that difference grows with the length of a busy period (a run
+            of packets queued back to back). Both round at the magnitude of
+            the absolute times, so after n back-to-back packets ending at
+            time t (seconds) they can differ by up to about n x 2.2e-16 x t:
+            identical to the printed precision for the 7 packet example,
+            but 0.4us apart after 1M back-to-back packets ending at t = 6e4
+            s. Most of this is the per-packet code's own error (it rounds
+            twice per packet, this once): against an extended precision
+            reference, the batch times were about 200x closer.
+
+        Consecutive circuit switched nodes form a segment that is solved as
+            a single hop (see `solve_circuit`), so the result has one hop per
+            packet switched node plus one per circuit segment.
+
+        ARGS:
+        - path: The nodes the packets travel through (first is the source,
+                last is the destination).
+        - packetSizes: The size of each packet in bits.
+        - injectionTimes: Time each packet is placed in the source node's
+                queue (defaults to 0 for every packet).
+        - lastTransmissionStops: Per hop (or circuit) transmission stop time
+                of the packet ahead of the train (see
+                `BatchPathResult.get_last_transmission_stops`).
+        - topology: The topology containing the path (optional, used to look
+                up the links between the nodes).
+        - hopCache: A `NetworkHopCache.HopCache` to reuse the times of hops
+                already solved for the same arrivals (optional).
+
+        RETURNS:
+        - A `BatchPathResult` object.
+
+        RAISES:
+        - Exception if the path has fewer than 2 nodes.
+        """
+        NetworkPathComputer.check_path_length(path)
+
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            startTime = perf_counter()
+
+        packetSizes = np.asarray(packetSizes, dtype=np.float64)
+
+        if injectionTimes is None:
+            injectionTimes = np.zeros(packetSizes.shape)
+        else:
+            injectionTimes = np.asarray(injectionTimes, dtype=np.float64)
+
+        arrivalTimes = np.broadcast_to(injectionTimes,
+                np.broadcast_shapes(injectionTimes.shape, packetSizes.shape))
+
+        hopTimesList: List[HopTimes] = []
+        hopKey = None
+        segmentsList = NetworkBatchSolver.get_segments(path, topology)
+        for i, (start, end, linksList) in enumerate(segmentsList):
+            lastStop = None
+            if lastTransmissionStops is not None:
+                lastStop = np.asarray(lastTransmissionStops)[..., i]
+
+            if hopCache is None:
+                hopTimes = NetworkBatchSolver.solve_segment(
+                        arrivalTimes=arrivalTimes,
+                        packetSizes=packetSizes,
+                        nodesList=path[start:end],
+                        linksList=linksList,
+                        lastTransmissionStop=lastStop)
+            else:
+                # Only the first hop hashes the arrays, later hops are keyed
+                # from the hop before them
+                hopTimes, hopKey = hopCache.solve_keyed_segment(
+                        arrivalTimes=arrivalTimes,
+                        packetSizes=packetSizes,
+                        nodesList=path[start:end],
+                        linksList=linksList,
+                        lastTransmissionStop=lastStop,
+                        previousKey=hopKey)
+
+            hopTimesList.append(hopTimes)
+            arrivalTimes = hopTimes.get_propagation_stop_times()
+
+        result = BatchPathResult(
+                nodeNames=[path[start].get_name()
+                        for start, _, _ in segmentsList],
+                injectionTimes=np.broadcast_to(injectionTimes,
+                        arrivalTimes.shape),
+                hopTimesList=hopTimesList,
+                destinationName=path[-1].get_name())
+
+        # Per-hop hooks would mean a Python call per packet, so batches only
+        # update the counters and timers
+        if tracer is not None:
+            tracer.count("packets", arrivalTimes.size)
+            tracer.count("hops", arrivalTimes.size*len(hopTimesList))
+            tracer.count("queue_events", int(np.count_nonzero(
+                    result.get_queuing_delays() > 0)))
+            tracer.add_time("solve_path", perf_counter() - startTime)
+
+        return result
+
+    @staticmethod
+    def get_segments(path: List[Node], topology: Optional[Topology] = None):
+        """ Splits a path into the hops `solve_path` solves one at a time.
+
+        Each packet switched node starts a hop of its own, while consecutive
+            circuit switched nodes form a single hop (their circuit), which
+            runs up to the next packet switched node or the destination.
+
+        RETURNS:
+        - A list of (start, end, links) tuples, where the hop goes from
+                `path[start]` to `path[end]` over `links`.
+        """
+        segmentsList: List[Tuple[int, int, List[Link]]] = []
+        start = 0
+        while start < len(path) - 1:
+            end = start + 1
+            if path[start].is_circuit_switched():
+                while end < len(path) - 1 and path[end].is_circuit_switched():
+                    end += 1
+
+            segmentsList.append((start, end,
+                    [NetworkPathComputer.find_link(path[j], path[j + 1],
+                            topology) for j in range(start, end)]))
+            start = end
+
+        return segmentsList
+
+    @staticmethod
+    def solve_segment(arrivalTimes: np.ndarray, packetSizes: np.ndarray,
+            nodesList: List[Node], linksList: List[Link],
+            lastTransmissionStop: Optional[np.ndarray] = None):
+        """ Solves a single hop made by `get_segments` (with `solve_hop` or
+                `solve_circuit`, depending on the switching mode). """
+        if nodesList[0].is_circuit_switched():
+            return NetworkBatchSolver.solve_circuit(
+                    arrivalTimes=arrivalTimes,
+                    packetSizes=packetSizes,
+                    nodesList=nodesList,
+                    linksList=linksList,
+                    lastTransmissionStop=lastTransmissionStop)
+
+        return NetworkBatchSolver.solve_hop(
+                arrivalTimes=arrivalTimes,
+                packetSizes=packetSizes,
+                processingDelay=nodesList[0].get_processing_delay(),
+                link=linksList[0],
+                lastTransmissionStop=lastTransmissionStop)
+
+    @staticmethod
+    def solve_batches(path: List[Node],
+            batches: Iterable[Tuple[np.ndarray, np.ndarray]],
+            topology: Optional[Topology] = None):
+        """ Lazily solves a stream of packet batches sent along a path.
+
+        Each batch continues the queues left by the previous one (through
+            `lastTransmissionStops`), so the results are the same as solving
+            the whole train at once, but only one batch is ever in memory.
+
+        ARGS:
+        - path: The nodes the packets travel through.
+        - batches: (injection times, packet sizes) pairs, in queue order
+                (e.g. a generator from `NetworkTrafficGenerators.py`).
+        - topology: The topology containing the path (optional).
+
+        RETURNS:
+        - A generator of `BatchPathResult` objects, one per batch.
+        """
+        lastTransmissionStops = None
+        for injectionTimes, packetSizes in batches:
+            result = NetworkBatchSolver.solve_path(path=path,
+                    packetSizes=packetSizes, injectionTimes=injectionTimes,
+                    lastTransmissionStops=lastTransmissionStops,
+                    topology=topology)
+
+            # An empty batch leaves the queues as they were
+            if result.get_num_packets() > 0:
+                lastTransmissionStops = result.get_last_transmission_stops()
+            yield result
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    @staticmethod
+    def __get_previous_stops(t0: np.ndarray, serviceTimes: np.ndarray,
+            lastTransmissionStop: np.ndarray):
+        """ Returns the transmission stop time of the packet ahead of each
+                packet in a FIFO queue (see `solve_hop` for the closed form).
+        """
+        serviceSums = np.cumsum(serviceTimes, axis=-1)
+        earliestStarts = t0 - (serviceSums - serviceTimes)
+        earliestStarts[..., 0] = np.maximum(earliestStarts[..., 0],
+                lastTransmissionStop)
+        departures = serviceSums + np.maximum.accumulate(earliestStarts,
+                axis=-1)
+
+        return np.concatenate(
+                (lastTransmissionStop[..., np.newaxis], departures[..., :-1]),
+                axis=-1)
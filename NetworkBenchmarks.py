@@ -0,0 +1,363 @@
+# Standard libs
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkComponents import Link
+from NetworkComponents import Node
+from NetworkComponents import Packet
+
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkEventSimulator import EventSimulator
+from NetworkEventSimulator import Flow
+
+from NetworkPathComputer import NetworkPathComputer
+
+from NetworkRouter import Router
+
+from NetworkTimeBlockRecorder import TimeBlockRecorder
+
+from NetworkTimeblockVisualiser import TimeblockVisualiser
+
+from NetworkTopology import Topology
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Version of the results file layout
+RESULTS_FORMAT_VERSION = 1
+
+# Relative change (in packets/sec or peak memory) reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+# * HELPERS --------------------------------------------------------------------
+
+def build_chain(pathLength: int, degree: int = 2):
+    """ Builds a chain of `pathLength` nodes for the benchmarks.
+
+    Every node gets extra (unconnected) links until it has `degree` links, to
+        see how node degree affects the link lookups.
+
+    RETURNS:
+    - (topology, path)
+    """
+    chainLinks = [Link(transmissionRate=100e6, length=1000, propSpeed=2e8,
+                    name="L{}".format(i))
+            for i in range(0, pathLength - 1)]
+
+    path: List[Node] = []
+    for i in range(0, pathLength):
+        links = []
+        if i > 0:
+            links.append(chainLinks[i - 1])
+        if i < pathLength - 1:
+            links.append(chainLinks[i])
+        while len(links) < degree:
+            links.insert(0, Link(transmissionRate=100e6, length=1000,
+                    propSpeed=2e8))
+        path.append(Node(processingDelay=1e-4, name="N{}".format(i),
+                links=links))
+
+    return Topology(path), path
+
+def build_mesh(numNodes: int, degree: int, seed: int = 0):
+    """ Builds a random connected topology of `numNodes` nodes where each
+            node links to about `degree` others. """
+    rng = np.random.default_rng(seed)
+    linksOf: List[List[Link]] = [[] for _ in range(0, numNodes)]
+
+    def connect(i: int, j: int):
+        link = Link(transmissionRate=float(rng.uniform(1e6, 1e9)),
+                length=float(rng.uniform(10, 1e6)), propSpeed=2e8)
+        linksOf[i].append(link)
+        linksOf[j].append(link)
+
+    # A ring keeps it connected, the rest are random chords
+    for i in range(0, numNodes):
+        connect(i, (i + 1) % numNodes)
+    for _ in range(0, numNodes*max(0, degree - 2)//2):
+        i, j = rng.integers(0, numNodes, 2)
+        if i != j:
+            connect(int(i), int(j))
+
+    return Topology([Node(processingDelay=1e-4, name="N{}".format(i),
+            links=linksOf[i]) for i in range(0, numNodes)])
+
+# * BENCHMARKS -----------------------------------------------------------------
+
+# Each benchmark takes its parameters and returns the number of packets (or
+# items) it processed
+
+def bench_queueing_example():
+    """ The original `GlobalNetwork.queueing_example` (without plotting). """
+    from main import GlobalNetwork
+    with contextlib.redirect_stdout(io.StringIO()):
+        GlobalNetwork().queueing_example(plot=False)
+    return 7
+
+def bench_path_computer(numPackets: int, pathLength: int, degree: int,
+        useTopology: bool):
+    """ `compute_path_step` for every packet and hop, like
+            `queueing_example` does. """
+    topology, path = build_chain(pathLength, degree)
+    if not useTopology:
+        topology = None
+
+    for _ in range(0, numPackets):
+        path[0].add_packet_to_queue(Packet(packetSize=8000))
+
+    previousBlocksSteps: List[List[Any]] = [[] for _ in path]
+    for _ in range(0, numPackets):
+        t0 = 0.0
+        for i in range(0, len(path) - 1):
+            blocks = NetworkPathComputer.compute_path_step(
+                    currentNode=path[i], nextNode=path[i + 1], t0=t0,
+                    previousBlocksList=previousBlocksSteps[i],
+                    topology=topology)
+            previousBlocksSteps[i] = blocks
+            t0 = blocks[-1].get_stop_time()
+    path[-1].clear_queue()
+    return numPackets
+
+def bench_node_queue(numPackets: int):
+    """ Filling and draining a node's queue. """
+    node = Node(processingDelay=0, name="Q", links=[])
+    for _ in range(0, numPackets):
+        node.add_packet_to_queue(Packet(packetSize=8000))
+    while len(node.get_packets()) > 0:
+        node.get_next_packet()
+    return numPackets
+
+def bench_batch_solver(numPackets: int, pathLength: int):
+    topology, path = build_chain(pathLength)
+    NetworkBatchSolver.solve_path(path=path,
+            packetSizes=np.full(numPackets, 8000.0), topology=topology)
+    return numPackets
+
+def bench_event_simulator(numPackets: int, pathLength: int, numFlows: int):
+    """ Several flows sharing a chain (all but the first join one hop in). """
+    topology, path = build_chain(pathLength)
+    sim = EventSimulator(topology)
+    for i in range(0, numFlows):
+        flowPath = path if i == 0 else path[1:]
+        sim.add_flow(Flow(name="F{}".format(i), path=flowPath,
+                packetSizes=np.full(numPackets//numFlows, 8000.0),
+                injectionTimes=np.arange(0, numPackets//numFlows)*1e-4))
+    sim.run()
+    return numPackets
+
+def bench_topology(numNodes: int, degree: int):
+    """ Building a topology's link index and a routing table from it. """
+    topology = build_mesh(numNodes, degree)
+    nodesList = topology.get_nodes()
+    for node in nodesList:
+        topology.get_neighbours(node)
+    Router(topology).get_routing_table(nodesList[0], 8000)
+    return numNodes
+
+def bench_render(numPackets: int, pathLength: int):
+    """ Headless render of the time blocks to a png. """
+    _, path = build_chain(pathLength)
+    recorder = TimeBlockRecorder()
+    recorder.record_batch_result(NetworkBatchSolver.solve_path(path=path,
+            packetSizes=np.full(numPackets, 8000.0)))
+
+    with tempfile.TemporaryDirectory() as tempDir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            TimeblockVisualiser(nodesList=path, recorder=recorder)\
+                    .visualise_timeblock(
+                            outputPath=os.path.join(tempDir, "render.png"))
+    return numPackets
+
+def get_cases(quick: bool = False):
+    """ Returns the list of (name, function, parameters) cases to run. """
+    scale = 10 if quick else 1
+    casesList: List[Tuple[str, Callable[..., int], Dict[str, Any]]] = [
+        ("queueing_example", bench_queueing_example, {})
+    ]
+
+    for numPackets in (1000//scale, 10000//scale):
+        for pathLength in (5, 10):
+            casesList.append(("path_computer", bench_path_computer,
+                    {"numPackets": numPackets, "pathLength": pathLength,
+                            "degree": 2, "useTopology": True}))
+    for degree in (2, 16, 64):
+        for useTopology in (False, True):
+            casesList.append(("path_computer", bench_path_computer,
+                    {"numPackets": 2000//scale, "pathLength": 5,
+                            "degree": degree, "useTopology": useTopology}))
+
+    casesList.append(("node_queue", bench_node_queue,
+            {"numPackets": 1000000//scale}))
+
+    for numPackets in (100000//scale, 1000000//scale):
+        for pathLength in (5, 20):
+            casesList.append(("batch_solver", bench_batch_solver,
+                    {"numPackets": numPackets, "pathLength": pathLength}))
+
+    for numFlows in (1, 4):
+        casesList.append(("event_simulator", bench_event_simulator,
+                {"numPackets": 100000//scale, "pathLength": 5,
+                        "numFlows": numFlows}))
+
+    for numNodes in (1000//scale, 10000//scale, 100000//scale):
+        casesList.append(("topology", bench_topology,
+                {"numNodes": numNodes, "degree": 4}))
+
+    for numPackets in (100, 100000//scale):
+        casesList.append(("render", bench_render,
+                {"numPackets": numPackets, "pathLength": 5}))
+
+    return casesList
+
+# * RUNNER ---------------------------------------------------------------------
+
+def run_case(function: Callable[..., int], parameters: Dict[str, Any],
+        repeats: int):
+    """ Runs a benchmark case.
+
+    The time is the best of `repeats` runs. Peak memory is measured in a
+        separate run with tracemalloc on (it slows things down, so it isn't
+        timed).
+    """
+    bestSeconds = float("inf")
+    numItems = 0
+    for _ in range(0, repeats):
+        startTime = time.perf_counter()
+        numItems = function(**parameters)
+        bestSeconds = min(bestSeconds, time.perf_counter() - startTime)
+
+    tracemalloc.start()
+    try:
+        function(**parameters)
+        _, peakMemory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": bestSeconds,
+        "items": numItems,
+        "itemsPerSecond": numItems/bestSeconds if bestSeconds > 0 else None,
+        "peakMemoryBytes": peakMemory
+    }
+
+def run_benchmarks(quick: bool = False, repeats: int = 3,
+        nameFilter: Optional[str] = None):
+    """ Runs every benchmark case and returns the results dictionary. """
+    resultsList: List[Dict[str, Any]] = []
+    for name, function, parameters in get_cases(quick):
+        if nameFilter is not None and nameFilter not in name:
+            continue
+
+        result = {"name": name, "params": parameters}
+        result.update(run_case(function, parameters, repeats))
+        resultsList.append(result)
+
+        print("{} {}: {:.4f}s, {:.0f} items/s, {:.1f} MiB peak".format(name,
+                parameters, result["seconds"], result["itemsPerSecond"] or 0,
+                result["peakMemoryBytes"]/2**20), file=sys.stderr)
+
+    return {
+        "version": RESULTS_FORMAT_VERSION,
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "quick": quick
+        },
+        "results": resultsList
+    }
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+        threshold: float = DEFAULT_REGRESSION_THRESHOLD):
+    """ Compares two results dictionaries.
+
+    RETURNS:
+    - A list of (case, metric, baseline value, current value, relative
+        change) for every case that got slower or used more memory by more
+        than `threshold`.
+    """
+    def key(result: Dict[str, Any]):
+        return (result["name"], json.dumps(result["params"], sort_keys=True))
+
+    baselineResults = {key(result): result for result in baseline["results"]}
+
+    regressionsList = []
+    for result in current["results"]:
+        old = baselineResults.get(key(result))
+        if old is None:
+            continue
+
+        caseName = "{} {}".format(result["name"], result["params"])
+        if old["itemsPerSecond"] and result["itemsPerSecond"]:
+            change = result["itemsPerSecond"]/old["itemsPerSecond"] - 1
+            if change < -threshold:
+                regressionsList.append((caseName, "itemsPerSecond",
+                        old["itemsPerSecond"], result["itemsPerSecond"],
+                        change))
+        if old["peakMemoryBytes"]:
+            change = result["peakMemoryBytes"]/old["peakMemoryBytes"] - 1
+            if change > threshold:
+                regressionsList.append((caseName, "peakMemoryBytes",
+                        old["peakMemoryBytes"], result["peakMemoryBytes"],
+                        change))
+
+    return regressionsList
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description="Benchmarks the path computer, simulators and "
+                    "visualiser.")
+    parser.add_argument("--quick", action="store_true",
+            help="Use smaller sizes (for a quick check).")
+    parser.add_argument("--repeats", type=int, default=3,
+            help="Number of timed runs per case (the best is kept).")
+    parser.add_argument("--filter", default=None,
+            help="Only run cases whose name contains this.")
+    parser.add_argument("--output", default=None,
+            help="Write the results (JSON) to this file instead of stdout.")
+    parser.add_argument("--compare", default=None,
+            help="Compare against a previous results file and exit with "
+                    "status 1 if anything regressed.")
+    parser.add_argument("--threshold", type=float,
+            default=DEFAULT_REGRESSION_THRESHOLD,
+            help="Relative change reported as a regression (default 0.1).")
+    args = parser.parse_args()
+
+    results = run_benchmarks(quick=args.quick, repeats=args.repeats,
+            nameFilter=args.filter)
+
+    if args.output is not None:
+        with open(args.output, "w") as outputFile:
+            json.dump(results, outputFile, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+
+    if args.compare is not None:
+        with open(args.compare) as baselineFile:
+            baseline = json.load(baselineFile)
+
+        regressionsList = compare_results(baseline, results, args.threshold)
+        for caseName, metric, oldValue, newValue, change in regressionsList:
+            print("REGRESSION {} {}: {:.4g} -> {:.4g} ({:+.1%})".format(
+                    caseName, metric, oldValue, newValue, change),
+                    file=sys.stderr)
+        sys.exit(1 if regressionsList else 0)
@@ -0,0 +1,200 @@
+# Standard libs
+from typing import List
+from typing import Optional
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkComponents import Node
+
+from NetworkPathComputer import NetworkPathComputer
+
+from NetworkTopology import Topology
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class BottleneckAnalyzer:
+    def __init__(self, path: List[Node], packetSizes: float,
+            injectionTimes: Optional[float] = None,
+            topology: Optional[Topology] = None,
+            numPackets: Optional[int] = None):
+        """ Answers delivery time questions about a packet train in closed
+                form, from the path's bottleneck hop.
+
+        When every packet has the same size and they're all injected at the
+            same time (with nothing else queued along a packet switched
+            path), hop i serves each packet in the same time
+
+            service[i] = processing delay + packet size / transmission rate
+
+            so the first packet is delivered after
+
+            latency = sum(service[i] + propagation delay[i])
+
+            and every packet after it is held back by the slowest hop (the
+            bottleneck), arriving one bottleneck service time later:
+
+            delivery[k] = injection time + latency + k*max(service[i])
+
+        This takes O(hops) to set up and O(1) per packet. If the assumptions
+            don't hold (the sizes or injection times vary, or the path has
+            circuit switched nodes), the train is solved with
+            `NetworkBatchSolver.solve_path` instead, and the same methods
+            return its results.
+
+        ARGS:
+        - path: The nodes the packets travel through.
+        - packetSizes: The size of every packet in bits, or an array of
+                sizes (one per packet).
+        - injectionTimes: Time every packet is placed in the source node's
+                queue, or an array of times (defaults to 0).
+        - topology: The topology containing the path (optional).
+        - numPackets: Number of packets when `packetSizes` and
+                `injectionTimes` are single values.
+        """
+        self.__path = path
+        self.__topology = topology
+
+        packetSizes = np.asarray(packetSizes, dtype=np.float64)
+        injectionTimes = np.asarray(0.0 if injectionTimes is None else
+                injectionTimes, dtype=np.float64)
+
+        if numPackets is None:
+            if packetSizes.ndim == 0 and injectionTimes.ndim == 0:
+                raise Exception("Need numPackets when the packet sizes and "
+                        "injection times are single values")
+            numPackets = max(packetSizes.size if packetSizes.ndim > 0 else 0,
+                    injectionTimes.size if injectionTimes.ndim > 0 else 0)
+        self.__numPackets = numPackets
+
+        self.__fallbackReason = self.__check_assumptions(packetSizes,
+                injectionTimes)
+
+        self.__result = None
+        self.__bottleneckHop: Optional[int] = None
+        self.__serviceTimes: Optional[np.ndarray] = None
+        if self.__fallbackReason is None:
+            self.__analyse(float(packetSizes.flat[0]),
+                    float(injectionTimes.flat[0]))
+        else:
+            self.__result = NetworkBatchSolver.solve_path(path=path,
+                    packetSizes=np.broadcast_to(packetSizes, (numPackets,)),
+                    injectionTimes=np.broadcast_to(injectionTimes,
+                            (numPackets,)),
+                    topology=topology)
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def is_analytic(self):
+        """ Whether the answers come from the closed form (rather than a full
+                solve). """
+        return self.__fallbackReason is None
+
+    def get_fallback_reason(self):
+        """ Why the train had to be solved in full (None if it wasn't). """
+        return self.__fallbackReason
+
+    def get_num_packets(self):
+        return self.__numPackets
+
+    def get_service_times(self):
+        """ Returns each hop's service time (closed form only, else None). """
+        return self.__serviceTimes
+
+    def get_bottleneck_hop(self):
+        """ Returns the index of the slowest hop (closed form only, else
+                None). """
+        return self.__bottleneckHop
+
+    def get_bottleneck_node(self):
+        """ Returns the node the bottleneck hop leaves from (closed form
+                only, else None). """
+        if self.__bottleneckHop is None:
+            return None
+        return self.__path[self.__bottleneckHop]
+
+    def get_first_packet_latency(self):
+        """ Returns the end-to-end delay of the first packet. """
+        if self.__result is not None:
+            return float(self.__result.get_end_to_end_delays()[0])
+        return self.__latency
+
+    def get_spacing(self):
+        """ Returns the time between consecutive deliveries (closed form
+                only, else None). """
+        if self.__result is not None:
+            return None
+        return self.__spacing
+
+    def get_delivery_time(self, packetNum: int):
+        """ Returns the time packet `packetNum` reaches the destination. """
+        if not 0 <= packetNum < self.__numPackets:
+            raise Exception("There's no packet {}".format(packetNum))
+        if self.__result is not None:
+            return float(self.__result.get_delivery_times()[packetNum])
+        return self.__injectionTime + self.__latency + \
+                packetNum*self.__spacing
+
+    def get_end_to_end_delay(self, packetNum: int):
+        """ Returns the delivery time minus the injection time of a packet.
+        """
+        if self.__result is not None:
+            if not 0 <= packetNum < self.__numPackets:
+                raise Exception("There's no packet {}".format(packetNum))
+            return float(self.__result.get_end_to_end_delays()[packetNum])
+        return self.get_delivery_time(packetNum) - self.__injectionTime
+
+    def get_delivery_times(self):
+        """ Returns the delivery time of every packet. """
+        if self.__result is not None:
+            return self.__result.get_delivery_times()
+        return self.__injectionTime + self.__latency + \
+                np.arange(0, self.__numPackets)*self.__spacing
+
+    def get_end_to_end_delays(self):
+        """ Returns the end-to-end delay of every packet. """
+        if self.__result is not None:
+            return self.__result.get_end_to_end_delays()
+        return self.get_delivery_times() - self.__injectionTime
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __check_assumptions(self, packetSizes: np.ndarray,
+            injectionTimes: np.ndarray):
+        """ Returns why the closed form doesn't apply (None if it does). """
+        if packetSizes.ndim > 0 and packetSizes.size != self.__numPackets:
+            raise Exception("Need a packet size per packet")
+        if injectionTimes.ndim > 0 and \
+                injectionTimes.size != self.__numPackets:
+            raise Exception("Need an injection time per packet")
+
+        if self.__numPackets < 1:
+            raise Exception("Need at least one packet")
+        NetworkPathComputer.check_path_length(self.__path)
+        if np.any(packetSizes != packetSizes.flat[0]):
+            return "packet sizes differ"
+        if np.any(injectionTimes != injectionTimes.flat[0]):
+            return "injection times differ"
+        if any(node.is_circuit_switched() for node in self.__path[:-1]):
+            return "path has circuit switched nodes"
+        return None
+
+    def __analyse(self, packetSize: float, injectionTime: float):
+        """ Works out the closed form parameters in O(hops). """
+        serviceTimes = np.empty(len(self.__path) - 1)
+        propagationDelays = np.empty(len(self.__path) - 1)
+        for i in range(0, len(self.__path) - 1):
+            link = NetworkPathComputer.find_link(self.__path[i],
+                    self.__path[i + 1], self.__topology)
+            serviceTimes[i] = self.__path[i].get_processing_delay() + \
+                    link.get_transmission_delay(packetSize)
+            propagationDelays[i] = link.get_propagation_delay()
+
+        self.__serviceTimes = serviceTimes
+        self.__bottleneckHop = int(np.argmax(serviceTimes))
+        self.__spacing = float(serviceTimes[self.__bottleneckHop])
+        self.__latency = float(serviceTimes.sum() + propagationDelays.sum())
+        self.__injectionTime = injectionTime
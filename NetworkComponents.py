@@ -1,19 +1,30 @@
 # Standard libs
+from array import array
+from typing import Any
+from typing import Callable
+from typing import Iterable
 from typing import List
+from typing import Optional
 
 # Local libs
+from NetworkHelpers import SwitchingModes
 from NetworkHelpers import TimeBlockTypes
 
+from NetworkSchedulers import FifoScheduler
+
 # * CLASSES --------------------------------------------------------------------
 
 class TimeBlock(object):
     def __init__(self, delayType: TimeBlockTypes, startTime: float, 
-            stopTime: float):
+            stopTime: float, trafficClass: int = 0):
         
         self.__delayType = delayType
         self.__startTime = startTime
         self.__stopTime = stopTime
 
+        # Traffic class of the packet the block belongs to
+        self.__trafficClass = trafficClass
+
     def get_total_delay(self):
         """ Gets the total delay in the time block. 
         
@@ -37,17 +48,28 @@ class TimeBlock(object):
     def get_stop_time(self):
         return self.__stopTime
 
+    def get_traffic_class(self):
+        return self.__trafficClass
+
 class Packet(object):
-    def __init__(self, packetSize: int):
+    __slots__ = ("__packetSize", "__nodalDelay", "__trafficClass")
+
+    def __init__(self, packetSize: int, trafficClass: int = 0):
         # Size of the packet in BITS
         self.__packetSize = packetSize
 
         self.__nodalDelay = 0.0
 
+        # Class (or flow) of the packet, used by the node schedulers
+        self.__trafficClass = trafficClass
+
     def get_packet_size(self):
         """ Returns the size of the packet in bits. """
         return self.__packetSize
 
+    def get_traffic_class(self):
+        return self.__trafficClass
+
     def get_delay(self):
         """ Gets the delay () """
         return self.__nodalDelay
@@ -61,11 +83,117 @@ class Packet(object):
         """
         self.__nodalDelay += timeToAdd
 
+class PacketStore(object):
+    def __init__(self):
+        """ Compact storage for a large number of packets.
+
+        Rather than one Python object per packet, each packet is an id that
+            indexes into typed arrays holding the size (bits) and the
+            accumulated delay of every packet. Use `get_packet` to get a
+            `StoredPacket`, which has the same API as a `Packet`.
+        """
+        self.__packetSizes = array('d')
+        self.__nodalDelays = array('d')
+        self.__trafficClasses = array('l')
+
+    def __len__(self):
+        return len(self.__packetSizes)
+
+    def add_packet(self, packetSize: float, trafficClass: int = 0):
+        """ Adds a packet to the store and returns its id. """
+        self.__packetSizes.append(packetSize)
+        self.__nodalDelays.append(0.0)
+        self.__trafficClasses.append(trafficClass)
+        return len(self.__packetSizes) - 1
+
+    def add_packets(self, packetSizes: Iterable[float],
+            trafficClasses: Optional[Iterable[int]] = None):
+        """ Adds many packets to the store.
+
+        RETURNS:
+        - The range of ids given to the new packets.
+        """
+        firstId = len(self.__packetSizes)
+        self.__packetSizes.extend(packetSizes)
+        numPackets = len(self.__packetSizes) - firstId
+        self.__nodalDelays.extend([0.0]*numPackets)
+        if trafficClasses is None:
+            self.__trafficClasses.extend([0]*numPackets)
+        else:
+            self.__trafficClasses.extend(trafficClasses)
+            if len(self.__trafficClasses) != len(self.__packetSizes):
+                raise Exception("Need a traffic class per packet")
+        return range(firstId, len(self.__packetSizes))
+
+    def get_packet(self, packetId: int):
+        return StoredPacket(self, packetId)
+
+    def iter_packets(self, packetIds: Optional[Iterable[int]] = None):
+        """ Lazily yields a `StoredPacket` for each id (all packets by
+                default), e.g. to fill a node's queue. """
+        if packetIds is None:
+            packetIds = range(0, len(self.__packetSizes))
+        for packetId in packetIds:
+            yield StoredPacket(self, packetId)
+
+    def get_packet_size(self, packetId: int):
+        return self.__packetSizes[packetId]
+
+    def get_delay(self, packetId: int):
+        return self.__nodalDelays[packetId]
+
+    def get_traffic_class(self, packetId: int):
+        return self.__trafficClasses[packetId]
+
+    def add_delay(self, packetId: int, timeToAdd: float):
+        self.__nodalDelays[packetId] += timeToAdd
+
+    def get_packet_sizes(self):
+        """ Returns the typed array of packet sizes (supports the buffer
+                protocol, e.g. `numpy.frombuffer`). """
+        return self.__packetSizes
+
+    def get_delays(self):
+        """ Returns the typed array of accumulated delays. """
+        return self.__nodalDelays
+
+    def get_traffic_classes(self):
+        """ Returns the typed array of traffic classes. """
+        return self.__trafficClasses
+
+class StoredPacket(object):
+    __slots__ = ("__store", "__packetId")
+
+    def __init__(self, store: PacketStore, packetId: int):
+        """ Lightweight handle to a packet living in a `PacketStore`. """
+        self.__store = store
+        self.__packetId = packetId
+
+    def get_packet_id(self):
+        return self.__packetId
+
+    def get_packet_size(self):
+        """ Returns the size of the packet in bits. """
+        return self.__store.get_packet_size(self.__packetId)
+
+    def get_delay(self):
+        return self.__store.get_delay(self.__packetId)
+
+    def add_delay(self, timeToAdd: float):
+        self.__store.add_delay(self.__packetId, timeToAdd)
+
+    def get_traffic_class(self):
+        return self.__store.get_traffic_class(self.__packetId)
+
 class Link(object):
     def __init__(self, transmissionRate: float, length: float, 
-            propSpeed: float):
+            propSpeed: float, name: Optional[str] = None,
+            reservedRate: Optional[float] = None):
         """ Object representing a link between two nodes. """
 
+        # Name of the link (optional, used to refer to it in descriptions)
+        self.__name = name
+
         # The transmission rate (bits / second)
         self.__transmissionRate = transmissionRate
         
@@ -75,6 +203,16 @@ class Link(object):
         # Propagation speed of the link (in metres / second)
         self.__propSpeed = propSpeed
 
+        # Bandwidth reserved for a circuit over this link (bits / second),
+        # None to reserve the whole transmission rate
+        self.__reservedRate = reservedRate
+
+        # Callbacks to notify whenever a parameter of this link changes
+        self.__changeListeners: List[Callable[["Link"], None]] = []
+
+    def get_name(self):
+        return self.__name
+
     def get_transmission_delay(self, packetSize: float):
         """ Returns the amount of time to transmit a number of bits through 
                 the link. """
@@ -84,21 +222,84 @@ class Link(object):
         """ Returns the propagation delay of the link """
         return self.__length / self.__propSpeed
 
+    def get_transmission_rate(self):
+        return self.__transmissionRate
+
+    def get_reserved_rate(self):
+        """ Returns the rate available to a circuit over this link (the whole
+                transmission rate unless some other rate was reserved). """
+        if self.__reservedRate is None:
+            return self.__transmissionRate
+        return self.__reservedRate
+
+    def has_reserved_rate(self):
+        return self.__reservedRate is not None
+
+    def get_length(self):
+        return self.__length
+
+    def get_prop_speed(self):
+        return self.__propSpeed
+
+    def set_transmission_rate(self, transmissionRate: float):
+        self.__transmissionRate = transmissionRate
+        self.__notify_change_listeners()
+
+    def set_length(self, length: float):
+        self.__length = length
+        self.__notify_change_listeners()
+
+    def set_prop_speed(self, propSpeed: float):
+        self.__propSpeed = propSpeed
+        self.__notify_change_listeners()
+
+    def set_reserved_rate(self, reservedRate: Optional[float]):
+        self.__reservedRate = reservedRate
+        self.__notify_change_listeners()
+
+    def add_change_listener(self, listener: Callable[["Link"], None]):
+        """ Registers a callback that is called (with this link) whenever a
+                parameter of this link changes. """
+        self.__changeListeners.append(listener)
+
+    def remove_change_listener(self, listener: Callable[["Link"], None]):
+        self.__changeListeners.remove(listener)
+
+    def __notify_change_listeners(self):
+        for listener in self.__changeListeners:
+            listener(self)
+
 class Node(object):
-    def __init__(self, processingDelay: float, name: str, links: List[Link]):
-        """ Object representing a node that comprises a network. """
+    def __init__(self, processingDelay: float, name: str, links: List[Link],
+            switchingMode: SwitchingModes = SwitchingModes.PACKET_SWITCHED,
+            circuitSetupDelay: float = 0.0, scheduler: Any = None):
+        """ Object representing a node that comprises a network.
+
+        The packets waiting at the node are held by a scheduler (see
+            `NetworkSchedulers.py`), which decides the order they're served
+            in. It defaults to a `FifoScheduler`.
+        """
         
         # The processing delay (seconds)
         self.__procDelay = processingDelay
 
+        # Whether packets are stored and forwarded, or sent over a circuit
+        self.__switchingMode = switchingMode
+
+        # Time this node takes to set up its part of a circuit (seconds)
+        self.__circuitSetupDelay = circuitSetupDelay
+
         # The queue for all the packets
-        self.__queue: List[Packet] = []
+        self.__queue = scheduler if scheduler is not None else FifoScheduler()
 
         # Name of the next node in the list
         self.__name = name
 
         # Links available to this node
-        self.__links: List[Link] = links
+        self.__links: List[Link] = list(links)
+
+        # Callbacks to notify whenever the links of this node change
+        self.__changeListeners: List[Callable[["Node"], None]] = []
 
     def get_name(self):
         return self.__name
@@ -108,26 +309,80 @@ class Node(object):
         
         Use this to verify if a particular hop in a route can actually be 
             facilitated.
+
+        NOTE: Don't modify the returned list, use `add_link` / `remove_link`
+            so that any listeners (e.g. a `Topology`) are notified.
         """
         return self.__links
 
+    def add_link(self, linkToAdd: Link):
+        """ Makes a new link available to this node. """
+        self.__links.append(linkToAdd)
+        self.__notify_change_listeners()
+
+    def remove_link(self, linkToRemove: Link):
+        """ Removes a link from this node. """
+        self.__links.remove(linkToRemove)
+        self.__notify_change_listeners()
+
+    def add_change_listener(self, listener: Callable[["Node"], None]):
+        """ Registers a callback that is called (with this node) whenever the
+                links, delays or switching mode of this node change. """
+        self.__changeListeners.append(listener)
+
+    def remove_change_listener(self, listener: Callable[["Node"], None]):
+        self.__changeListeners.remove(listener)
+
     def get_processing_delay(self):
         return self.__procDelay
+
+    def set_processing_delay(self, processingDelay: float):
+        self.__procDelay = processingDelay
+        self.__notify_change_listeners()
+
+    def get_switching_mode(self):
+        return self.__switchingMode
+
+    def set_switching_mode(self, switchingMode: SwitchingModes):
+        self.__switchingMode = switchingMode
+        self.__notify_change_listeners()
+
+    def is_circuit_switched(self):
+        return self.__switchingMode == SwitchingModes.CIRCUIT_SWITCHED
+
+    def get_circuit_setup_delay(self):
+        return self.__circuitSetupDelay
+
+    def set_circuit_setup_delay(self, circuitSetupDelay: float):
+        self.__circuitSetupDelay = circuitSetupDelay
+        self.__notify_change_listeners()
     
     def add_packet_to_queue(self, packetToAdd: Packet):
-        self.__queue.append(packetToAdd)
+        self.__queue.enqueue(packetToAdd)
+
+    def add_packets_to_queue(self, packetsToAdd: Iterable[Packet]):
+        """ Adds several packets to the queue (in order). """
+        self.__queue.extend(packetsToAdd)
 
     def get_next_packet(self):
-        """ Gets the next packet in the queue. 
+        """ Gets the next packet to serve (as picked by the scheduler). 
         
         NOTE: This operation will `pop` the packet off the queue, so be mindful.
         """
-        return self.__queue.pop(0)
+        return self.__queue.dequeue()
 
     def get_packets(self):
-        """ Returns the current list of packets waiting in the queue."""
+        """ Returns the current packets waiting in the queue (the scheduler,
+                which supports `len` and iteration). """
+        return self.__queue
+
+    def get_scheduler(self):
         return self.__queue
 
     def clear_queue(self):
         """ Resets the queue (removes all packets waiting to be processed). """
-        self.__queue = []
\ No newline at end of file
+        self.__queue.clear()
+
+    def __notify_change_listeners(self):
+        for listener in self.__changeListeners:
+            listener(self)
@@ -0,0 +1,548 @@
+# Standard libs
+from array import array
+from collections import deque
+from heapq import heappop
+from heapq import heappush
+from itertools import repeat
+from time import perf_counter
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkComponents import Node
+from NetworkComponents import PacketStore
+from NetworkComponents import StoredPacket
+
+from NetworkBatchSolver import BatchPathResult
+from NetworkBatchSolver import HopTimes
+
+from NetworkPathComputer import NetworkPathComputer
+
+from NetworkTopology import Topology
+
+from NetworkSchedulers import FifoScheduler
+
+import NetworkTracing
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Event kinds, in the order they are handled when they happen at the same time
+DEPARTURE_EVENT = 0
+ARRIVAL_EVENT = 1
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class Flow:
+    def __init__(self, name: str, path: List[Node], packetSizes: np.ndarray,
+            injectionTimes: Optional[np.ndarray] = None,
+            trafficClass: int = 0):
+        """ A train of packets sent along a fixed path.
+
+        ARGS:
+        - name: Unique name of the flow.
+        - path: The nodes the packets travel through (first is the source,
+                last is the destination).
+        - packetSizes: The size of each packet in bits.
+        - injectionTimes: Time each packet is placed in the source node's
+                queue (non-decreasing, defaults to 0 for every packet).
+        - trafficClass: Traffic class of the flow's packets, used by the
+                schedulers of the nodes along the path.
+        """
+        NetworkPathComputer.check_path_length(path)
+
+        self.__name = name
+        self.__path = path
+        self.__trafficClass = trafficClass
+        self.__packetSizes = np.asarray(packetSizes, dtype=np.float64)
+
+        if injectionTimes is None:
+            injectionTimes = np.zeros(self.__packetSizes.shape)
+        self.__injectionTimes = np.asarray(injectionTimes, dtype=np.float64)
+
+        if self.__injectionTimes.shape != self.__packetSizes.shape:
+            raise Exception("Flow {} has {} packet sizes but {} injection "
+                    "times".format(name, len(self.__packetSizes),
+                            len(self.__injectionTimes)))
+
+        if np.any(np.diff(self.__injectionTimes) < 0):
+            raise Exception("Injection times of flow {} must be "
+                    "non-decreasing".format(name))
+
+    def get_name(self):
+        return self.__name
+
+    def get_path(self):
+        return self.__path
+
+    def get_packet_sizes(self):
+        return self.__packetSizes
+
+    def get_injection_times(self):
+        return self.__injectionTimes
+
+    def get_num_packets(self):
+        return len(self.__packetSizes)
+
+    def get_traffic_class(self):
+        return self.__trafficClass
+
+class PortScheduler:
+    def __init__(self, scheduler: Any, store: PacketStore):
+        """ The queue of an output port, when its node doesn't serve packets
+                in FIFO order.
+
+        Has the same `append` / `popleft` API as the deque of packet ids
+            FIFO ports use, but the waiting packets are handed to `scheduler`
+            (as `StoredPacket`s of `store`, so it can see their size and
+            traffic class), which picks the next one.
+        """
+        self.__scheduler = scheduler
+        self.__store = store
+
+    def __len__(self):
+        return len(self.__scheduler)
+
+    def append(self, packetId: int):
+        self.__scheduler.enqueue(StoredPacket(self.__store, packetId))
+
+    def popleft(self):
+        return self.__scheduler.dequeue().get_packet_id()
+
+class SimulationResult:
+    def __init__(self, flowResults: Dict[str, BatchPathResult],
+            numEvents: int, endTime: float):
+        self.__flowResults = flowResults
+        self.__numEvents = numEvents
+        self.__endTime = endTime
+
+    def get_flow_names(self):
+        return list(self.__flowResults.keys())
+
+    def get_flow_result(self, flowName: str):
+        """ Returns the per-hop times of a flow as a `BatchPathResult`.
+
+        Times of packets that haven't reached a hop yet are NaN.
+        """
+        return self.__flowResults[flowName]
+
+    def get_delivery_times(self, flowName: str):
+        return self.__flowResults[flowName].get_delivery_times()
+
+    def get_end_to_end_delays(self, flowName: str):
+        return self.__flowResults[flowName].get_end_to_end_delays()
+
+    def get_num_events(self):
+        """ The number of events processed so far. """
+        return self.__numEvents
+
+    def get_end_time(self):
+        """ Time of the last event processed. """
+        return self.__endTime
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class EventSimulator:
+    def __init__(self, topology: Topology,
+            ownedNodes: Optional[Iterable[Node]] = None):
+        """ Discrete-event simulator for many flows sharing a topology.
+
+        Every node has a queue per outgoing link (an output port). A port
+            serves one packet at a time: the packet is processed by the node
+            and then transmitted over the link, and the next packet can't
+            start processing until the transmission has finished (the same
+            store-and-forward model as `compute_path_step`). The port keeps
+            track of when it is busy until, and packets from different flows
+            waiting for it are served in the order the node's scheduler picks
+            (each port gets its own empty copy of the scheduler, see
+            `copy_empty`), so in arrival order for a `FifoScheduler`. Each
+            direction of a link is a separate port.
+
+        Events are kept in a binary heap ordered by (time, kind, packet id),
+            so simultaneous events are always handled in the same order.
+
+        A simulator can also simulate only part of the topology (see
+            `NetworkParallelSimulator.py`): it then only handles the events
+            at the nodes it owns. Packets sent to any other node are set
+            aside (see `pop_remote_arrivals`) instead of arriving, and packets
+            coming from other parts are added with `add_arrival`.
+
+        ARGS:
+        - topology: The topology the flows run over.
+        - ownedNodes: The nodes this simulator handles (defaults to all).
+        """
+        self.__topology = topology
+        self.__flows: List[Flow] = []
+
+        # ids of the nodes handled here (None for all of them)
+        self.__ownedNodeIds = None
+        if ownedNodes is not None:
+            self.__ownedNodeIds = set(id(node) for node in ownedNodes)
+
+        # (arrival time, packet id, hop, node) of packets sent to nodes that
+        # aren't handled here
+        self.__remoteArrivals: List[Tuple[float, int, int, Node]] = []
+
+        # (node, link) -> port index
+        self.__portIndex: Dict[Tuple[int, int], int] = {}
+        # The node each port belongs to
+        self.__portNodes: List[Node] = []
+
+        self.__hasRun = False
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def add_flow(self, flowToAdd: Flow):
+        """ Adds a flow to the simulation (must be done before `run`).
+
+        RAISES:
+        - Exception if a hop of the flow's path doesn't have a link, or
+                starts at a circuit switched node (circuits are only modelled
+                by `NetworkBatchSolver`).
+        """
+        if self.__hasRun:
+            raise Exception("Can't add flows once the simulation has started")
+
+        for flow in self.__flows:
+            if flow.get_name() == flowToAdd.get_name():
+                raise Exception("Simulation already has a flow named "
+                        "{}".format(flowToAdd.get_name()))
+
+        path = flowToAdd.get_path()
+        for i in range(0, len(path) - 1):
+            NetworkPathComputer.find_link(path[i], path[i + 1],
+                    self.__topology)
+            NetworkPathComputer.check_packet_switched(path[i])
+
+        self.__flows.append(flowToAdd)
+
+    def get_flows(self):
+        return self.__flows
+
+    def get_next_event_time(self):
+        """ Time of the next event to handle (infinity if there's none). """
+        self.__ensure_setup()
+        return self.__heap[0][0] if self.__heap else float("inf")
+
+    def add_arrival(self, packetId: int, hop: int, arrivalTime: float):
+        """ Adds a packet that arrives from a part of the topology that isn't
+                simulated here.
+
+        ARGS:
+        - packetId: Id of the packet. Packets are numbered in the order their
+                flows were added, starting from 0.
+        - hop: The hop of the packet's path the packet arrives at (i.e. it
+                arrives at the `hop`th node of the path).
+        - arrivalTime: The time the packet arrives.
+        """
+        self.__ensure_setup()
+        self.__hopOf[packetId] = hop
+        heappush(self.__heap, (arrivalTime, ARRIVAL_EVENT, packetId))
+
+    def pop_remote_arrivals(self):
+        """ Returns (and forgets) the (arrival time, packet id, hop, node) of
+                every packet sent to a node that isn't simulated here. """
+        remoteArrivals = self.__remoteArrivals
+        self.__remoteArrivals = []
+        return remoteArrivals
+
+    def get_result(self):
+        """ Returns the results so far (without running any further). """
+        self.__ensure_setup()
+        return self.__build_result()
+
+    def run(self, until: Optional[float] = None):
+        """ Runs the simulation.
+
+        ARGS:
+        - until: Only handle events before this time (seconds). Calling `run`
+                again carries on from where the previous call stopped. By
+                default the simulation runs until every packet is delivered.
+
+        RETURNS:
+        - A `SimulationResult` object.
+        """
+        self.advance(until)
+        return self.__build_result()
+
+    def advance(self, until: Optional[float] = None):
+        """ Same as `run`, without collecting the results (see `get_result`).
+        """
+        self.__ensure_setup()
+
+        heap = self.__heap
+        flowOf = self.__flowOf
+        hopOf = self.__hopOf
+        firstPacketIds = self.__firstPacketIds
+        numPacketsOf = self.__numPacketsOf
+        numHopsOf = self.__numHopsOf
+        portsOf = self.__portsOf
+        procDelaysOf = self.__procDelaysOf
+        propDelaysOf = self.__propDelaysOf
+        remoteNodesOf = self.__remoteNodesOf
+        remoteArrivals = self.__remoteArrivals
+        transDelaysOf = self.__transDelaysOf
+        injectionTimesOf = self.__injectionTimesOf
+        recordOffsets = self.__recordOffsets
+        portBusy = self.__portBusy
+        portQueues = self.__portQueues
+
+        arrivals = self.__arrivals
+        queueStops = self.__queueStops
+        procStops = self.__procStops
+        transStops = self.__transStops
+
+        numEvents = self.__numEvents
+        now = self.__now
+
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            startTime = perf_counter()
+            startEvents = numEvents
+            nodeNamesOf = [[node.get_name() for node in flow.get_path()]
+                    for flow in self.__flows]
+            flowNamesOf = [flow.get_name() for flow in self.__flows]
+
+        while heap:
+            if until is not None and heap[0][0] >= until:
+                break
+
+            now, kind, packetId = heappop(heap)
+            numEvents += 1
+
+            flow = flowOf[packetId]
+            hop = hopOf[packetId]
+            k = packetId - firstPacketIds[flow]
+
+            if kind == ARRIVAL_EVENT:
+                if hop == 0 and k + 1 < numPacketsOf[flow]:
+                    # Inject the next packet of the flow
+                    heappush(heap, (injectionTimesOf[flow][k + 1],
+                            ARRIVAL_EVENT, packetId + 1))
+
+                if hop == numHopsOf[flow]:
+                    # Delivered to the destination
+                    if tracer is not None:
+                        tracer.on_packet_delivered(packetId,
+                                now - injectionTimesOf[flow][k],
+                                flowNamesOf[flow])
+                    continue
+
+                record = recordOffsets[packetId] + hop
+                arrivals[record] = now
+
+                port = portsOf[flow][hop]
+                if portBusy[port]:
+                    portQueues[port].append(packetId)
+                    continue
+                portBusy[port] = True
+            else:
+                # The packet finished transmitting, send it down the link
+                t4 = now + propDelaysOf[flow][hop]
+                remoteNode = remoteNodesOf[flow][hop]
+                if remoteNode is None:
+                    heappush(heap, (t4, ARRIVAL_EVENT, packetId))
+                else:
+                    remoteArrivals.append((t4, packetId, hop + 1, remoteNode))
+                hopOf[packetId] = hop + 1
+
+                if tracer is not None:
+                    record = recordOffsets[packetId] + hop
+                    tracer.on_hop(nodeNamesOf[flow][hop],
+                            nodeNamesOf[flow][hop + 1], arrivals[record],
+                            queueStops[record], procStops[record], now, t4)
+
+                # Start serving the next packet waiting at the port (if any)
+                port = portsOf[flow][hop]
+                queue = portQueues[port]
+                if not queue:
+                    portBusy[port] = False
+                    continue
+
+                packetId = queue.popleft()
+                flow = flowOf[packetId]
+                hop = hopOf[packetId]
+                k = packetId - firstPacketIds[flow]
+                record = recordOffsets[packetId] + hop
+
+            # Start serving `packetId` at the port
+            t1 = now
+            t2 = t1 + procDelaysOf[flow][hop]
+            t3 = t2 + transDelaysOf[flow][hop][k]
+
+            queueStops[record] = t1
+            procStops[record] = t2
+            transStops[record] = t3
+            heappush(heap, (t3, DEPARTURE_EVENT, packetId))
+
+        self.__numEvents = numEvents
+        self.__now = now
+
+        if tracer is not None:
+            tracer.count("events", numEvents - startEvents)
+            tracer.add_time("event_simulator_run", perf_counter() - startTime)
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __ensure_setup(self):
+        if not self.__hasRun:
+            self.__setup()
+            self.__hasRun = True
+
+    def __is_owned(self, node: Node):
+        return self.__ownedNodeIds is None or id(node) in self.__ownedNodeIds
+
+    def __get_port(self, node: Node, nextNode: Node):
+        link = NetworkPathComputer.find_link(node, nextNode, self.__topology)
+        key = (id(node), id(link))
+        if key not in self.__portIndex:
+            self.__portIndex[key] = len(self.__portIndex)
+            self.__portNodes.append(node)
+        return self.__portIndex[key]
+
+    def __setup(self):
+        """ Flattens the flows into the plain lists/arrays the event loop
+                works on. """
+        self.__flowOf = array('l')
+        self.__hopOf = array('l')
+        self.__recordOffsets = array('q')
+        self.__firstRecordOf: List[int] = []
+        self.__firstPacketIds: List[int] = []
+        self.__numPacketsOf: List[int] = []
+        self.__numHopsOf: List[int] = []
+        self.__portsOf: List[List[int]] = []
+        self.__procDelaysOf: List[List[float]] = []
+        self.__propDelaysOf: List[List[float]] = []
+        self.__remoteNodesOf: List[List[Optional[Node]]] = []
+        self.__transDelaysOf: List[List[array]] = []
+        self.__injectionTimesOf: List[array] = []
+        self.__heap: List[Tuple[float, int, int]] = []
+
+        numRecords = 0
+        for flowNum, flow in enumerate(self.__flows):
+            path = flow.get_path()
+            numPackets = flow.get_num_packets()
+            numHops = len(path) - 1
+            firstPacketId = len(self.__flowOf)
+
+            ports: List[int] = []
+            procDelays: List[float] = []
+            propDelays: List[float] = []
+            remoteNodes: List[Optional[Node]] = []
+            transDelays: List[array] = []
+            for i in range(0, numHops):
+                link = NetworkPathComputer.find_link(path[i], path[i + 1],
+                        self.__topology)
+                ports.append(self.__get_port(path[i], path[i + 1]))
+                procDelays.append(path[i].get_processing_delay())
+                propDelays.append(link.get_propagation_delay())
+                remoteNodes.append(None if self.__is_owned(path[i + 1])
+                        else path[i + 1])
+                transDelays.append(EventSimulator.__to_doubles(
+                        np.broadcast_to(link.get_transmission_delay(
+                                flow.get_packet_sizes()), (numPackets,))))
+
+            self.__firstRecordOf.append(numRecords)
+            self.__firstPacketIds.append(firstPacketId)
+            self.__numPacketsOf.append(numPackets)
+            self.__numHopsOf.append(numHops)
+            self.__portsOf.append(ports)
+            self.__procDelaysOf.append(procDelays)
+            self.__propDelaysOf.append(propDelays)
+            self.__remoteNodesOf.append(remoteNodes)
+            self.__transDelaysOf.append(transDelays)
+            self.__injectionTimesOf.append(EventSimulator.__to_doubles(
+                    flow.get_injection_times()))
+
+            self.__flowOf.extend(array('l', [flowNum])*numPackets)
+            self.__hopOf.extend(array('l', [0])*numPackets)
+            self.__recordOffsets.extend(
+                    range(numRecords, numRecords + numPackets*numHops,
+                            numHops))
+            numRecords += numPackets*numHops
+
+            if numPackets > 0 and self.__is_owned(path[0]):
+                heappush(self.__heap, (self.__injectionTimesOf[flowNum][0],
+                        ARRIVAL_EVENT, firstPacketId))
+
+        self.__portBusy: List[bool] = [False]*len(self.__portIndex)
+        self.__portQueues: List[Union[Deque[int], PortScheduler]] = []
+        packetStore: Optional[PacketStore] = None
+        for node in self.__portNodes:
+            scheduler = node.get_scheduler()
+            if type(scheduler) is FifoScheduler:
+                self.__portQueues.append(deque())
+                continue
+
+            # Only the schedulers need the size and traffic class of every
+            # packet (by packet id)
+            if packetStore is None:
+                packetStore = PacketStore()
+                for flow in self.__flows:
+                    packetStore.add_packets(flow.get_packet_sizes(),
+                            repeat(flow.get_traffic_class(),
+                                    flow.get_num_packets()))
+            self.__portQueues.append(PortScheduler(scheduler.copy_empty(),
+                    packetStore))
+
+        # Per (packet, hop) times, NaN until the packet gets there
+        self.__arrivals = array('d', [np.nan])*numRecords
+        self.__queueStops = array('d', [np.nan])*numRecords
+        self.__procStops = array('d', [np.nan])*numRecords
+        self.__transStops = array('d', [np.nan])*numRecords
+
+        self.__numEvents = 0
+        self.__now = 0.0
+
+    @staticmethod
+    def __to_doubles(values: np.ndarray):
+        """ Copies an array into an `array('d')`, which the event loop reads
+                plain floats from, without making a float object per item. """
+        doubles = array('d')
+        doubles.frombytes(np.ascontiguousarray(values, dtype=np.float64)\
+                .tobytes())
+        return doubles
+
+    def __build_result(self):
+        arrivals = np.frombuffer(self.__arrivals, dtype=np.float64)
+        queueStops = np.frombuffer(self.__queueStops, dtype=np.float64)
+        procStops = np.frombuffer(self.__procStops, dtype=np.float64)
+        transStops = np.frombuffer(self.__transStops, dtype=np.float64)
+
+        flowResults: Dict[str, BatchPathResult] = {}
+        for flowNum, flow in enumerate(self.__flows):
+            numPackets = self.__numPacketsOf[flowNum]
+            numHops = self.__numHopsOf[flowNum]
+
+            start = self.__firstRecordOf[flowNum]
+            stop = start + numPackets*numHops
+
+            hopTimesList: List[HopTimes] = []
+            for hop in range(0, numHops):
+                transStop = transStops[start + hop:stop:numHops].copy()
+                hopTimesList.append(HopTimes(
+                        arrivalTimes=arrivals[start + hop:stop:numHops].copy(),
+                        queueStopTimes=queueStops[start + hop:stop:numHops]\
+                                .copy(),
+                        processingStopTimes=procStops[start + hop:stop:numHops]\
+                                .copy(),
+                        transmissionStopTimes=transStop,
+                        propagationStopTimes=transStop + \
+                                self.__propDelaysOf[flowNum][hop]))
+
+            flowResults[flow.get_name()] = BatchPathResult(
+                    nodeNames=[node.get_name() for node in flow.get_path()[:-1]],
+                    injectionTimes=flow.get_injection_times(),
+                    hopTimesList=hopTimesList,
+                    destinationName=flow.get_path()[-1].get_name())
+
+        return SimulationResult(flowResults=flowResults,
+                numEvents=self.__numEvents, endTime=self.__now)
@@ -3,7 +3,9 @@ from enum import auto
 
 # * DEBUG ----------------------------------------------------------------------
 
-__DEBUG_ENABLED__: bool = True
+# When enabled, a tracer that prints every hop is installed (see
+# `NetworkTracing.py` for tracing without the prints)
+__DEBUG_ENABLED__: bool = False
 
 # * ENUMS ----------------------------------------------------------------------
 
@@ -11,4 +13,12 @@ class TimeBlockTypes(Enum):
     PROCESSING_DELAY = auto()
     TRANSMISSION_DELAY = auto()
     PROPAGATION_DELAY = auto()
-    QUEUING_DELAY = auto()
\ No newline at end of file
+    QUEUING_DELAY = auto()
+
+class SwitchingModes(Enum):
+    # Every packet is queued, processed and transmitted at every node
+    PACKET_SWITCHED = auto()
+
+    # A circuit is set up once, then packets stream through at the reserved
+    # rate without being stored at each node
+    CIRCUIT_SWITCHED = auto()
\ No newline at end of file
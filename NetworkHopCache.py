@@ -0,0 +1,228 @@
+# Standard libs
+import hashlib
+
+from collections import OrderedDict
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import HopTimes
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkComponents import Link
+from NetworkComponents import Node
+
+import NetworkTracing
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Largest total size of the cached hop times, in bytes
+DEFAULT_MAX_BYTES = 256 << 20
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class HopCache:
+    def __init__(self, maxBytes: int = DEFAULT_MAX_BYTES):
+        """ Remembers the times computed for each hop, so hops shared by
+                several flows (or solves) are only computed once.
+
+        Flows that share a path suffix (e.g. everything crossing
+            S2 -> S1 -> C) with the same packet sizes and the same arrival
+            times at the start of the suffix get exactly the same times along
+            it. An entry is keyed by:
+
+        - the parameters of the hop's nodes and links (processing delay,
+            switching mode, setup delay, transmission / reserved rate and
+            propagation delay), so changing a parameter never returns stale
+            times, and
+        - a hash of the arrival times, packet sizes and transmission stop of
+            the packet ahead of the train.
+
+        Within a `solve_path` call the arrays are only hashed for the first
+            hop: the arrivals at each later hop are set by the hop before it,
+            so its hash is derived from that hop's key instead (see
+            `solve_keyed_segment`).
+
+        Pass the cache to `NetworkBatchSolver.solve_path` (as `hopCache`).
+            The least recently used entries are evicted once the cached
+            arrays take more than `maxBytes`.
+        """
+        self.__maxBytes = maxBytes
+
+        # key -> (hop times, size in bytes), least recently used first
+        self.__entries: "OrderedDict[Tuple, Tuple[HopTimes, int]]" = \
+                OrderedDict()
+        self.__numBytes = 0
+        self.__numHits = 0
+        self.__numMisses = 0
+        self.__numEvictions = 0
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_num_hits(self):
+        return self.__numHits
+
+    def get_num_misses(self):
+        return self.__numMisses
+
+    def get_num_bytes(self):
+        return self.__numBytes
+
+    def get_stats(self):
+        return {"entries": len(self.__entries), "bytes": self.__numBytes,
+                "hits": self.__numHits, "misses": self.__numMisses,
+                "evictions": self.__numEvictions}
+
+    def clear(self):
+        """ Drops every entry (the counters are kept). """
+        self.__entries.clear()
+        self.__numBytes = 0
+
+    def solve_segment(self, arrivalTimes: np.ndarray,
+            packetSizes: np.ndarray, nodesList: List[Node],
+            linksList: List[Link],
+            lastTransmissionStop: Optional[np.ndarray] = None):
+        """ Returns the cached times of a hop, or solves it (with
+                `NetworkBatchSolver.solve_segment`, same arguments) and
+                caches them.
+
+        The returned arrays may be shared with other callers, so they're
+            read-only.
+        """
+        return self.solve_keyed_segment(arrivalTimes, packetSizes, nodesList,
+                linksList, lastTransmissionStop)[0]
+
+    def solve_keyed_segment(self, arrivalTimes: np.ndarray,
+            packetSizes: np.ndarray, nodesList: List[Node],
+            linksList: List[Link],
+            lastTransmissionStop: Optional[np.ndarray] = None,
+            previousKey: Optional[Tuple] = None):
+        """ Same as `solve_segment`, but also returns the entry's key, so
+                the next hop of a path can be keyed from it.
+
+        Hashing the arrays costs about as much as solving a simple hop, so
+            only the first hop of a path hashes them. A later hop's arrivals
+            are the propagation stop times of the hop before it, which its
+            key already determines, so its hash is derived from that key and
+            `lastTransmissionStop` only (in O(1) rather than O(packets)).
+
+        ARGS:
+        - previousKey: Key of the previous hop of the path (None for the
+                first hop). `arrivalTimes` must then be the propagation stop
+                times returned with that key, and `packetSizes` the same.
+
+        RETURNS:
+        - (hop times, key)
+        """
+        if previousKey is None:
+            arrivalTimes = np.asarray(arrivalTimes, dtype=np.float64)
+            packetSizes = np.asarray(packetSizes, dtype=np.float64)
+            arraysHash = HopCache.get_arrays_hash(arrivalTimes, packetSizes,
+                    lastTransmissionStop)
+        else:
+            arraysHash = HopCache.get_chained_hash(previousKey,
+                    lastTransmissionStop)
+        key = (HopCache.get_parameters_key(nodesList, linksList), arraysHash)
+
+        tracer = NetworkTracing.TRACER
+        entry = self.__entries.get(key)
+        if entry is not None:
+            self.__entries.move_to_end(key)
+            self.__numHits += 1
+            if tracer is not None:
+                tracer.count("hop_cache_hits")
+            return entry[0], key
+
+        self.__numMisses += 1
+        if tracer is not None:
+            tracer.count("hop_cache_misses")
+
+        hopTimes = NetworkBatchSolver.solve_segment(
+                arrivalTimes=arrivalTimes,
+                packetSizes=packetSizes,
+                nodesList=nodesList,
+                linksList=linksList,
+                lastTransmissionStop=lastTransmissionStop)
+
+        # Own the arrival times, the caller's array could change later (a
+        # later hop's arrivals are the previous hop's read-only stop times)
+        arrivalTimes = hopTimes.get_arrival_times()
+        if previousKey is None or arrivalTimes.flags.writeable:
+            arrivalTimes = np.array(arrivalTimes)
+        hopTimes = HopTimes(arrivalTimes,
+                hopTimes.get_queue_stop_times(),
+                hopTimes.get_processing_stop_times(),
+                hopTimes.get_transmission_stop_times(),
+                hopTimes.get_propagation_stop_times())
+
+        # The arrays are shared by every hit, so no caller may modify them
+        for times in (hopTimes.get_arrival_times(),
+                hopTimes.get_queue_stop_times(),
+                hopTimes.get_processing_stop_times(),
+                hopTimes.get_transmission_stop_times(),
+                hopTimes.get_propagation_stop_times()):
+            times.setflags(write=False)
+        numBytes = 5*hopTimes.get_arrival_times().nbytes
+        if numBytes <= self.__maxBytes:
+            self.__entries[key] = (hopTimes, numBytes)
+            self.__numBytes += numBytes
+            while self.__numBytes > self.__maxBytes:
+                _, (_, evictedBytes) = self.__entries.popitem(last=False)
+                self.__numBytes -= evictedBytes
+                self.__numEvictions += 1
+
+        return hopTimes, key
+
+    @staticmethod
+    def get_parameters_key(nodesList: List[Node], linksList: List[Link]):
+        """ Returns a tuple of every parameter that affects a hop's times.
+        """
+        return (tuple((node.get_processing_delay(),
+                        node.get_switching_mode().value,
+                        node.get_circuit_setup_delay())
+                        for node in nodesList),
+                tuple((link.get_transmission_rate(), link.get_reserved_rate(),
+                        link.get_propagation_delay())
+                        for link in linksList))
+
+    @staticmethod
+    def get_arrays_hash(arrivalTimes: np.ndarray, packetSizes: np.ndarray,
+            lastTransmissionStop: Optional[np.ndarray] = None):
+        """ Returns a digest of the arrays a hop is solved for (including
+                their shapes). """
+        digest = hashlib.blake2b(digest_size=16)
+        for array in (arrivalTimes, packetSizes, lastTransmissionStop):
+            HopCache.__update_digest(digest, array)
+        return digest.digest()
+
+    @staticmethod
+    def get_chained_hash(previousKey: Tuple,
+            lastTransmissionStop: Optional[np.ndarray] = None):
+        """ Returns a digest for the hop after the one keyed `previousKey`
+                (see `solve_keyed_segment`). """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(b"chain")
+        digest.update(repr(previousKey[0]).encode())
+        digest.update(previousKey[1])
+        HopCache.__update_digest(digest, lastTransmissionStop)
+        return digest.digest()
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    @staticmethod
+    def __update_digest(digest: Any, array: Optional[np.ndarray]):
+        """ Adds an array (and its shape) to a digest. """
+        if array is None:
+            digest.update(b"none")
+            return
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(repr(array.shape).encode())
+        digest.update(array.data)
@@ -0,0 +1,230 @@
+# Standard libs
+from time import perf_counter
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import BatchPathResult
+from NetworkBatchSolver import HopTimes
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkComponents import Link
+from NetworkComponents import Node
+
+from NetworkTopology import Topology
+
+import NetworkTracing
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Number of packets past the last changed arrival that are recomputed before
+# checking whether the hop has converged with the cached run (doubled every
+# time it hasn't)
+DEFAULT_WINDOW_SIZE = 1 << 12
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class IncrementalPathSolver:
+    def __init__(self, path: List[Node], packetSizes: np.ndarray,
+            injectionTimes: Optional[np.ndarray] = None,
+            topology: Optional[Topology] = None,
+            windowSize: int = DEFAULT_WINDOW_SIZE):
+        """ Re-solves a packet train along a path as its nodes and links
+                change, recomputing as little as possible.
+
+        The times of every hop are kept from one `solve` to the next, along
+            with the parameters they were computed with. On the next solve:
+
+        - A hop whose parameters and arrival times are unchanged is reused
+            as is (so everything upstream of a change costs one comparison).
+        - A hop whose parameters changed is recomputed.
+        - A hop whose parameters are unchanged but whose arrivals changed is
+            only recomputed from the first changed arrival, and only until it
+            converges with the cached run: once a packet after the last
+            changed arrival finds the queue empty in both runs, every later
+            packet has the same times as before.
+
+        The results match `NetworkBatchSolver.solve_path` up to floating point
+            rounding.
+
+        ARGS:
+        - path: The nodes the packets travel through.
+        - packetSizes: The size of each packet in bits (a 1D array).
+        - injectionTimes: Time each packet is placed in the source node's
+                queue (defaults to 0 for every packet).
+        - topology: The topology containing the path (optional).
+        - windowSize: See `DEFAULT_WINDOW_SIZE`.
+        """
+        self.__path = path
+        self.__topology = topology
+        self.__windowSize = windowSize
+
+        self.__packetSizes = np.asarray(packetSizes, dtype=np.float64)
+        if self.__packetSizes.ndim != 1:
+            raise Exception("Incremental solving needs a 1D packet train")
+
+        self.set_injection_times(injectionTimes)
+
+        # start node index -> (hop parameters, hop times) of the last solve
+        self.__cache: Dict[int, Tuple[Tuple[Any, ...], HopTimes]] = {}
+        self.__numRecomputedPackets = 0
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_path(self):
+        return self.__path
+
+    def set_injection_times(self, injectionTimes: Optional[np.ndarray]):
+        """ Changes when the packets are injected (only the packets after the
+                first changed one are recomputed on the next solve). """
+        if injectionTimes is None:
+            injectionTimes = np.zeros(self.__packetSizes.shape)
+
+        injectionTimes = np.asarray(injectionTimes, dtype=np.float64)
+        if injectionTimes.shape != self.__packetSizes.shape:
+            raise Exception("Need an injection time per packet")
+
+        self.__injectionTimes = injectionTimes
+
+    def get_num_recomputed_packets(self):
+        """ The number of (packet, hop) times the last `solve` computed
+                (the rest were reused). """
+        return self.__numRecomputedPackets
+
+    def invalidate(self):
+        """ Throws away every cached hop. """
+        self.__cache = {}
+
+    def solve(self):
+        """ Solves the path with the current node and link parameters.
+
+        RETURNS:
+        - A `BatchPathResult` object.
+        """
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            startTime = perf_counter()
+
+        cache: Dict[int, Tuple[Tuple[Any, ...], HopTimes]] = {}
+        hopTimesList: List[HopTimes] = []
+        self.__numRecomputedPackets = 0
+
+        arrivalTimes = self.__injectionTimes
+        for start, end, linksList in NetworkBatchSolver.get_segments(
+                self.__path, self.__topology):
+            nodesList = self.__path[start:end]
+            key = IncrementalPathSolver.__get_key(nodesList, linksList)
+
+            cached = self.__cache.get(start)
+            if cached is not None and cached[0] == key:
+                hopTimes = self.__update_hop(arrivalTimes, nodesList,
+                        linksList, cached[1])
+            else:
+                hopTimes = NetworkBatchSolver.solve_segment(
+                        arrivalTimes=arrivalTimes,
+                        packetSizes=self.__packetSizes,
+                        nodesList=nodesList,
+                        linksList=linksList)
+                self.__numRecomputedPackets += len(arrivalTimes)
+
+            cache[start] = (key, hopTimes)
+            hopTimesList.append(hopTimes)
+            arrivalTimes = hopTimes.get_propagation_stop_times()
+
+        self.__cache = cache
+
+        if tracer is not None:
+            tracer.count("incremental_packets", self.__numRecomputedPackets)
+            tracer.add_time("incremental_solve", perf_counter() - startTime)
+
+        return BatchPathResult(
+                nodeNames=[self.__path[start].get_name() for start in cache],
+                injectionTimes=self.__injectionTimes,
+                hopTimesList=hopTimesList,
+                destinationName=self.__path[-1].get_name())
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __update_hop(self, arrivalTimes: np.ndarray, nodesList: List[Node],
+            linksList: List[Link], cachedTimes: HopTimes):
+        """ Recomputes the part of a (parameter wise unchanged) hop affected
+                by a change in its arrival times. """
+        cachedArrivals = cachedTimes.get_arrival_times()
+        changedList = np.flatnonzero(arrivalTimes != cachedArrivals)
+        if len(changedList) == 0:
+            return cachedTimes
+
+        numPackets = len(arrivalTimes)
+        first = int(changedList[0])
+        last = int(changedList[-1])
+
+        # The queue ahead of the first changed packet is as before
+        cachedStops = cachedTimes.get_transmission_stop_times()
+        lastStop = cachedStops[first - 1] if first > 0 else None
+
+        partsList: List[HopTimes] = []
+        cachedQueued = cachedTimes.get_queue_stop_times() > cachedArrivals
+        low = first
+        high = min(numPackets, last + 1 + self.__windowSize)
+        windowSize = self.__windowSize
+        converged = numPackets
+        while low < numPackets:
+            part = NetworkBatchSolver.solve_segment(
+                    arrivalTimes=arrivalTimes[low:high],
+                    packetSizes=self.__packetSizes[low:high],
+                    nodesList=nodesList,
+                    linksList=linksList,
+                    lastTransmissionStop=lastStop)
+            self.__numRecomputedPackets += high - low
+
+            # First packet past the last change that didn't queue in either
+            # run (from there on, both runs are the same)
+            check = max(low, last + 1)
+            if check < high:
+                idle = ~(part.get_queue_stop_times()[check - low:] >
+                        arrivalTimes[check:high]) & ~cachedQueued[check:high]
+                idleList = np.flatnonzero(idle)
+                if len(idleList) > 0:
+                    converged = check + int(idleList[0])
+                    partsList.append(IncrementalPathSolver.__slice(part, 0,
+                            converged - low))
+                    break
+
+            partsList.append(part)
+            lastStop = part.get_transmission_stop_times()[-1]
+            windowSize *= 2
+            low, high = high, min(numPackets, high + windowSize)
+
+        return HopTimes(*[np.concatenate([cachedArray[:first]] +
+                        list(partArrays) +
+                        [cachedArray[converged:]])
+                for cachedArray, partArrays in zip(
+                        IncrementalPathSolver.__get_arrays(cachedTimes),
+                        zip(*[IncrementalPathSolver.__get_arrays(part)
+                                for part in partsList]))])
+
+    @staticmethod
+    def __get_key(nodesList: List[Node], linksList: List[Link]):
+        """ The parameters a hop's times depend on (besides its arrivals). """
+        return (tuple((node.get_switching_mode(), node.get_processing_delay(),
+                        node.get_circuit_setup_delay()) for node in nodesList),
+                tuple((link.get_transmission_rate(), link.get_reserved_rate(),
+                        link.get_propagation_delay()) for link in linksList))
+
+    @staticmethod
+    def __get_arrays(hopTimes: HopTimes):
+        return (hopTimes.get_arrival_times(), hopTimes.get_queue_stop_times(),
+                hopTimes.get_processing_stop_times(),
+                hopTimes.get_transmission_stop_times(),
+                hopTimes.get_propagation_stop_times())
+
+    @staticmethod
+    def __slice(hopTimes: HopTimes, start: int, stop: int):
+        return HopTimes(*[array[start:stop]
+                for array in IncrementalPathSolver.__get_arrays(hopTimes)])
@@ -0,0 +1,306 @@
+# Standard libs
+import math
+
+from statistics import NormalDist
+from time import perf_counter
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkComponents import Node
+
+from NetworkTopology import Topology
+
+import NetworkTracing
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Number of trials run when none is given
+DEFAULT_NUM_TRIALS = 10000
+
+# Number of trials solved at a time (bounds the memory used by a run)
+DEFAULT_CHUNK_SIZE = 1 << 12
+
+# Percentiles reported by `MonteCarloResult.get_summary`
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class MonteCarloResult:
+    def __init__(self, nodeNames: List[str], injectionTimes: np.ndarray,
+            deliveryTimes: np.ndarray):
+        """ The delivery times of every packet in every trial.
+
+        ARGS:
+        - nodeNames: The nodes of the path.
+        - injectionTimes: Injection time of each packet, shaped (packets,).
+        - deliveryTimes: Shaped (trials, packets).
+        """
+        self.__nodeNames = nodeNames
+        self.__injectionTimes = injectionTimes
+        self.__deliveryTimes = deliveryTimes
+
+    def get_node_names(self):
+        return self.__nodeNames
+
+    def get_num_trials(self):
+        return self.__deliveryTimes.shape[0]
+
+    def get_num_packets(self):
+        return self.__deliveryTimes.shape[1]
+
+    def get_delivery_times(self):
+        """ Returns the delivery times, shaped (trials, packets). """
+        return self.__deliveryTimes
+
+    def get_end_to_end_delays(self):
+        """ Returns the delivery times minus the injection times, shaped
+                (trials, packets). """
+        return self.__deliveryTimes - self.__injectionTimes
+
+    def get_mean_delivery_times(self):
+        return self.__deliveryTimes.mean(axis=0)
+
+    def get_percentiles(self, percentiles: Sequence[float]):
+        """ Returns the given percentiles (0 to 100) of each packet's
+                delivery time, shaped (percentiles, packets). """
+        return np.percentile(self.__deliveryTimes, percentiles, axis=0)
+
+    def get_confidence_interval(self, confidence: float = 0.95):
+        """ Returns a confidence interval of each packet's mean delivery time
+                (from the normal approximation).
+
+        RETURNS:
+        - (low, high), each shaped (packets,).
+        """
+        numTrials = self.get_num_trials()
+        means = self.get_mean_delivery_times()
+        if numTrials < 2:
+            return means.copy(), means.copy()
+
+        z = NormalDist().inv_cdf(0.5 + confidence/2)
+        halfWidths = z*self.__deliveryTimes.std(axis=0, ddof=1)/\
+                math.sqrt(numTrials)
+        return means - halfWidths, means + halfWidths
+
+    def get_percentile_interval(self, percentile: float,
+            confidence: float = 0.95):
+        """ Returns a confidence interval of a percentile of each packet's
+                delivery time.
+
+        The interval is distribution free: it's bounded by the order
+            statistics whose ranks are the binomial (normal approximation)
+            bounds on the number of trials below the percentile.
+
+        RETURNS:
+        - (low, high), each shaped (packets,).
+        """
+        numTrials = self.get_num_trials()
+        q = percentile/100
+        z = NormalDist().inv_cdf(0.5 + confidence/2)
+        spread = z*math.sqrt(numTrials*q*(1 - q))
+
+        lowRank = min(max(math.floor(numTrials*q - spread), 0), numTrials - 1)
+        highRank = min(max(math.ceil(numTrials*q + spread), 0), numTrials - 1)
+
+        ordered = np.partition(self.__deliveryTimes, (lowRank, highRank),
+                axis=0)
+        return ordered[lowRank], ordered[highRank]
+
+    def get_summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+            confidence: float = 0.95):
+        """ Returns a dictionary of per-packet arrays: the mean delivery time
+                ("mean") and its interval ("meanLow", "meanHigh"), and each
+                percentile ("p50", ...) with its interval ("p50Low",
+                "p50High", ...). """
+        summary = {"mean": self.get_mean_delivery_times()}
+        summary["meanLow"], summary["meanHigh"] = \
+                self.get_confidence_interval(confidence)
+
+        for percentile, values in zip(percentiles,
+                self.get_percentiles(percentiles)):
+            name = "p{:g}".format(percentile)
+            summary[name] = values
+            summary[name + "Low"], summary[name + "High"] = \
+                    self.get_percentile_interval(percentile, confidence)
+        return summary
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class MonteCarloSimulator:
+    def __init__(self, path: List[Node], packetSizes: Any,
+            injectionTimes: Optional[np.ndarray] = None,
+            topology: Optional[Topology] = None,
+            numPackets: Optional[int] = None,
+            processingJitter: float = 0.0,
+            degradationProbability: float = 0.0,
+            degradedRateFactor: float = 0.5,
+            seed: Optional[int] = None):
+        """ Runs many independent random trials of a packet train sent along
+                a path.
+
+        Every trial draws its own processing delays, packet sizes and link
+            rates. Rather than running the trials one by one, a chunk of
+            trials is solved at once: `NetworkBatchSolver.solve_hop` is given
+            arrays shaped (trials, packets), so the per-hop recurrence runs
+            over a trials axis in NumPy.
+
+        The randomness modelled is:
+
+        - processingJitter: Each packet's processing delay at each node is
+                the node's delay times max(0, 1 + N(0, processingJitter)),
+                i.e. `processingJitter` is the coefficient of variation.
+        - packetSizes: Either fixed sizes, or a size distribution (e.g.
+                `EmpiricalSizes` from `NetworkTrafficGenerators.py`) sampled
+                for every packet of every trial.
+        - degradationProbability: In each trial, each link is independently
+                degraded with this probability, running at
+                `degradedRateFactor` times its transmission rate for the
+                whole trial.
+
+        Circuit switched segments are solved as they are (without any
+            randomness other than the packet sizes).
+
+        ARGS:
+        - path: The nodes the packets travel through.
+        - packetSizes: The size of each packet in bits, or a size
+                distribution (anything with a `sample(rng, n)` method).
+        - injectionTimes: Time each packet is placed in the source node's
+                queue (defaults to 0 for every packet).
+        - topology: The topology containing the path (optional).
+        - numPackets: Number of packets when `packetSizes` is a
+                distribution (defaults to the number of injection times).
+        - seed: Seed of the random number generator.
+        """
+        if processingJitter < 0:
+            raise Exception("processingJitter can't be negative")
+        if not 0 <= degradationProbability <= 1:
+            raise Exception("degradationProbability must be between 0 and 1")
+        if degradedRateFactor <= 0:
+            raise Exception("degradedRateFactor must be positive")
+
+        self.__path = path
+        self.__segmentsList = NetworkBatchSolver.get_segments(path, topology)
+        self.__processingJitter = processingJitter
+        self.__degradationProbability = degradationProbability
+        self.__degradedRateFactor = degradedRateFactor
+        self.__rng = np.random.default_rng(seed)
+
+        if hasattr(packetSizes, "sample"):
+            self.__sizeDistribution = packetSizes
+            self.__packetSizes = None
+            if numPackets is None:
+                if injectionTimes is None:
+                    raise Exception("Need numPackets or injectionTimes with "
+                            "a size distribution")
+                numPackets = len(injectionTimes)
+        else:
+            self.__sizeDistribution = None
+            self.__packetSizes = np.asarray(packetSizes, dtype=np.float64)
+            numPackets = len(self.__packetSizes)
+
+        if injectionTimes is None:
+            self.__injectionTimes = np.zeros(numPackets)
+        else:
+            self.__injectionTimes = np.asarray(injectionTimes,
+                    dtype=np.float64)
+            if self.__injectionTimes.shape != (numPackets,):
+                raise Exception("Need an injection time per packet")
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_path(self):
+        return self.__path
+
+    def get_num_packets(self):
+        return len(self.__injectionTimes)
+
+    def run(self, numTrials: int = DEFAULT_NUM_TRIALS,
+            chunkSize: int = DEFAULT_CHUNK_SIZE):
+        """ Runs the trials.
+
+        ARGS:
+        - numTrials: Number of independent trials.
+        - chunkSize: Number of trials solved at a time.
+
+        RETURNS:
+        - A `MonteCarloResult` object.
+        """
+        if numTrials < 1:
+            raise Exception("Need at least one trial")
+
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            startTime = perf_counter()
+
+        deliveryTimes = np.empty((numTrials, self.get_num_packets()))
+        for start in range(0, numTrials, chunkSize):
+            stop = min(numTrials, start + chunkSize)
+            deliveryTimes[start:stop] = self.__run_chunk(stop - start)
+
+        if tracer is not None:
+            tracer.count("monte_carlo_trials", numTrials)
+            tracer.count("packets", deliveryTimes.size)
+            tracer.add_time("monte_carlo_run", perf_counter() - startTime)
+
+        return MonteCarloResult(
+                nodeNames=[node.get_name() for node in self.__path],
+                injectionTimes=self.__injectionTimes,
+                deliveryTimes=deliveryTimes)
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __run_chunk(self, numTrials: int):
+        """ Solves `numTrials` trials at once, returning their delivery times
+                shaped (trials, packets). """
+        numPackets = self.get_num_packets()
+        shape = (numTrials, numPackets)
+        rng = self.__rng
+
+        if self.__sizeDistribution is not None:
+            packetSizes = np.asarray(self.__sizeDistribution.sample(rng,
+                    numTrials*numPackets), dtype=np.float64).reshape(shape)
+        else:
+            packetSizes = self.__packetSizes[np.newaxis, :]
+
+        arrivalTimes = np.broadcast_to(self.__injectionTimes, shape)
+        for start, end, linksList in self.__segmentsList:
+            node = self.__path[start]
+            if node.is_circuit_switched():
+                hopTimes = NetworkBatchSolver.solve_circuit(
+                        arrivalTimes=arrivalTimes,
+                        packetSizes=packetSizes,
+                        nodesList=self.__path[start:end],
+                        linksList=linksList)
+            else:
+                processingDelays = node.get_processing_delay()
+                if self.__processingJitter > 0 and processingDelays > 0:
+                    processingDelays = processingDelays*np.maximum(0.0,
+                            1 + rng.normal(0.0, self.__processingJitter,
+                                    shape))
+
+                link = linksList[0]
+                transmissionRates = None
+                if self.__degradationProbability > 0:
+                    degraded = rng.random((numTrials, 1)) < \
+                            self.__degradationProbability
+                    transmissionRates = link.get_transmission_rate()*\
+                            np.where(degraded, self.__degradedRateFactor, 1.0)
+
+                hopTimes = NetworkBatchSolver.solve_hop(
+                        arrivalTimes=arrivalTimes,
+                        packetSizes=packetSizes,
+                        processingDelay=processingDelays,
+                        link=link,
+                        transmissionRates=transmissionRates)
+
+            arrivalTimes = hopTimes.get_propagation_stop_times()
+
+        return arrivalTimes
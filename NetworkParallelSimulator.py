@@ -0,0 +1,361 @@
+# Standard libs
+import multiprocessing
+
+from time import perf_counter
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import BatchPathResult
+from NetworkBatchSolver import HopTimes
+
+from NetworkEventSimulator import EventSimulator
+from NetworkEventSimulator import Flow
+from NetworkEventSimulator import SimulationResult
+
+from NetworkSchedulers import FifoScheduler
+
+from NetworkTopology import Topology
+
+import NetworkTracing
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class ParallelEventSimulator:
+    def __init__(self, topology: Topology,
+            partitions: Optional[Dict[str, int]] = None,
+            numPartitions: int = 2):
+        """ Runs an `EventSimulator` over several processes, each simulating
+                one part (partition) of the topology.
+
+        This is a conservative parallel simulation. A packet sent over a link
+            between two partitions can't arrive before the link's propagation
+            delay has passed, so the smallest such delay (the lookahead) is a
+            window in which every partition can run on its own. The
+            partitions repeatedly run to the end of the window, then swap the
+            packets they sent each other, and start the next window at the
+            earliest pending event.
+
+        Each partition handles the events at its nodes in exactly the same
+            (time, kind, packet id) order as a single `EventSimulator` would,
+            so the results are identical to a single process run.
+
+        ARGS:
+        - topology: The topology the flows run over.
+        - partitions: Node name -> partition number (from 0). Defaults to
+                `partition_topology(topology, numPartitions)`.
+        - numPartitions: Number of partitions (and worker processes) when
+                `partitions` isn't given.
+
+        The workers rebuild the topology from its description, which doesn't
+            include the node schedulers, so every node must use a
+            `FifoScheduler` (use a single `EventSimulator` otherwise).
+
+        RAISES:
+        - Exception if a link between two partitions has no propagation delay
+                (there would be no lookahead), or a node doesn't use a
+                `FifoScheduler`.
+        """
+        ParallelEventSimulator.__check_schedulers(topology)
+
+        if partitions is None:
+            partitions = ParallelEventSimulator.partition_topology(topology,
+                    numPartitions)
+
+        self.__topology = topology
+        self.__partitions = dict(partitions)
+        self.__numPartitions = max(partitions.values()) + 1
+        self.__lookahead = ParallelEventSimulator.compute_lookahead(topology,
+                self.__partitions)
+        self.__flows: List[Flow] = []
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_partitions(self):
+        return self.__partitions
+
+    def get_lookahead(self):
+        return self.__lookahead
+
+    def add_flow(self, flowToAdd: Flow):
+        """ Adds a flow to the simulation (see `EventSimulator.add_flow`). """
+        # Let a simulator check the flow
+        simulator = EventSimulator(self.__topology)
+        for flow in self.__flows + [flowToAdd]:
+            simulator.add_flow(flow)
+
+        self.__flows.append(flowToAdd)
+
+    def get_flows(self):
+        return self.__flows
+
+    def run(self):
+        """ Runs the simulation until every packet is delivered.
+
+        RETURNS:
+        - A `SimulationResult` object (the same as `EventSimulator.run`
+                returns).
+
+        RAISES:
+        - Exception if a node doesn't use a `FifoScheduler`.
+        """
+        ParallelEventSimulator.__check_schedulers(self.__topology)
+
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            startTime = perf_counter()
+
+        description = self.__topology.to_description()
+        flowsData = [(flow.get_name(),
+                        [node.get_name() for node in flow.get_path()],
+                        flow.get_packet_sizes(), flow.get_injection_times(),
+                        flow.get_traffic_class())
+                for flow in self.__flows]
+
+        connectionsList = []
+        processesList = []
+        for partition in range(0, self.__numPartitions):
+            parentConnection, childConnection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                    target=ParallelEventSimulator.run_worker,
+                    args=(childConnection, description, flowsData,
+                            self.__partitions, partition))
+            process.start()
+            childConnection.close()
+            connectionsList.append(parentConnection)
+            processesList.append(process)
+
+        try:
+            nextTimes = [connection.recv() for connection in connectionsList]
+
+            # Arrivals waiting to be sent to each partition
+            pendingList: List[List[Tuple[np.ndarray, np.ndarray,
+                    np.ndarray]]] = [[] for _ in connectionsList]
+            numWindows = 0
+
+            while True:
+                windowStart = min(nextTimes + [float(arrivals[0].min())
+                        for pending in pendingList for arrivals in pending])
+                if windowStart == float("inf"):
+                    break
+
+                windowEnd = windowStart + self.__lookahead
+                for partition, connection in enumerate(connectionsList):
+                    connection.send(("run", windowEnd,
+                            ParallelEventSimulator.__concatenate(
+                                    pendingList[partition])))
+                    pendingList[partition] = []
+
+                for partition, connection in enumerate(connectionsList):
+                    outgoing, nextTimes[partition] = connection.recv()
+                    for destination, arrivals in outgoing.items():
+                        pendingList[destination].append(arrivals)
+                numWindows += 1
+
+            resultsList: List[SimulationResult] = []
+            for connection in connectionsList:
+                connection.send(("finish",))
+                resultsList.append(connection.recv())
+        finally:
+            for connection in connectionsList:
+                connection.close()
+            for process in processesList:
+                process.join()
+
+        result = self.__merge_results(resultsList)
+
+        if tracer is not None:
+            tracer.count("events", result.get_num_events())
+            tracer.count("windows", numWindows)
+            tracer.add_time("parallel_simulator_run", perf_counter() -
+                    startTime)
+
+        return result
+
+    @staticmethod
+    def partition_topology(topology: Topology, numPartitions: int):
+        """ Splits a topology into partitions joined by long links.
+
+        Nodes are merged along their links from the shortest (in propagation
+            delay) up, until only `numPartitions` groups are left. This keeps
+            the longest links between partitions, which makes the lookahead
+            as large as possible.
+
+        RETURNS:
+        - A node name -> partition number dictionary.
+        """
+        nodesList = topology.get_nodes()
+        parents = {node.get_name(): node.get_name() for node in nodesList}
+
+        def find(name: str):
+            while parents[name] != name:
+                parents[name] = parents[parents[name]]
+                name = parents[name]
+            return name
+
+        edgesList = []
+        for node in nodesList:
+            for nextNode, link in topology.get_neighbours(node):
+                edgesList.append((link.get_propagation_delay(),
+                        node.get_name(), nextNode.get_name()))
+        edgesList.sort()
+
+        numGroups = len(nodesList)
+        for _, name, nextName in edgesList:
+            if numGroups <= numPartitions:
+                break
+            root, nextRoot = find(name), find(nextName)
+            if root != nextRoot:
+                parents[root] = nextRoot
+                numGroups -= 1
+
+        partitionOf: Dict[str, int] = {}
+        partitions: Dict[str, int] = {}
+        for node in nodesList:
+            root = find(node.get_name())
+            if root not in partitionOf:
+                partitionOf[root] = len(partitionOf)
+            partitions[node.get_name()] = partitionOf[root]
+        return partitions
+
+    @staticmethod
+    def compute_lookahead(topology: Topology, partitions: Dict[str, int]):
+        """ Returns the smallest propagation delay of the links between
+                partitions (infinity if there are none).
+
+        RAISES:
+        - Exception if one of those links has no propagation delay.
+        """
+        lookahead = float("inf")
+        for node in topology.get_nodes():
+            for nextNode, link in topology.get_neighbours(node):
+                if partitions[node.get_name()] == \
+                        partitions[nextNode.get_name()]:
+                    continue
+
+                if link.get_propagation_delay() <= 0:
+                    raise Exception("Link between {} and {} joins two "
+                            "partitions but has no propagation delay".format(
+                                node.get_name(), nextNode.get_name()))
+                lookahead = min(lookahead, link.get_propagation_delay())
+        return lookahead
+
+    @staticmethod
+    def run_worker(connection: Any, description: Dict[str, Any],
+            flowsData: List[Tuple[str, List[str], np.ndarray, np.ndarray,
+                    int]],
+            partitions: Dict[str, int], partition: int):
+        """ Simulates a single partition (in a worker process).
+
+        Sends the time of its first event, then for every window receives
+            ("run", window end, arrivals) and replies with the packets sent to
+            other partitions and the time of its next event. Sends the
+            partition's `SimulationResult` when it receives ("finish",).
+        """
+        topology = Topology.from_description(description)
+        simulator = EventSimulator(topology, ownedNodes=[node
+                for node in topology.get_nodes()
+                if partitions[node.get_name()] == partition])
+        for name, pathNames, packetSizes, injectionTimes, trafficClass in \
+                flowsData:
+            simulator.add_flow(Flow(name=name,
+                    path=[topology.get_node(nodeName)
+                            for nodeName in pathNames],
+                    packetSizes=packetSizes, injectionTimes=injectionTimes,
+                    trafficClass=trafficClass))
+
+        connection.send(simulator.get_next_event_time())
+
+        while True:
+            message = connection.recv()
+            if message[0] == "finish":
+                connection.send(simulator.get_result())
+                break
+
+            _, windowEnd, (arrivalTimes, packetIds, hops) = message
+            for arrivalTime, packetId, hop in zip(arrivalTimes.tolist(),
+                    packetIds.tolist(), hops.tolist()):
+                simulator.add_arrival(packetId, hop, arrivalTime)
+
+            simulator.advance(until=windowEnd)
+
+            # Group the packets sent to other partitions by destination
+            outgoingLists: Dict[int, List[Tuple[float, int, int]]] = {}
+            for arrivalTime, packetId, hop, node in \
+                    simulator.pop_remote_arrivals():
+                outgoingLists.setdefault(partitions[node.get_name()], [])\
+                        .append((arrivalTime, packetId, hop))
+
+            outgoing = {destination: ParallelEventSimulator.__to_arrays(
+                            arrivalsList)
+                    for destination, arrivalsList in outgoingLists.items()}
+            connection.send((outgoing, simulator.get_next_event_time()))
+
+        connection.close()
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    @staticmethod
+    def __check_schedulers(topology: Topology):
+        """ Raises if a node's ports wouldn't be FIFO (the workers couldn't
+                reproduce its scheduler). """
+        for node in topology.get_nodes():
+            if type(node.get_scheduler()) is not FifoScheduler:
+                raise Exception("Node {} uses a {}, but the parallel "
+                        "simulator only supports FifoScheduler nodes".format(
+                                node.get_name(),
+                                type(node.get_scheduler()).__name__))
+
+    def __merge_results(self, resultsList: List[SimulationResult]):
+        """ Combines the results of every partition (each only has the times
+                at its own nodes, and NaN elsewhere). """
+        flowResults: Dict[str, BatchPathResult] = {}
+        for flow in self.__flows:
+            partsList = [result.get_flow_result(flow.get_name())
+                    for result in resultsList]
+
+            arraysList = []
+            for getter in ("get_arrival_times", "get_queue_stop_times",
+                    "get_processing_stop_times", "get_transmission_stop_times",
+                    "get_propagation_stop_times"):
+                merged = getattr(partsList[0], getter)()
+                for part in partsList[1:]:
+                    merged = np.fmax(merged, getattr(part, getter)())
+                arraysList.append(merged)
+
+            numHops = len(flow.get_path()) - 1
+            flowResults[flow.get_name()] = BatchPathResult(
+                    nodeNames=partsList[0].get_node_names(),
+                    injectionTimes=flow.get_injection_times(),
+                    hopTimesList=[HopTimes(*[array[:, hop]
+                            for array in arraysList])
+                            for hop in range(0, numHops)],
+                    destinationName=flow.get_path()[-1].get_name())
+
+        return SimulationResult(flowResults=flowResults,
+                numEvents=sum(result.get_num_events()
+                        for result in resultsList),
+                endTime=max(result.get_end_time() for result in resultsList))
+
+    @staticmethod
+    def __to_arrays(arrivalsList: List[Tuple[float, int, int]]):
+        """ Packs (arrival time, packet id, hop) tuples into three arrays. """
+        return (np.array([arrival[0] for arrival in arrivalsList],
+                        dtype=np.float64),
+                np.array([arrival[1] for arrival in arrivalsList],
+                        dtype=np.int64),
+                np.array([arrival[2] for arrival in arrivalsList],
+                        dtype=np.int32))
+
+    @staticmethod
+    def __concatenate(arraysList: List[Tuple[np.ndarray, np.ndarray,
+            np.ndarray]]):
+        if len(arraysList) == 0:
+            return ParallelEventSimulator.__to_arrays([])
+        return tuple(np.concatenate(arrays) for arrays in zip(*arraysList))
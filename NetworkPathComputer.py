@@ -1,38 +1,123 @@
 # Standard libs
+from time import perf_counter
 from typing import List
+from typing import Optional
 
 # Local libs
 from NetworkComponents import Node
 from NetworkComponents import TimeBlock
 from NetworkComponents import Link
 
+from NetworkTopology import Topology
+
 from NetworkHelpers import TimeBlockTypes
-from NetworkHelpers import __DEBUG_ENABLED__
+
+import NetworkTracing
 
 class NetworkPathComputer:
     def __init__(self):
         pass
+
+    @staticmethod
+    def find_link(currentNode: Node, nextNode: Node,
+            topology: Optional[Topology] = None):
+        """ Finds the link connecting the `currentNode` to the `nextNode`.
+
+        ARGS:
+        - currentNode: The node the packet is currently sitting at.
+        - nextNode: The node the packet wants to go to.
+        - topology: A topology containing both nodes. If given, its link
+                index is used instead of scanning the links of both nodes.
+
+        RAISES:
+        - Exception if the two nodes don't share a link.
+        """
+        currentLink = None
+
+        if topology is not None:
+            currentLink = topology.get_link(currentNode, nextNode)
+        else:
+            nextLinks = set(id(link) for link in nextNode.get_links())
+            for link in currentNode.get_links():
+                if id(link) in nextLinks:
+                    currentLink = link
+                    break
+
+        if not isinstance(currentLink, Link):
+            raise Exception("Couldn't find link to next " + \
+                    "node CN: {} NN: {}".format(
+                        currentNode.get_name(), 
+                        nextNode.get_name()))
+
+        return currentLink
     
+    @staticmethod
+    def check_path_length(path: List[Node]):
+        """ Makes sure a path has at least one hop.
+
+        RAISES:
+        - Exception if the path has fewer than 2 nodes (a source and a
+                destination).
+        """
+        if len(path) < 2:
+            raise Exception("Need a path of at least 2 nodes (a source and a "
+                    "destination), got {}".format(
+                        [node.get_name() for node in path]))
+
+    @staticmethod
+    def check_packet_switched(currentNode: Node):
+        """ Makes sure packets are stored and forwarded at a node.
+
+        Circuit switched segments are solved in closed form for a whole
+            transfer by `NetworkBatchSolver.solve_path`, rather than packet by
+            packet.
+
+        RAISES:
+        - Exception if the node is circuit switched.
+        """
+        if currentNode.is_circuit_switched():
+            raise Exception("Node {} is circuit switched, solve the path with "
+                    "NetworkBatchSolver.solve_path instead".format(
+                        currentNode.get_name()))
+
     @staticmethod
     def compute_path_step(currentNode: Node, nextNode: Node, t0: float, 
-            previousBlocksList: List[TimeBlock]):
+            previousBlocksList: List[TimeBlock],
+            topology: Optional[Topology] = None):
         """ Computes a given step in the network path.
 
-        Takes the packet at the top of the queue of the `currentNode` and
-            computes all time delays associated with moving said packet
-            to the `nextNode`.
+        Takes the next packet to serve from the queue of the `currentNode`
+            (as picked by its scheduler) and computes all time delays
+            associated with moving said packet to the `nextNode`. The blocks
+            are tagged with the packet's traffic class.
 
         ARGS:
         - currentNode: The node the packet is currently sitting at.
         - nextNode: The node the packet wants to go to.
         - t0: The time the packet arrived in the current node.
+        - previousBlocksList: The blocks the previous packet generated at
+                this node (used to determine the queuing delay).
+        - topology: The topology containing both nodes (optional, makes the
+                link lookup a single dictionary lookup).
 
         RETURNS:
+        - The list of time blocks of the packet at this step (the queue block
+                is only present if the packet had to wait).
 
+        RAISES:
+        - Exception if `currentNode` is circuit switched (see
+                `check_packet_switched`).
         """
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            startTime = perf_counter()
+
+        NetworkPathComputer.check_packet_switched(currentNode)
+
         returnBlocks: List[TimeBlock] = []
         
         currentPacket = currentNode.get_next_packet()
+        trafficClass = currentPacket.get_traffic_class()
 
         queuingDelay = 0
 
@@ -45,7 +130,8 @@ class NetworkPathComputer:
                     returnBlocks.append(TimeBlock(
                             delayType=TimeBlockTypes.QUEUING_DELAY,
                             startTime=t0,
-                            stopTime=stopTime))
+                            stopTime=stopTime,
+                            trafficClass=trafficClass))
 
                     # Factor the queuing delay for our answers
                     queuingDelay = stopTime - t0
@@ -61,27 +147,13 @@ class NetworkPathComputer:
         returnBlocks.append(
                 TimeBlock(delayType=TimeBlockTypes.PROCESSING_DELAY,
                         startTime=t1,
-                        stopTime=t2))
+                        stopTime=t2,
+                        trafficClass=trafficClass))
 
         currentPacket.add_delay(lastProcessingDelay + queuingDelay)
 
-        linkFound = False
-
-        # Find a link to the next node
-        for link1 in currentNode.get_links():
-            for link2 in nextNode.get_links():
-                if link1 == link2:
-                    currentLink = link1
-                    linkFound = True
-                    break
-            if linkFound:
-                break
-            
-        if not isinstance(currentLink, Link):
-            raise Exception("Couldn't find link to next " + \
-                    "node CN: {} NN: {}".format(
-                        currentNode.get_name(), 
-                        nextNode.get_name()))
+        currentLink = NetworkPathComputer.find_link(currentNode, nextNode,
+                topology)
         
         # Add the transmission delay to the list of blocks
 
@@ -93,7 +165,8 @@ class NetworkPathComputer:
         returnBlocks.append(
                 TimeBlock(delayType=TimeBlockTypes.TRANSMISSION_DELAY,
                         startTime=t2,
-                        stopTime=t3))
+                        stopTime=t3,
+                        trafficClass=trafficClass))
 
         currentPacket.add_delay(lastTransmissionDelay)
 
@@ -107,18 +180,16 @@ class NetworkPathComputer:
         returnBlocks.append(
                 TimeBlock(delayType=TimeBlockTypes.PROPAGATION_DELAY,
                         startTime=t3,
-                        stopTime=t4))
+                        stopTime=t4,
+                        trafficClass=trafficClass))
 
         # Place the packet into the next node
         nextNode.add_packet_to_queue(currentPacket)
         
-        # print out the steps
-        if __DEBUG_ENABLED__:
-            print("\nFinished Queue: {}ms, ".format(round((t1)*1000,5)), end="")
-            print("Finished Processing: {}ms, ".format(
-                    round((t2)*1000,5)), end="") 
-            print("Finished transmission: {}ms, ".format(
-                    round((t3)*1000,5)), end="")
-            print("Finished Propagation: {}ms\n".format(round((t4)*1000,5)))
-
-        return returnBlocks
\ No newline at end of file
+        # Trace the step
+        if tracer is not None:
+            tracer.on_hop(currentNode.get_name(), nextNode.get_name(), t0, t1,
+                    t2, t3, t4)
+            tracer.add_time("compute_path_step", perf_counter() - startTime)
+
+        return returnBlocks
@@ -0,0 +1,174 @@
+# Standard libs
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Local libs
+from NetworkComponents import Node
+
+from NetworkPathComputer import NetworkPathComputer
+
+from NetworkTopology import Topology
+
+import NetworkTracing
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class PacketDelivery:
+    __slots__ = ("__packetNum", "__injectionTime", "__delay", "__hopTimes")
+
+    def __init__(self, packetNum: int, injectionTime: float, delay: float,
+            hopTimes: List[Tuple[float, float, float, float, float]]):
+        """ The delivery of a single packet at the end of a path.
+
+        ARGS:
+        - packetNum: Position of the packet in the stream.
+        - injectionTime: Time the packet was placed in the source's queue.
+        - delay: The accumulated (end-to-end) delay of the packet.
+        - hopTimes: Per hop (arrival, queue stop, processing stop,
+                transmission stop, propagation stop) times.
+        """
+        self.__packetNum = packetNum
+        self.__injectionTime = injectionTime
+        self.__delay = delay
+        self.__hopTimes = hopTimes
+
+    def get_packet_num(self):
+        return self.__packetNum
+
+    def get_injection_time(self):
+        return self.__injectionTime
+
+    def get_delay(self):
+        """ The end-to-end delay, accumulated the same way as
+                `Packet.get_delay`. """
+        return self.__delay
+
+    def get_delivery_time(self):
+        return self.__hopTimes[-1][4]
+
+    def get_hop_times(self):
+        return self.__hopTimes
+
+    def get_queuing_delays(self):
+        return [t1 - t0 for t0, t1, _, _, _ in self.__hopTimes]
+
+    def get_processing_delays(self):
+        return [t2 - t1 for _, t1, t2, _, _ in self.__hopTimes]
+
+    def get_transmission_delays(self):
+        return [t3 - t2 for _, _, t2, t3, _ in self.__hopTimes]
+
+    def get_propagation_delays(self):
+        return [t4 - t3 for _, _, _, t3, t4 in self.__hopTimes]
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class PathStreamer:
+    def __init__(self, path: List[Node], topology: Optional[Topology] = None):
+        """ Computes packet deliveries along a path one packet at a time.
+
+        Only the transmission stop time of the last packet at each hop is
+            kept between packets (that's all the queuing recurrence needs),
+            so a stream of any length runs in constant memory. The times are
+            computed exactly like `NetworkPathComputer.compute_path_step`
+            does, but without touching the node queues.
+
+        ARGS:
+        - path: The nodes the packets travel through (first is the source,
+                last is the destination).
+        - topology: The topology containing the path (optional, used to look
+                up the links between the nodes).
+
+        RAISES:
+        - Exception if a node of the path (other than the destination) is
+                circuit switched.
+        """
+        self.__path = path
+        self.__nodeNames = [node.get_name() for node in path]
+
+        self.__procDelays: List[float] = []
+        self.__links = []
+        for i in range(0, len(path) - 1):
+            NetworkPathComputer.check_packet_switched(path[i])
+            self.__procDelays.append(path[i].get_processing_delay())
+            self.__links.append(NetworkPathComputer.find_link(path[i],
+                    path[i + 1], topology))
+
+        self.__propDelays = [link.get_propagation_delay()
+                for link in self.__links]
+
+        self.reset()
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def reset(self):
+        """ Forgets every packet sent so far (the path is empty again). """
+        self.__lastTransmissionStops: List[Optional[float]] = \
+                [None]*len(self.__links)
+        self.__packetNum = 0
+
+    def get_last_transmission_stops(self):
+        return list(self.__lastTransmissionStops)
+
+    def push(self, packetSize: float, t0: float = 0.0):
+        """ Sends a single packet down the path.
+
+        ARGS:
+        - packetSize: The size of the packet in bits.
+        - t0: The time the packet is placed in the source node's queue.
+
+        RETURNS:
+        - A `PacketDelivery` object.
+        """
+        lastStops = self.__lastTransmissionStops
+        injectionTime = t0
+        delay = 0.0
+        hopTimes: List[Tuple[float, float, float, float, float]] = []
+
+        for i in range(0, len(self.__links)):
+            queuingDelay = 0
+            stopTime = lastStops[i]
+            if stopTime is not None and stopTime > t0:
+                queuingDelay = stopTime - t0
+
+            t1 = t0 + queuingDelay
+            t2 = t1 + self.__procDelays[i]
+            delay += self.__procDelays[i] + queuingDelay
+
+            transmissionDelay = self.__links[i].get_transmission_delay(
+                    packetSize)
+            t3 = t2 + transmissionDelay
+            delay += transmissionDelay
+
+            t4 = t3 + self.__propDelays[i]
+            delay += self.__propDelays[i]
+
+            lastStops[i] = t3
+            hopTimes.append((t0, t1, t2, t3, t4))
+            t0 = t4
+
+        delivery = PacketDelivery(packetNum=self.__packetNum,
+                injectionTime=injectionTime, delay=delay, hopTimes=hopTimes)
+
+        tracer = NetworkTracing.TRACER
+        if tracer is not None:
+            for i in range(0, len(hopTimes)):
+                tracer.on_hop(self.__nodeNames[i], self.__nodeNames[i + 1],
+                        *hopTimes[i])
+            tracer.on_packet_delivered(self.__packetNum, delay)
+
+        self.__packetNum += 1
+        return delivery
+
+    def stream(self, packets: Iterable[Tuple[float, float]]):
+        """ Lazily yields a `PacketDelivery` for every packet, as soon as it
+                has been computed.
+
+        ARGS:
+        - packets: (packet size in bits, injection time) pairs, in queue order
+                (e.g. a generator reading a trace).
+        """
+        for packetSize, t0 in packets:
+            yield self.push(packetSize, t0)
@@ -0,0 +1,170 @@
+# Standard libs
+from heapq import heappop
+from heapq import heappush
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Local libs
+from NetworkComponents import Link
+from NetworkComponents import Node
+
+from NetworkTopology import Topology
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class RoutingTable:
+    def __init__(self, source: Node, packetSize: float,
+            latencies: Dict[Node, float],
+            previousHops: Dict[Node, Tuple[Node, Link]]):
+        """ Minimum latency routes from a single source to every reachable
+                node (the result of running Dijkstra from `source`). """
+        self.__source = source
+        self.__packetSize = packetSize
+        self.__latencies = latencies
+        self.__previousHops = previousHops
+
+        # destination -> path, filled in as paths are asked for
+        self.__paths: Dict[Node, List[Node]] = {}
+
+    def get_source(self):
+        return self.__source
+
+    def get_packet_size(self):
+        return self.__packetSize
+
+    def get_latency(self, destination: Node):
+        """ Returns the (unloaded) latency of a single packet from the source
+                to `destination`, or None if it isn't reachable. """
+        return self.__latencies.get(destination)
+
+    def get_path(self, destination: Node):
+        """ Returns the list of nodes from the source to `destination`, or
+                None if it isn't reachable. """
+        path = self.__paths.get(destination)
+        if path is not None:
+            return path
+
+        if destination not in self.__latencies:
+            return None
+
+        path = [destination]
+        while path[-1] is not self.__source:
+            path.append(self.__previousHops[path[-1]][0])
+        path.reverse()
+
+        self.__paths[destination] = path
+        return path
+
+    def get_next_hop(self, destination: Node):
+        """ Returns the node the source should forward to in order to reach
+                `destination` (None if unreachable or it's the source). """
+        path = self.get_path(destination)
+        if path is None or len(path) < 2:
+            return None
+        return path[1]
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class Router:
+    def __init__(self, topology: Topology):
+        """ Computes minimum latency paths over a topology.
+
+        The cost of a hop from node u to node v over link l is the time a
+            single packet takes to make it without queuing:
+
+            u's processing delay + l's transmission delay (for the packet
+            size) + l's propagation delay
+
+        A routing table is computed per (source, packet size) the first time
+            it's needed and cached. The cache is thrown away only when a node
+            or link in the topology changes, so after warm-up a path lookup
+            is a couple of dictionary lookups.
+        """
+        self.__topology = topology
+        self.__tables: Dict[Tuple[Node, float], RoutingTable] = {}
+        self.__topologyVersion = topology.get_version()
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_topology(self):
+        return self.__topology
+
+    def get_routing_table(self, source: Node, packetSize: float):
+        """ Returns the (cached) routing table of `source` for packets of
+                `packetSize` bits. """
+        if self.__topology.get_version() != self.__topologyVersion:
+            self.invalidate()
+
+        key = (source, packetSize)
+        table = self.__tables.get(key)
+        if table is None:
+            table = self.__compute_routing_table(source, packetSize)
+            self.__tables[key] = table
+        return table
+
+    def get_path(self, source: Node, destination: Node, packetSize: float):
+        """ Returns the minimum latency path from `source` to `destination`.
+
+        RAISES:
+        - Exception if `destination` can't be reached from `source`.
+        """
+        path = self.get_routing_table(source, packetSize).get_path(
+                destination)
+        if path is None:
+            raise Exception("Couldn't find a route from {} to {}".format(
+                    source.get_name(), destination.get_name()))
+        return path
+
+    def get_latency(self, source: Node, destination: Node,
+            packetSize: float):
+        """ Returns the unloaded latency of the minimum latency path (None if
+                `destination` can't be reached). """
+        return self.get_routing_table(source, packetSize).get_latency(
+                destination)
+
+    def invalidate(self):
+        """ Throws away every cached routing table. """
+        self.__tables = {}
+        self.__topologyVersion = self.__topology.get_version()
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __compute_routing_table(self, source: Node, packetSize: float):
+        """ Dijkstra's algorithm from `source`. """
+        latencies: Dict[Node, float] = {}
+        previousHops: Dict[Node, Tuple[Node, Link]] = {}
+        bestLatencies: Dict[Node, float] = {source: 0.0}
+
+        # (latency, tie breaker, node, previous node, link)
+        heap: List[Tuple[float, int, Node, Optional[Node], Optional[Link]]] \
+                = [(0.0, 0, source, None, None)]
+        counter = 1
+
+        while heap:
+            latency, _, node, previousNode, link = heappop(heap)
+            if node in latencies:
+                continue
+
+            latencies[node] = latency
+            if previousNode is not None:
+                previousHops[node] = (previousNode, link)
+
+            processingDelay = node.get_processing_delay()
+            for nextNode, nextLink in self.__topology.get_neighbours(node):
+                if nextNode in latencies:
+                    continue
+
+                nextLatency = latency + processingDelay + \
+                        nextLink.get_transmission_delay(packetSize) + \
+                        nextLink.get_propagation_delay()
+
+                if nextLatency < bestLatencies.get(nextNode, float("inf")):
+                    bestLatencies[nextNode] = nextLatency
+                    heappush(heap, (nextLatency, counter, nextNode, node,
+                            nextLink))
+                    counter += 1
+
+        return RoutingTable(source=source, packetSize=packetSize,
+                latencies=latencies, previousHops=previousHops)
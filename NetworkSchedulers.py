@@ -0,0 +1,267 @@
+# Standard libs
+from collections import deque
+from heapq import heappop
+from heapq import heappush
+from itertools import chain
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# * MAIN CLASSES ---------------------------------------------------------------
+
+# Every scheduler holds the packets waiting at a node and decides which one is
+# served next. They all have the same API:
+#
+# - enqueue(packet): Adds a packet (anything with `get_packet_size` and
+#       `get_traffic_class`, e.g. a `Packet` or `StoredPacket`).
+# - dequeue(): Removes and returns the next packet to serve (raises
+#       IndexError if there's none).
+# - clear(), len() and iteration over the waiting packets.
+# - copy_empty(): Returns a new, empty scheduler with the same settings (e.g.
+#       one per output port of a node, see `NetworkEventSimulator.py`).
+
+class FifoScheduler:
+    def __init__(self):
+        """ First in, first out (O(1) enqueue and dequeue). """
+        self.__queue: Deque[Any] = deque()
+
+    def __len__(self):
+        return len(self.__queue)
+
+    def __iter__(self):
+        return iter(self.__queue)
+
+    def enqueue(self, packet: Any):
+        self.__queue.append(packet)
+
+    def extend(self, packets: Any):
+        self.__queue.extend(packets)
+
+    def dequeue(self):
+        return self.__queue.popleft()
+
+    def clear(self):
+        self.__queue.clear()
+
+    def copy_empty(self):
+        return FifoScheduler()
+
+class StrictPriorityScheduler:
+    def __init__(self):
+        """ Always serves the highest priority class first (the lowest
+                traffic class number), FIFO within a class.
+
+        Each class has its own deque, and a heap holds the classes that have
+            packets waiting, so enqueue and dequeue are O(log classes).
+        """
+        self.__queues: Dict[int, Deque[Any]] = {}
+        self.__activeClasses: List[int] = []
+        self.__numPackets = 0
+
+    def __len__(self):
+        return self.__numPackets
+
+    def __iter__(self):
+        """ Iterates over the waiting packets in the order they'd be served.
+        """
+        return chain.from_iterable(self.__queues[trafficClass]
+                for trafficClass in sorted(self.__activeClasses))
+
+    def enqueue(self, packet: Any):
+        trafficClass = packet.get_traffic_class()
+        queue = self.__queues.get(trafficClass)
+        if queue is None:
+            queue = self.__queues[trafficClass] = deque()
+        if not queue:
+            heappush(self.__activeClasses, trafficClass)
+        queue.append(packet)
+        self.__numPackets += 1
+
+    def extend(self, packets: Any):
+        for packet in packets:
+            self.enqueue(packet)
+
+    def dequeue(self):
+        if not self.__activeClasses:
+            raise IndexError("dequeue from an empty scheduler")
+
+        queue = self.__queues[self.__activeClasses[0]]
+        packet = queue.popleft()
+        if not queue:
+            heappop(self.__activeClasses)
+        self.__numPackets -= 1
+        return packet
+
+    def clear(self):
+        self.__queues = {}
+        self.__activeClasses = []
+        self.__numPackets = 0
+
+    def copy_empty(self):
+        return StrictPriorityScheduler()
+
+class WeightedFairScheduler:
+    def __init__(self, weights: Optional[Dict[int, float]] = None,
+            defaultWeight: float = 1.0):
+        """ Weighted fair queueing: each class gets a share of the link in
+                proportion to its weight.
+
+        This is the self-clocked variant: a packet's virtual finish time is
+
+            max(virtual time, finish time of the class's last packet)
+                + packet size / class weight
+
+            where the virtual time is the finish time of the packet last
+            served. Packets are served in order of finish time, kept in a
+            heap (O(log n) enqueue and dequeue).
+
+        ARGS:
+        - weights: Traffic class -> weight.
+        - defaultWeight: Weight of the classes not in `weights`.
+        """
+        self.__weights = dict(weights or {})
+        self.__defaultWeight = defaultWeight
+
+        # (finish time, arrival order, packet)
+        self.__heap: List[Tuple[float, int, Any]] = []
+        self.__lastFinishTimes: Dict[int, float] = {}
+        self.__virtualTime = 0.0
+        self.__counter = 0
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def __iter__(self):
+        """ Iterates over the waiting packets in the order they'd be served.
+        """
+        return (packet for _, _, packet in sorted(self.__heap,
+                key=lambda entry: entry[:2]))
+
+    def get_weight(self, trafficClass: int):
+        return self.__weights.get(trafficClass, self.__defaultWeight)
+
+    def enqueue(self, packet: Any):
+        trafficClass = packet.get_traffic_class()
+        finishTime = max(self.__virtualTime,
+                self.__lastFinishTimes.get(trafficClass, 0.0)) + \
+                packet.get_packet_size()/self.get_weight(trafficClass)
+        self.__lastFinishTimes[trafficClass] = finishTime
+
+        heappush(self.__heap, (finishTime, self.__counter, packet))
+        self.__counter += 1
+
+    def extend(self, packets: Any):
+        for packet in packets:
+            self.enqueue(packet)
+
+    def dequeue(self):
+        if not self.__heap:
+            raise IndexError("dequeue from an empty scheduler")
+
+        finishTime, _, packet = heappop(self.__heap)
+        self.__virtualTime = finishTime
+        return packet
+
+    def clear(self):
+        self.__heap = []
+        self.__lastFinishTimes = {}
+        self.__virtualTime = 0.0
+
+    def copy_empty(self):
+        return WeightedFairScheduler(weights=self.__weights,
+                defaultWeight=self.__defaultWeight)
+
+class DeficitRoundRobinScheduler:
+    def __init__(self, quanta: Optional[Dict[int, float]] = None,
+            defaultQuantum: float = 12000):
+        """ Deficit round robin: the classes take turns, each sending up to
+                its quantum (in bits) per turn, with unused credit carried
+                over to its next turn.
+
+        Each class has its own deque and the classes with packets waiting are
+            kept in a deque of turns, so enqueue is O(1) and dequeue is O(1)
+            amortised (as long as the quanta aren't much smaller than the
+            packets).
+
+        ARGS:
+        - quanta: Traffic class -> quantum (bits per turn).
+        - defaultQuantum: Quantum of the classes not in `quanta`.
+        """
+        self.__quanta = dict(quanta or {})
+        self.__defaultQuantum = defaultQuantum
+
+        self.__queues: Dict[int, Deque[Any]] = {}
+        self.__deficits: Dict[int, float] = {}
+        self.__activeClasses: Deque[int] = deque()
+        self.__turnStarted = False
+        self.__numPackets = 0
+
+    def __len__(self):
+        return self.__numPackets
+
+    def __iter__(self):
+        """ Iterates over the waiting packets, class by class (not in the
+                order they'd be served). """
+        return chain.from_iterable(self.__queues[trafficClass]
+                for trafficClass in self.__activeClasses)
+
+    def get_quantum(self, trafficClass: int):
+        return self.__quanta.get(trafficClass, self.__defaultQuantum)
+
+    def enqueue(self, packet: Any):
+        trafficClass = packet.get_traffic_class()
+        queue = self.__queues.get(trafficClass)
+        if queue is None:
+            queue = self.__queues[trafficClass] = deque()
+        if not queue:
+            self.__activeClasses.append(trafficClass)
+            self.__deficits[trafficClass] = 0.0
+        queue.append(packet)
+        self.__numPackets += 1
+
+    def extend(self, packets: Any):
+        for packet in packets:
+            self.enqueue(packet)
+
+    def dequeue(self):
+        if not self.__activeClasses:
+            raise IndexError("dequeue from an empty scheduler")
+
+        while True:
+            trafficClass = self.__activeClasses[0]
+            if not self.__turnStarted:
+                self.__deficits[trafficClass] += self.get_quantum(
+                        trafficClass)
+                self.__turnStarted = True
+
+            queue = self.__queues[trafficClass]
+            packetSize = queue[0].get_packet_size()
+            if packetSize <= self.__deficits[trafficClass]:
+                self.__deficits[trafficClass] -= packetSize
+                packet = queue.popleft()
+                self.__numPackets -= 1
+
+                if not queue:
+                    # An idle class doesn't keep its credit
+                    self.__deficits[trafficClass] = 0.0
+                    self.__activeClasses.popleft()
+                    self.__turnStarted = False
+                return packet
+
+            # Not enough credit left, it's the next class's turn
+            self.__activeClasses.rotate(-1)
+            self.__turnStarted = False
+
+    def clear(self):
+        self.__queues = {}
+        self.__deficits = {}
+        self.__activeClasses = deque()
+        self.__turnStarted = False
+        self.__numPackets = 0
+
+    def copy_empty(self):
+        return DeficitRoundRobinScheduler(quanta=self.__quanta,
+                defaultQuantum=self.__defaultQuantum)
@@ -0,0 +1,375 @@
+# Standard libs
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkRouter import Router
+
+from NetworkTopology import Topology
+
+from NetworkTopologyLoader import TopologyLoader
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Number of answers kept in the result cache
+DEFAULT_CACHE_SIZE = 4096
+
+# Largest request (one line of JSON) accepted, in bytes
+MAX_REQUEST_SIZE = 1 << 20
+
+# Most packets a delay query may ask for
+DEFAULT_MAX_PACKETS = 1 << 20
+
+# Topologies (and their routers) kept by each worker process, by hash
+_workerTopologies: Dict[str, Tuple[Topology, Router]] = {}
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class LatencyService:
+    def __init__(self, maxWorkers: Optional[int] = None,
+            cacheSize: int = DEFAULT_CACHE_SIZE,
+            maxPackets: int = DEFAULT_MAX_PACKETS,
+            topologyDir: Optional[str] = None):
+        """ A long lived service answering latency queries over JSON.
+
+        Clients connect over a Unix socket (or TCP) and send one JSON request
+            per line, getting one JSON response per line back. The supported
+            requests are:
+
+        - {"op": "delay", "topology", "source", "destination", "numPackets",
+                "packetSize", "interval", "perPacket"}: The delivery times
+                and delays of `numPackets` packets of `packetSize` bits,
+                injected `interval` seconds apart (default 0) at `source`
+                and sent to `destination` along the minimum latency route
+                (or along "path", a list of node names, if given). Only a
+                summary is returned unless "perPacket" is true.
+                `numPackets` can be at most `maxPackets`.
+        - {"op": "load", "name", "file"}: Loads (or reloads) a topology
+                file (see `TopologyLoader`). Only available when the service
+                has a `topologyDir`, and `file` must be inside it.
+        - {"op": "topologies"}: The loaded topologies and their hashes.
+        - {"op": "ping"}
+
+        Responses are {"ok": true, "result": ..., "cached": ...} or
+            {"ok": false, "error": ...}.
+
+        Topologies stay loaded between requests. Delay queries are computed
+            in a pool of worker processes (which keep their own copy of each
+            topology), and their answers are kept in an LRU cache keyed by
+            the topology's hash and the request's parameters, so repeated
+            queries are answered without leaving the event loop.
+
+        ARGS:
+        - maxWorkers: Number of worker processes (defaults to the number of
+                cores).
+        - cacheSize: Number of answers kept in the cache.
+        - maxPackets: Most packets a delay query may ask for.
+        - topologyDir: Directory clients may load topology files from (with
+                "load"). Clients can't load any files if None.
+        """
+        self.__maxWorkers = maxWorkers
+        self.__cacheSize = cacheSize
+        self.__maxPackets = maxPackets
+        self.__topologyDir = None if topologyDir is None else \
+                os.path.realpath(topologyDir)
+
+        # name -> (hash, description)
+        self.__topologies: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+        # (topology hash, parameters) -> answer, least recently used first
+        self.__cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = \
+                OrderedDict()
+
+        # Answers being computed, so identical concurrent queries share them
+        self.__pending: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__numHits = 0
+        self.__numMisses = 0
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def add_topology(self, name: str, description: Dict[str, Any]):
+        """ Makes a topology (see `Topology.to_description`) available under
+                `name`, replacing any topology with the same name. """
+        # Build it once to make sure it's valid
+        Topology.from_description(description)
+        self.__topologies[name] = (LatencyService.get_description_hash(
+                description), description)
+
+    def load_topology(self, name: str, filePath: str):
+        """ Loads a topology file under `name`. """
+        self.add_topology(name, TopologyLoader.load(filePath).to_description())
+
+    def get_topologies(self):
+        """ Returns a name -> hash dictionary of the loaded topologies. """
+        return {name: topologyHash
+                for name, (topologyHash, _) in self.__topologies.items()}
+
+    def get_cache_stats(self):
+        return {"size": len(self.__cache), "hits": self.__numHits,
+                "misses": self.__numMisses}
+
+    async def handle_request(self, request: Dict[str, Any]):
+        """ Answers a single request (see the class docstring). """
+        try:
+            op = request.get("op")
+            if op == "ping":
+                return {"ok": True, "result": "pong"}
+            if op == "topologies":
+                return {"ok": True, "result": self.get_topologies()}
+            if op == "load":
+                self.load_topology(request["name"],
+                        self.__get_topology_path(request["file"]))
+                return {"ok": True, "result": self.get_topologies()}
+            if op == "delay":
+                result, cached = await self.__get_delay(request)
+                return {"ok": True, "result": result, "cached": cached}
+            raise Exception("Unknown op {}".format(op))
+        except Exception as exception:
+            return {"ok": False, "error": "{}: {}".format(
+                    type(exception).__name__, exception)}
+
+    async def serve(self, socketPath: Optional[str] = None,
+            host: str = "127.0.0.1", port: int = 8765):
+        """ Serves requests until cancelled, on a Unix socket if
+                `socketPath` is given, otherwise on TCP `host`:`port`. """
+        self.__executor = ProcessPoolExecutor(max_workers=self.__maxWorkers)
+        try:
+            if socketPath is not None:
+                if os.path.exists(socketPath):
+                    os.remove(socketPath)
+                server = await asyncio.start_unix_server(
+                        self.__handle_connection, path=socketPath,
+                        limit=MAX_REQUEST_SIZE)
+            else:
+                server = await asyncio.start_server(self.__handle_connection,
+                        host=host, port=port, limit=MAX_REQUEST_SIZE)
+
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+    @staticmethod
+    def get_description_hash(description: Dict[str, Any]):
+        """ Hash of a topology description (the same for equal topologies,
+                whatever the key order). """
+        return hashlib.sha256(json.dumps(description, sort_keys=True)\
+                .encode()).hexdigest()[:16]
+
+    @staticmethod
+    def compute_delay(topologyHash: str, description: Dict[str, Any],
+            parameters: Dict[str, Any]):
+        """ Computes the answer to a delay query (in a worker process).
+
+        RETURNS:
+        - A JSON compatible dictionary.
+        """
+        if topologyHash not in _workerTopologies:
+            topology = Topology.from_description(description)
+            _workerTopologies[topologyHash] = (topology, Router(topology))
+        topology, router = _workerTopologies[topologyHash]
+
+        numPackets = parameters["numPackets"]
+        packetSize = parameters["packetSize"]
+
+        if parameters["path"] is not None:
+            path = [topology.get_node(name) for name in parameters["path"]]
+            if None in path:
+                raise Exception("Unknown node in path {}".format(
+                        parameters["path"]))
+        else:
+            source = topology.get_node(parameters["source"])
+            destination = topology.get_node(parameters["destination"])
+            if source is None or destination is None:
+                raise Exception("Unknown source or destination")
+            path = router.get_path(source, destination, packetSize)
+
+        result = NetworkBatchSolver.solve_path(path=path,
+                packetSizes=np.full(numPackets, float(packetSize)),
+                injectionTimes=np.arange(0, numPackets)*parameters["interval"],
+                topology=topology)
+        delays = result.get_end_to_end_delays()
+        deliveryTimes = result.get_delivery_times()
+
+        answer: Dict[str, Any] = {
+            "path": [node.get_name() for node in path],
+            "numPackets": numPackets,
+            "lastDelivery": float(deliveryTimes.max()),
+            "meanDelay": float(delays.mean()),
+            "maxDelay": float(delays.max())
+        }
+        if parameters["perPacket"]:
+            answer["deliveryTimes"] = deliveryTimes.tolist()
+            answer["delays"] = delays.tolist()
+        return answer
+
+    @staticmethod
+    def query(request: Dict[str, Any], socketPath: Optional[str] = None,
+            host: str = "127.0.0.1", port: int = 8765):
+        """ Sends a single request to a running service and returns the
+                response (a blocking helper for tools and scripts). """
+        if socketPath is not None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(socketPath)
+        else:
+            connection = socket.create_connection((host, port))
+
+        with connection, connection.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            return json.loads(stream.readline())
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __get_topology_path(self, fileName: str):
+        """ Returns the path of a topology file a client asked to load.
+
+        RAISES:
+        - Exception if the service has no topology directory, or the file
+                isn't inside it.
+        """
+        if self.__topologyDir is None:
+            raise Exception("Loading topologies isn't enabled (see "
+                    "--topology-dir)")
+
+        filePath = os.path.realpath(os.path.join(self.__topologyDir,
+                fileName))
+        if os.path.commonpath([self.__topologyDir, filePath]) != \
+                self.__topologyDir:
+            raise Exception("{} isn't in the topology directory".format(
+                    fileName))
+        return filePath
+
+    async def __handle_connection(self, reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter):
+        """ Answers the requests sent over a connection, one per line. """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError as exception:
+                    response = {"ok": False,
+                            "error": "Invalid JSON: {}".format(exception)}
+                else:
+                    response = await self.handle_request(request)
+
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def __get_delay(self, request: Dict[str, Any]):
+        """ Returns (answer, whether it came from the cache). """
+        name = request.get("topology", "global")
+        if name not in self.__topologies:
+            raise Exception("Unknown topology {}".format(name))
+        topologyHash, description = self.__topologies[name]
+
+        numPackets = int(request.get("numPackets", 1))
+        if numPackets < 1:
+            raise Exception("numPackets must be at least 1")
+        if numPackets > self.__maxPackets:
+            raise Exception("numPackets must be at most {}".format(
+                    self.__maxPackets))
+
+        parameters = {
+            "source": request.get("source"),
+            "destination": request.get("destination"),
+            "path": request.get("path"),
+            "numPackets": numPackets,
+            "packetSize": float(request.get("packetSize", 8000)),
+            "interval": float(request.get("interval", 0.0)),
+            "perPacket": bool(request.get("perPacket", False))
+        }
+        key = (topologyHash, json.dumps(parameters, sort_keys=True))
+
+        answer = self.__cache.get(key)
+        if answer is not None:
+            self.__cache.move_to_end(key)
+            self.__numHits += 1
+            return answer, True
+
+        pending = self.__pending.get(key)
+        if pending is not None:
+            self.__numHits += 1
+            return await asyncio.shield(pending), True
+
+        self.__numMisses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.__executor,
+                LatencyService.compute_delay, topologyHash, description,
+                parameters)
+        self.__pending[key] = future
+        try:
+            answer = await future
+        finally:
+            del self.__pending[key]
+
+        self.__cache[key] = answer
+        if len(self.__cache) > self.__cacheSize:
+            self.__cache.popitem(last=False)
+        return answer, False
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description="Serves latency queries over a Unix socket or TCP.")
+    parser.add_argument("--socket", default=None,
+            help="Path of the Unix socket to listen on (otherwise TCP).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--topology", action="append", default=[],
+            metavar="NAME=FILE",
+            help="Topology file to load (can be repeated). Defaults to "
+                    "topologies/global_network.json as 'global'.")
+    parser.add_argument("--workers", type=int, default=None,
+            help="Number of worker processes (defaults to the cores).")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    parser.add_argument("--max-packets", type=int,
+            default=DEFAULT_MAX_PACKETS,
+            help="Most packets a delay query may ask for.")
+    parser.add_argument("--topology-dir", default=None,
+            help="Directory clients may load topology files from (with the "
+                    "'load' op). Clients can't load files without it.")
+    args = parser.parse_args()
+
+    service = LatencyService(maxWorkers=args.workers,
+            cacheSize=args.cache_size, maxPackets=args.max_packets,
+            topologyDir=args.topology_dir)
+
+    topologyArgs = args.topology or ["global=" + os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "topologies",
+            "global_network.json")]
+    for topologyArg in topologyArgs:
+        name, _, filePath = topologyArg.partition("=")
+        service.load_topology(name, filePath)
+
+    try:
+        asyncio.run(service.serve(socketPath=args.socket, host=args.host,
+                port=args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,402 @@
+# Standard libs
+import math
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import BatchPathResult
+
+from NetworkHelpers import TimeBlockTypes
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Relative error of the quantiles estimated by a `QuantileSketch`
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Largest number of buckets kept by a `QuantileSketch`
+DEFAULT_MAX_BINS = 2048
+
+# Values at or below this are counted as 0 by a `QuantileSketch`
+MIN_SKETCH_VALUE = 1e-12
+
+# Quantiles reported by `StatisticsSink.get_summary`
+SUMMARY_QUANTILES = (0.5, 0.99, 0.999)
+
+# Flow name used for deliveries that don't say which flow they belong to
+DEFAULT_FLOW_NAME = "default"
+
+# Delay types in the order of the (arrival -> ... -> propagation stop) times
+# of a hop record
+HOP_DELAY_TYPES = (TimeBlockTypes.QUEUING_DELAY,
+        TimeBlockTypes.PROCESSING_DELAY, TimeBlockTypes.TRANSMISSION_DELAY,
+        TimeBlockTypes.PROPAGATION_DELAY)
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class RunningStats:
+    def __init__(self):
+        """ Count, mean, variance, min and max of a stream of values, in
+                constant memory (Welford's algorithm). """
+        self.__count = 0
+        self.__mean = 0.0
+        self.__m2 = 0.0
+        self.__min = math.inf
+        self.__max = -math.inf
+
+    def get_count(self):
+        return self.__count
+
+    def get_mean(self):
+        return self.__mean if self.__count > 0 else math.nan
+
+    def get_variance(self):
+        """ Returns the sample variance (NaN with fewer than 2 values). """
+        return self.__m2/(self.__count - 1) if self.__count > 1 else math.nan
+
+    def get_std(self):
+        return math.sqrt(self.get_variance())
+
+    def get_min(self):
+        return self.__min if self.__count > 0 else math.nan
+
+    def get_max(self):
+        return self.__max if self.__count > 0 else math.nan
+
+    def add(self, value: float):
+        self.__count += 1
+        delta = value - self.__mean
+        self.__mean += delta/self.__count
+        self.__m2 += delta*(value - self.__mean)
+        if value < self.__min:
+            self.__min = value
+        if value > self.__max:
+            self.__max = value
+
+    def add_many(self, values: np.ndarray):
+        """ Adds an array of values (as a single merge, not a loop). """
+        values = np.ravel(np.asarray(values, dtype=np.float64))
+        if len(values) == 0:
+            return
+        mean = float(values.mean())
+        self.__combine(len(values), mean, float(((values - mean)**2).sum()),
+                float(values.min()), float(values.max()))
+
+    def merge(self, other: "RunningStats"):
+        """ Adds the values seen by another `RunningStats`. """
+        if other.__count > 0:
+            self.__combine(other.__count, other.__mean, other.__m2,
+                    other.__min, other.__max)
+
+    def __combine(self, count: int, mean: float, m2: float, minValue: float,
+            maxValue: float):
+        """ Merges the moments of another set of values (Chan et al.). """
+        total = self.__count + count
+        delta = mean - self.__mean
+        self.__m2 += m2 + delta*delta*self.__count*count/total
+        self.__mean += delta*count/total
+        self.__count = total
+        self.__min = min(self.__min, minValue)
+        self.__max = max(self.__max, maxValue)
+
+class QuantileSketch:
+    def __init__(self, relativeAccuracy: float = DEFAULT_RELATIVE_ACCURACY,
+            maxBins: int = DEFAULT_MAX_BINS):
+        """ Estimates quantiles of a stream of non-negative values in bounded
+                memory (a DDSketch).
+
+        Values are counted in logarithmic buckets, bucket i holding the
+            values in (gamma^(i - 1), gamma^i] where
+            gamma = (1 + relativeAccuracy)/(1 - relativeAccuracy), so any
+            quantile is estimated within `relativeAccuracy` of its true
+            value. Sketches with the same accuracy merge exactly, by adding
+            up their buckets.
+
+        If there are ever more than `maxBins` buckets, the lowest ones are
+            collapsed together (so only the lowest quantiles lose accuracy).
+        """
+        if not 0 < relativeAccuracy < 1:
+            raise Exception("relativeAccuracy must be between 0 and 1")
+
+        self.__relativeAccuracy = relativeAccuracy
+        self.__maxBins = maxBins
+        self.__gamma = (1 + relativeAccuracy)/(1 - relativeAccuracy)
+        self.__logGamma = math.log(self.__gamma)
+
+        # Bucket index -> count
+        self.__bins: Dict[int, int] = {}
+        self.__zeroCount = 0
+        self.__count = 0
+
+    def get_relative_accuracy(self):
+        return self.__relativeAccuracy
+
+    def get_count(self):
+        return self.__count
+
+    def get_num_bins(self):
+        return len(self.__bins)
+
+    def add(self, value: float):
+        if value <= MIN_SKETCH_VALUE:
+            self.__zeroCount += 1
+        else:
+            index = math.ceil(math.log(value)/self.__logGamma)
+            self.__bins[index] = self.__bins.get(index, 0) + 1
+            if len(self.__bins) > self.__maxBins:
+                self.__collapse()
+        self.__count += 1
+
+    def add_many(self, values: np.ndarray):
+        """ Adds an array of values (bucketed with NumPy). """
+        values = np.ravel(np.asarray(values, dtype=np.float64))
+        positive = values[values > MIN_SKETCH_VALUE]
+        self.__zeroCount += len(values) - len(positive)
+        self.__count += len(values)
+
+        indexes, counts = np.unique(np.ceil(np.log(positive)/
+                self.__logGamma).astype(np.int64), return_counts=True)
+        bins = self.__bins
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            bins[index] = bins.get(index, 0) + count
+        if len(bins) > self.__maxBins:
+            self.__collapse()
+
+    def merge(self, other: "QuantileSketch"):
+        """ Adds the values seen by another sketch (with the same accuracy).
+        """
+        if other.__gamma != self.__gamma:
+            raise Exception("Can't merge sketches with different accuracies")
+
+        bins = self.__bins
+        for index, count in other.__bins.items():
+            bins[index] = bins.get(index, 0) + count
+        self.__zeroCount += other.__zeroCount
+        self.__count += other.__count
+        if len(bins) > self.__maxBins:
+            self.__collapse()
+
+    def get_quantile(self, q: float):
+        """ Returns an estimate of the `q` quantile (0 to 1), or NaN if the
+                sketch is empty. """
+        if self.__count == 0:
+            return math.nan
+
+        rank = q*(self.__count - 1)
+        seen = self.__zeroCount
+        if seen > rank:
+            return 0.0
+
+        for index in sorted(self.__bins):
+            seen += self.__bins[index]
+            if seen > rank:
+                # Middle of the bucket (in relative terms)
+                return 2*self.__gamma**index/(self.__gamma + 1)
+        return 2*self.__gamma**max(self.__bins)/(self.__gamma + 1)
+
+    def __collapse(self):
+        """ Merges the lowest buckets into one, down to `maxBins`. """
+        indexes = sorted(self.__bins)
+        numToMerge = len(indexes) - self.__maxBins + 1
+        target = indexes[numToMerge - 1]
+        for index in indexes[:numToMerge - 1]:
+            self.__bins[target] += self.__bins.pop(index)
+
+class LatencyStats:
+    def __init__(self, relativeAccuracy: float = DEFAULT_RELATIVE_ACCURACY,
+            maxBins: int = DEFAULT_MAX_BINS):
+        """ Running stats and a quantile sketch of the same delays. """
+        self.__runningStats = RunningStats()
+        self.__sketch = QuantileSketch(relativeAccuracy, maxBins)
+
+    def get_running_stats(self):
+        return self.__runningStats
+
+    def get_sketch(self):
+        return self.__sketch
+
+    def get_count(self):
+        return self.__runningStats.get_count()
+
+    def get_mean(self):
+        return self.__runningStats.get_mean()
+
+    def get_min(self):
+        return self.__runningStats.get_min()
+
+    def get_max(self):
+        return self.__runningStats.get_max()
+
+    def get_quantile(self, q: float):
+        """ Returns an estimate of the `q` quantile, kept within the exact
+                min and max. """
+        quantile = self.__sketch.get_quantile(q)
+        if math.isnan(quantile):
+            return quantile
+        return min(max(quantile, self.get_min()), self.get_max())
+
+    def add(self, delay: float):
+        self.__runningStats.add(delay)
+        self.__sketch.add(delay)
+
+    def add_many(self, delays: np.ndarray):
+        self.__runningStats.add_many(delays)
+        self.__sketch.add_many(delays)
+
+    def merge(self, other: "LatencyStats"):
+        self.__runningStats.merge(other.__runningStats)
+        self.__sketch.merge(other.__sketch)
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class StatisticsSink:
+    def __init__(self, relativeAccuracy: float = DEFAULT_RELATIVE_ACCURACY,
+            maxBins: int = DEFAULT_MAX_BINS):
+        """ Keeps latency statistics instead of the delays themselves.
+
+        Tracks the count, mean, min / max and quantiles (see
+            `QuantileSketch`) of
+
+        - the end-to-end delay of each flow, and
+        - each delay type (`TimeBlockTypes`) at each hop, where a hop is
+            identified by the names of the node it leaves from and the node
+            it goes to (so the ports of a node are kept apart).
+
+        Memory only grows with the number of flows and hops, never with the
+            number of packets.
+
+        It can be used as the sink of a `NetworkTracing.Tracer`, so it's fed
+            by every simulator that traces hops and deliveries, or be given
+            results directly (`add_batch_result`, `add_simulation_result`).
+            Sinks filled in different processes (e.g. by sweep or parallel
+            workers) can be combined with `merge`.
+
+        ARGS:
+        - relativeAccuracy, maxBins: See `QuantileSketch`.
+        """
+        self.__relativeAccuracy = relativeAccuracy
+        self.__maxBins = maxBins
+
+        self.__flowStats: Dict[str, LatencyStats] = {}
+        self.__hopStats: Dict[Tuple[str, Optional[str], TimeBlockTypes],
+                LatencyStats] = {}
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def write(self, record: Tuple[Any, ...]):
+        """ Adds a trace record (see `NetworkTracing.Tracer`). """
+        if record[0] == "hop":
+            nodeName, nextNodeName = record[1], record[2]
+            times = record[3:]
+            for i in range(0, 4):
+                self.__get_hop_stats(nodeName, nextNodeName,
+                        HOP_DELAY_TYPES[i]).add(times[i + 1] - times[i])
+        elif record[0] == "delivery":
+            flowName = record[3] if len(record) > 3 else None
+            self.__get_flow_stats(flowName).add(record[2])
+
+    def close(self):
+        pass
+
+    def add_delays(self, flowName: Optional[str], delays: np.ndarray):
+        """ Adds end-to-end delays of a flow. """
+        self.__get_flow_stats(flowName).add_many(delays)
+
+    def add_batch_result(self, result: BatchPathResult,
+            flowName: Optional[str] = None):
+        """ Adds every packet of a `BatchPathResult` (vectorised). """
+        self.add_delays(flowName, result.get_end_to_end_delays())
+
+        times = (result.get_arrival_times(), result.get_queue_stop_times(),
+                result.get_processing_stop_times(),
+                result.get_transmission_stop_times(),
+                result.get_propagation_stop_times())
+        for hop, (nodeName, nextNodeName) in enumerate(zip(
+                result.get_node_names(), result.get_next_node_names())):
+            for i in range(0, 4):
+                self.__get_hop_stats(nodeName, nextNodeName,
+                        HOP_DELAY_TYPES[i]).add_many(
+                                times[i + 1][..., hop] - times[i][..., hop])
+
+    def add_simulation_result(self, result: Any):
+        """ Adds every flow of a `SimulationResult` (from the event
+                simulators). """
+        for flowName in result.get_flow_names():
+            self.add_batch_result(result.get_flow_result(flowName), flowName)
+
+    def merge(self, other: "StatisticsSink"):
+        """ Adds the statistics gathered by another sink. """
+        for flowName, stats in other.__flowStats.items():
+            self.__get_flow_stats(flowName).merge(stats)
+        for (nodeName, nextNodeName, delayType), stats in \
+                other.__hopStats.items():
+            self.__get_hop_stats(nodeName, nextNodeName, delayType).merge(
+                    stats)
+
+    def get_flow_names(self):
+        return list(self.__flowStats)
+
+    def get_hop_names(self):
+        """ Returns the (node name, next node name) of every hop seen. """
+        return list(dict.fromkeys((nodeName, nextNodeName)
+                for nodeName, nextNodeName, _ in self.__hopStats))
+
+    def get_flow_stats(self, flowName: str = DEFAULT_FLOW_NAME):
+        """ Returns the `LatencyStats` of a flow's end-to-end delays (None if
+                it has none). """
+        return self.__flowStats.get(flowName)
+
+    def get_hop_stats(self, nodeName: str, nextNodeName: Optional[str],
+            delayType: TimeBlockTypes):
+        """ Returns the `LatencyStats` of one delay type at the hop from
+                `nodeName` to `nextNodeName` (None if it has none). """
+        return self.__hopStats.get((nodeName, nextNodeName, delayType))
+
+    def get_summary(self):
+        """ Returns a row (dictionary) per flow and per hop and delay type,
+                with the count, mean, min, max and the quantiles in
+                `SUMMARY_QUANTILES` (as "p50", "p99", "p99.9"). A hop's
+                "name" is the node it leaves from and its "nextName" the
+                node it goes to. """
+        rowsList: List[Dict[str, Any]] = []
+        statsList = [("flow", flowName, None, "END_TO_END", stats)
+                for flowName, stats in self.__flowStats.items()]
+        statsList += [("hop", nodeName, nextNodeName, delayType.name, stats)
+                for (nodeName, nextNodeName, delayType), stats in
+                        self.__hopStats.items()]
+
+        for scope, name, nextName, delayName, stats in statsList:
+            row = {"scope": scope, "name": name, "nextName": nextName,
+                    "delayType": delayName,
+                    "count": stats.get_count(), "mean": stats.get_mean(),
+                    "min": stats.get_min(), "max": stats.get_max()}
+            for q in SUMMARY_QUANTILES:
+                row["p{:g}".format(q*100)] = stats.get_quantile(q)
+            rowsList.append(row)
+        return rowsList
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __get_flow_stats(self, flowName: Optional[str]):
+        if flowName is None:
+            flowName = DEFAULT_FLOW_NAME
+        stats = self.__flowStats.get(flowName)
+        if stats is None:
+            stats = self.__flowStats[flowName] = LatencyStats(
+                    self.__relativeAccuracy, self.__maxBins)
+        return stats
+
+    def __get_hop_stats(self, nodeName: str, nextNodeName: Optional[str],
+            delayType: TimeBlockTypes):
+        key = (nodeName, nextNodeName, delayType)
+        stats = self.__hopStats.get(key)
+        if stats is None:
+            stats = self.__hopStats[key] = LatencyStats(
+                    self.__relativeAccuracy, self.__maxBins)
+        return stats
@@ -0,0 +1,220 @@
+# Standard libs
+import copy
+import csv
+import itertools
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkHopCache import HopCache
+
+from NetworkTopology import Topology
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Description keys that can be swept, for links and nodes
+LINK_PARAMETERS = ("transmissionRate", "length", "propSpeed", "reservedRate")
+NODE_PARAMETERS = ("processingDelay", "circuitSetupDelay")
+
+# Columns of the summary computed for every scenario
+SUMMARY_COLUMNS = ("numPackets", "firstDelivery", "lastDelivery", "meanDelay",
+        "p50Delay", "p99Delay", "maxDelay")
+
+# The scenario shared by every task of a worker process (see
+# `ParameterSweep.init_worker`)
+_workerScenario: Optional[Dict[str, Any]] = None
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class SweepResult:
+    def __init__(self, parameterNames: List[str],
+            rowsList: List[Dict[str, float]]):
+        """ One row per scenario: the swept parameter values followed by the
+                delay summary (see `SUMMARY_COLUMNS`). """
+        self.__parameterNames = parameterNames
+        self.__rowsList = rowsList
+
+    def get_column_names(self):
+        return self.__parameterNames + list(SUMMARY_COLUMNS)
+
+    def get_rows(self):
+        return self.__rowsList
+
+    def get_column(self, name: str):
+        """ Returns a column of the table as an array. """
+        return np.array([row[name] for row in self.__rowsList])
+
+    def to_csv(self, filePath: str):
+        with open(filePath, "w", newline="") as csvFile:
+            writer = csv.DictWriter(csvFile,
+                    fieldnames=self.get_column_names())
+            writer.writeheader()
+            writer.writerows(self.__rowsList)
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class ParameterSweep:
+    def __init__(self, description: Dict[str, Any], pathNames: List[str],
+            packetSizes: np.ndarray,
+            injectionTimes: Optional[np.ndarray] = None):
+        """ Re-runs a packet train over a grid of link / node parameters.
+
+        ARGS:
+        - description: The topology (see `Topology.to_description`).
+        - pathNames: The names of the nodes the packets travel through.
+        - packetSizes: The size of each packet in bits.
+        - injectionTimes: Time each packet is placed in the source node's
+                queue (defaults to 0 for every packet).
+        """
+        self.__description = description
+        self.__pathNames = list(pathNames)
+        self.__packetSizes = np.asarray(packetSizes, dtype=np.float64)
+        self.__injectionTimes = injectionTimes
+
+        # "<link or node name>.<parameter>" -> values to try
+        self.__parameters: Dict[str, List[float]] = {}
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def add_parameter(self, target: str, values: Sequence[float]):
+        """ Adds a parameter to sweep over.
+
+        ARGS:
+        - target: "<link or node name>.<parameter>", e.g.
+                "L2.transmissionRate" or "S2.processingDelay".
+        - values: The values to try.
+
+        RAISES:
+        - Exception if there are no values, or the target doesn't exist in
+                the topology.
+        """
+        values = list(values)
+        if not values:
+            raise Exception("Need at least one value to sweep {} "
+                    "over".format(target))
+
+        ParameterSweep.apply_overrides(self.__description, {target: values[0]})
+        self.__parameters[target] = values
+
+    def get_scenarios(self):
+        """ Returns every combination of the swept parameters (a list of
+                target -> value dictionaries). """
+        targetsList = list(self.__parameters.keys())
+        return [dict(zip(targetsList, values)) for values in
+                itertools.product(*self.__parameters.values())]
+
+    def run(self, maxWorkers: Optional[int] = None):
+        """ Runs every scenario and collects the results into one table.
+
+        Scenarios are spread over a pool of worker processes. The topology
+            description, path and packets are sent once to each worker, after
+            which each task is just the dictionary of overrides.
+
+        ARGS:
+        - maxWorkers: Number of worker processes (defaults to the number of
+                cores). With 1, everything runs in this process.
+
+        RETURNS:
+        - A `SweepResult` object.
+        """
+        scenariosList = self.get_scenarios()
+        initArgs = (self.__description, self.__pathNames, self.__packetSizes,
+                self.__injectionTimes)
+
+        if maxWorkers is None:
+            maxWorkers = os.cpu_count() or 1
+
+        if maxWorkers == 1:
+            ParameterSweep.init_worker(*initArgs)
+            summariesList = [ParameterSweep.run_scenario(scenario)
+                    for scenario in scenariosList]
+        else:
+            chunkSize = max(1, len(scenariosList)//(maxWorkers*4))
+            with ProcessPoolExecutor(max_workers=maxWorkers,
+                    initializer=ParameterSweep.init_worker,
+                    initargs=initArgs) as executor:
+                summariesList = list(executor.map(
+                        ParameterSweep.run_scenario, scenariosList,
+                        chunksize=chunkSize))
+
+        rowsList: List[Dict[str, float]] = []
+        for scenario, summary in zip(scenariosList, summariesList):
+            row = dict(scenario)
+            row.update(summary)
+            rowsList.append(row)
+
+        return SweepResult(list(self.__parameters.keys()), rowsList)
+
+    @staticmethod
+    def apply_overrides(description: Dict[str, Any],
+            overrides: Dict[str, float]):
+        """ Returns a copy of a topology description with some parameters
+                replaced (see `add_parameter` for the override names). """
+        description = copy.deepcopy(description)
+        linksByName = {link["name"]: link for link in description["links"]}
+        nodesByName = {node["name"]: node for node in description["nodes"]}
+
+        for target, value in overrides.items():
+            name, _, parameter = target.rpartition(".")
+            if name in linksByName and parameter in LINK_PARAMETERS:
+                linksByName[name][parameter] = value
+            elif name in nodesByName and parameter in NODE_PARAMETERS:
+                nodesByName[name][parameter] = value
+            else:
+                raise Exception("Unknown sweep parameter {}".format(target))
+
+        return description
+
+    @staticmethod
+    def init_worker(description: Dict[str, Any], pathNames: List[str],
+            packetSizes: np.ndarray, injectionTimes: Optional[np.ndarray]):
+        """ Stores the scenario shared by every task of a worker process. """
+        global _workerScenario
+        _workerScenario = {
+            "description": description,
+            "pathNames": pathNames,
+            "packetSizes": packetSizes,
+            "injectionTimes": injectionTimes,
+            "hopCache": HopCache()
+        }
+
+    @staticmethod
+    def run_scenario(overrides: Dict[str, float]):
+        """ Runs a single scenario (in a worker set up by `init_worker`).
+
+        RETURNS:
+        - A dictionary with the delay summary (see `SUMMARY_COLUMNS`).
+        """
+        scenario = _workerScenario
+        topology = Topology.from_description(ParameterSweep.apply_overrides(
+                scenario["description"], overrides))
+        path = [topology.get_node(name) for name in scenario["pathNames"]]
+
+        result = NetworkBatchSolver.solve_path(path=path,
+                packetSizes=scenario["packetSizes"],
+                injectionTimes=scenario["injectionTimes"],
+                topology=topology,
+                hopCache=scenario["hopCache"])
+        delays = result.get_end_to_end_delays()
+        deliveryTimes = result.get_delivery_times()
+
+        return {
+            "numPackets": len(delays),
+            "firstDelivery": float(deliveryTimes.min()),
+            "lastDelivery": float(deliveryTimes.max()),
+            "meanDelay": float(delays.mean()),
+            "p50Delay": float(np.percentile(delays, 50)),
+            "p99Delay": float(np.percentile(delays, 99)),
+            "maxDelay": float(delays.max())
+        }
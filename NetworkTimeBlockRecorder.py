@@ -0,0 +1,285 @@
+# Standard libs
+from typing import List
+from typing import Optional
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkComponents import TimeBlock
+
+from NetworkBatchSolver import BatchPathResult
+
+from NetworkHelpers import TimeBlockTypes
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Number of records allocated at a time
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class TimeBlockRecorder:
+    def __init__(self, chunkSize: int = DEFAULT_CHUNK_SIZE):
+        """ Columnar store of time blocks.
+
+        Rather than keeping a `TimeBlock` object per delay, every block is a
+            row of (packet id, hop, delay type, start time, stop time,
+            traffic class) held in typed arrays. The arrays grow a chunk at a
+            time, so recording a block never copies the blocks recorded
+            before it.
+
+        ARGS:
+        - chunkSize: Number of rows allocated at a time.
+        """
+        self.__chunkSize = chunkSize
+
+        # Full (or trimmed) chunks, one list per column
+        self.__packetIdChunks: List[np.ndarray] = []
+        self.__hopChunks: List[np.ndarray] = []
+        self.__delayTypeChunks: List[np.ndarray] = []
+        self.__startTimeChunks: List[np.ndarray] = []
+        self.__stopTimeChunks: List[np.ndarray] = []
+        self.__trafficClassChunks: List[np.ndarray] = []
+
+        self.__new_chunk()
+
+        # Concatenated columns, None when they need rebuilding
+        self.__columns: Optional[List[np.ndarray]] = None
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def record(self, packetId: int, hop: int, delayType: TimeBlockTypes,
+            startTime: float, stopTime: float, trafficClass: int = 0):
+        """ Records a single time block. """
+        if self.__fill == self.__chunkSize:
+            self.__close_chunk()
+            self.__new_chunk()
+
+        i = self.__fill
+        self.__packetIds[i] = packetId
+        self.__hops[i] = hop
+        self.__delayTypes[i] = delayType.value
+        self.__startTimes[i] = startTime
+        self.__stopTimes[i] = stopTime
+        self.__trafficClasses[i] = trafficClass
+        self.__fill += 1
+        self.__columns = None
+
+    def record_blocks(self, packetId: int, hop: int,
+            blocksList: List[TimeBlock]):
+        """ Records the blocks returned by
+                `NetworkPathComputer.compute_path_step`. """
+        for block in blocksList:
+            self.record(packetId, hop, block.get_delay_type(),
+                    block.get_start_time(), block.get_stop_time(),
+                    block.get_traffic_class())
+
+    def record_batch(self, packetIds: np.ndarray, hops: np.ndarray,
+            delayTypes: np.ndarray, startTimes: np.ndarray,
+            stopTimes: np.ndarray, trafficClasses: Optional[np.ndarray] = None):
+        """ Records many time blocks at once.
+
+        ARGS:
+        - packetIds, hops, startTimes, stopTimes: One entry per block.
+        - delayTypes: The `TimeBlockTypes` value of each block.
+        - trafficClasses: The traffic class of each block (defaults to 0).
+        """
+        if trafficClasses is None:
+            trafficClasses = 0
+        columns = [np.ravel(np.asarray(column)) for column in
+                (packetIds, hops, delayTypes, startTimes, stopTimes)]
+        numRows = len(columns[0])
+        columns.append(np.broadcast_to(np.asarray(trafficClasses),
+                np.shape(packetIds)).ravel())
+
+        if numRows <= self.__chunkSize - self.__fill:
+            i = self.__fill
+            self.__packetIds[i:i + numRows] = columns[0]
+            self.__hops[i:i + numRows] = columns[1]
+            self.__delayTypes[i:i + numRows] = columns[2]
+            self.__startTimes[i:i + numRows] = columns[3]
+            self.__stopTimes[i:i + numRows] = columns[4]
+            self.__trafficClasses[i:i + numRows] = columns[5]
+            self.__fill += numRows
+        else:
+            # Too big for the current chunk, keep it as a chunk of its own
+            self.__close_chunk()
+            self.__packetIdChunks.append(columns[0].astype(np.int64))
+            self.__hopChunks.append(columns[1].astype(np.int32))
+            self.__delayTypeChunks.append(columns[2].astype(np.int8))
+            self.__startTimeChunks.append(columns[3].astype(np.float64))
+            self.__stopTimeChunks.append(columns[4].astype(np.float64))
+            self.__trafficClassChunks.append(columns[5].astype(np.int32))
+            self.__new_chunk()
+
+        self.__columns = None
+
+    def record_batch_result(self, result: BatchPathResult,
+            firstPacketId: int = 0,
+            trafficClasses: Optional[np.ndarray] = None):
+        """ Records every block of a `BatchPathResult` (packets are numbered
+                from `firstPacketId`, and have the given traffic classes).
+                Queue blocks are only recorded for packets that actually had
+                to wait. """
+        arrivals = result.get_arrival_times()
+        numPackets, numHops = arrivals.shape
+        packetIds = np.broadcast_to(
+                np.arange(firstPacketId, firstPacketId + numPackets)\
+                        [:, np.newaxis], arrivals.shape)
+        hops = np.broadcast_to(np.arange(0, numHops), arrivals.shape)
+        classes = np.broadcast_to(np.asarray(
+                0 if trafficClasses is None else trafficClasses)[
+                        ..., np.newaxis], arrivals.shape)
+
+        queueStops = result.get_queue_stop_times()
+        queued = queueStops > arrivals
+        self.record_batch(packetIds[queued], hops[queued],
+                np.full(np.count_nonzero(queued),
+                        TimeBlockTypes.QUEUING_DELAY.value),
+                arrivals[queued], queueStops[queued], classes[queued])
+
+        edges = [
+            (TimeBlockTypes.PROCESSING_DELAY, queueStops,
+                    result.get_processing_stop_times()),
+            (TimeBlockTypes.TRANSMISSION_DELAY,
+                    result.get_processing_stop_times(),
+                    result.get_transmission_stop_times()),
+            (TimeBlockTypes.PROPAGATION_DELAY,
+                    result.get_transmission_stop_times(),
+                    result.get_propagation_stop_times())
+        ]
+        for delayType, startTimes, stopTimes in edges:
+            self.record_batch(packetIds, hops,
+                    np.full(arrivals.size, delayType.value),
+                    startTimes, stopTimes, classes)
+
+    def get_num_records(self):
+        return len(self.__get_columns()[0])
+
+    def get_packet_ids(self):
+        return self.__get_columns()[0]
+
+    def get_hops(self):
+        return self.__get_columns()[1]
+
+    def get_delay_types(self):
+        """ Returns the `TimeBlockTypes` value of each block. """
+        return self.__get_columns()[2]
+
+    def get_start_times(self):
+        return self.__get_columns()[3]
+
+    def get_stop_times(self):
+        return self.__get_columns()[4]
+
+    def get_traffic_classes(self):
+        return self.__get_columns()[5]
+
+    def get_packet_nums(self):
+        """ Returns the (sorted) ids of every packet with a recorded block. """
+        return np.unique(self.get_packet_ids())
+
+    def get_num_hops(self):
+        hops = self.get_hops()
+        return int(hops.max()) + 1 if len(hops) > 0 else 0
+
+    def get_delay_matrix(self, delayType: TimeBlockTypes,
+            numHops: Optional[int] = None,
+            trafficClass: Optional[int] = None):
+        """ Returns the total delay of one type per packet and hop.
+
+        ARGS:
+        - delayType: The type of delay to add up.
+        - numHops: Number of columns (defaults to `get_num_hops`).
+        - trafficClass: Only include the packets of this traffic class.
+
+        RETURNS:
+        - An array shaped (packets, hops), ordered as `get_packet_nums` (or
+            the sorted ids of the packets of `trafficClass`). Entries without
+            a block (e.g. packets that didn't have to queue) are 0.
+        """
+        packetIds, hops, delayTypes, startTimes, stopTimes, trafficClasses = \
+                self.__get_columns()
+        if numHops is None:
+            numHops = self.get_num_hops()
+
+        if trafficClass is not None:
+            inClass = trafficClasses == trafficClass
+            packetIds, hops, delayTypes, startTimes, stopTimes = \
+                    packetIds[inClass], hops[inClass], delayTypes[inClass], \
+                    startTimes[inClass], stopTimes[inClass]
+
+        packetNums, packetIndexes = np.unique(packetIds, return_inverse=True)
+        matrix = np.zeros((len(packetNums), numHops))
+
+        mask = delayTypes == delayType.value
+        np.add.at(matrix, (packetIndexes[mask], hops[mask]),
+                stopTimes[mask] - startTimes[mask])
+        return matrix
+
+    def get_time_blocks(self, packetId: int, hop: int):
+        """ Returns the blocks of a packet at a hop as `TimeBlock` objects (in
+                the order they were recorded). """
+        packetIds, hops, delayTypes, startTimes, stopTimes, trafficClasses = \
+                self.__get_columns()
+        indexes = np.flatnonzero((packetIds == packetId) & (hops == hop))
+        return [TimeBlock(delayType=TimeBlockTypes(int(delayTypes[i])),
+                        startTime=float(startTimes[i]),
+                        stopTime=float(stopTimes[i]),
+                        trafficClass=int(trafficClasses[i]))
+                for i in indexes]
+
+    def get_memory_usage(self):
+        """ Returns the number of bytes allocated for the columns. """
+        chunks = self.__packetIdChunks + self.__hopChunks + \
+                self.__delayTypeChunks + self.__startTimeChunks + \
+                self.__stopTimeChunks + self.__trafficClassChunks
+        current = [self.__packetIds, self.__hops, self.__delayTypes,
+                self.__startTimes, self.__stopTimes, self.__trafficClasses]
+        return sum(chunk.nbytes for chunk in chunks + current)
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __new_chunk(self):
+        self.__packetIds = np.empty(self.__chunkSize, dtype=np.int64)
+        self.__hops = np.empty(self.__chunkSize, dtype=np.int32)
+        self.__delayTypes = np.empty(self.__chunkSize, dtype=np.int8)
+        self.__startTimes = np.empty(self.__chunkSize, dtype=np.float64)
+        self.__stopTimes = np.empty(self.__chunkSize, dtype=np.float64)
+        self.__trafficClasses = np.empty(self.__chunkSize, dtype=np.int32)
+        self.__fill = 0
+
+    def __close_chunk(self):
+        """ Moves the filled part of the current chunk to the chunk lists. """
+        if self.__fill == 0:
+            return
+
+        # Copy partially filled chunks so the unused space can be freed
+        fill = self.__fill
+        trim = (lambda column: column) if fill == self.__chunkSize else \
+                (lambda column: column[:fill].copy())
+        self.__packetIdChunks.append(trim(self.__packetIds))
+        self.__hopChunks.append(trim(self.__hops))
+        self.__delayTypeChunks.append(trim(self.__delayTypes))
+        self.__startTimeChunks.append(trim(self.__startTimes))
+        self.__stopTimeChunks.append(trim(self.__stopTimes))
+        self.__trafficClassChunks.append(trim(self.__trafficClasses))
+
+    def __get_columns(self):
+        if self.__columns is None:
+            fill = self.__fill
+            self.__columns = [
+                np.concatenate(self.__packetIdChunks + \
+                        [self.__packetIds[:fill]]),
+                np.concatenate(self.__hopChunks + [self.__hops[:fill]]),
+                np.concatenate(self.__delayTypeChunks + \
+                        [self.__delayTypes[:fill]]),
+                np.concatenate(self.__startTimeChunks + \
+                        [self.__startTimes[:fill]]),
+                np.concatenate(self.__stopTimeChunks + \
+                        [self.__stopTimes[:fill]]),
+                np.concatenate(self.__trafficClassChunks + \
+                        [self.__trafficClasses[:fill]])
+            ]
+        return self.__columns
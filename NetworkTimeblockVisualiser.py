@@ -1,18 +1,36 @@
 # Standard Libs
 from typing import List
+from typing import Optional
 
 # Third part libs
-from matplotlib import pyplot as plt
+import numpy as np
 
 # Local libs
 from NetworkComponents import Node
 from NetworkComponents import TimeBlock
 
+from NetworkTimeBlockRecorder import TimeBlockRecorder
+
 from NetworkHelpers import __DEBUG_ENABLED__
 
 from NetworkHelpers import TimeBlockTypes
 
-plt.rcParams["figure.autolayout"] = True
+# * CONSTANTS ------------------------------------------------------------------
+
+# Above this many packets, only every n-th packet is drawn
+DEFAULT_MAX_PACKETS = 2000
+
+# Above this many (drawn) packets, the blocks aren't labelled
+DEFAULT_MAX_LABELLED_PACKETS = 50
+
+# Order the delays are drawn in at each hop, with their legend suffix and how
+# much to lighten (+) / darken (-) the hop's colour by
+DELAY_SERIES = [
+    (TimeBlockTypes.QUEUING_DELAY, "QUEUE", 0.5),
+    (TimeBlockTypes.PROCESSING_DELAY, "PROC", 0.25),
+    (TimeBlockTypes.TRANSMISSION_DELAY, "TRANS", 0.0),
+    (TimeBlockTypes.PROPAGATION_DELAY, "PROP", -0.35)
+]
 
 # * AUXILIARY CLASSES ----------------------------------------------------------
 
@@ -42,28 +60,22 @@ class NodePairedTimeBlocksList:
         return self.__blocksList
 
     def get_queue_block(self):
-        if len(self.__blocksList) == 4:
-            return self.__blocksList[0]
-        else:
-            return None
+        return self.__get_block(TimeBlockTypes.QUEUING_DELAY)
     
     def get_processing_block(self):
-        if len(self.__blocksList) == 4:
-            return self.__blocksList[1]
-        else:
-            return self.__blocksList[0]
+        return self.__get_block(TimeBlockTypes.PROCESSING_DELAY)
 
     def get_transmission_block(self):
-        if len(self.__blocksList) == 4:
-            return self.__blocksList[2]
-        else:
-            return self.__blocksList[1]
+        return self.__get_block(TimeBlockTypes.TRANSMISSION_DELAY)
 
     def get_propagation_block(self):
-        if len(self.__blocksList) == 4:
-            return self.__blocksList[3]
-        else:
-            return self.__blocksList[2]
+        return self.__get_block(TimeBlockTypes.PROPAGATION_DELAY)
+
+    def __get_block(self, delayType: TimeBlockTypes):
+        for block in self.__blocksList:
+            if block.get_delay_type() == delayType:
+                return block
+        return None
 
 class PacketTimeBlocksIndex:
     def __init__(self, packetNum: int):
@@ -86,157 +98,171 @@ class PacketTimeBlocksIndex:
 # * MAIN CLASS -----------------------------------------------------------------
 
 class TimeblockVisualiser:
-    def __init__(self, nodesList: List[Node]):
-        self.__listIndexes: List[PacketTimeBlocksIndex] = []
+    def __init__(self, nodesList: List[Node],
+            recorder: Optional[TimeBlockRecorder] = None,
+            maxPackets: int = DEFAULT_MAX_PACKETS,
+            maxLabelledPackets: int = DEFAULT_MAX_LABELLED_PACKETS):
+        """ Plots the delays of every packet along a path.
+
+        ARGS:
+        - nodesList: The path the packets took.
+        - recorder: The recorder holding the time blocks of the packets (a new
+                one is created if not given).
+        - maxPackets: If more packets than this were recorded, only every n-th
+                packet is drawn (so that at most `maxPackets` are).
+        - maxLabelledPackets: Blocks are only labelled with their delay when
+                at most this many packets are drawn.
+        """
+        if recorder is None:
+            recorder = TimeBlockRecorder()
+        self.__recorder = recorder
         self.__nodesList: List[Node] = nodesList
+        self.__maxPackets = maxPackets
+        self.__maxLabelledPackets = maxLabelledPackets
+
+    def get_recorder(self):
+        return self.__recorder
     
     def add_packet_blocks_index_to_record(self, 
             blocksIndex: PacketTimeBlocksIndex):
-        self.__listIndexes.append(blocksIndex)
+        hop = 0
+        for nodePair in blocksIndex.get_node_pair_time_blocks_list():
+            self.__recorder.record_blocks(blocksIndex.get_packet_num(), hop,
+                    nodePair.get_blocks_list())
+            hop += 1
+
+    def visualise_timeblock(self, outputPath: Optional[str] = None):
+        """ Plots the delays of every recorded packet.
+
+        Every block is drawn at its actual start and stop time, and all of
+            them go into a single `PolyCollection`, so the cost of drawing
+            doesn't depend on the number of hops.
+
+        matplotlib is only imported once this is called.
+
+        ARGS:
+        - outputPath: If given, the figure is rendered off screen and saved to
+                this file instead of being shown in a window (the format
+                comes from the extension, e.g. `.png`, `.svg` or `.pdf`).
+        """
+        from matplotlib.collections import PolyCollection
+        from matplotlib.patches import Patch
+
+        numHops = len(self.__nodesList) - 1
+        packetIds = self.__recorder.get_packet_ids()
+        hops = self.__recorder.get_hops()
+        delayTypes = self.__recorder.get_delay_types()
+        startTimes = self.__recorder.get_start_times()*1000
+        stopTimes = self.__recorder.get_stop_times()*1000
+
+        # Decimate the packets if there are too many to draw
+        packetsList = np.unique(packetIds)
+        numPackets = len(packetsList)
+        stride = max(1, int(np.ceil(len(packetsList)/self.__maxPackets)))
+        if stride > 1:
+            packetsList = packetsList[::stride]
+            keep = np.isin(packetIds, packetsList)
+            packetIds = packetIds[keep]
+            hops = hops[keep]
+            delayTypes = delayTypes[keep]
+            startTimes = startTimes[keep]
+            stopTimes = stopTimes[keep]
 
-    def visualise_timeblock(self):
-        # Determine the maximum number of delay categories available
-        if __DEBUG_ENABLED__:
-            for index in self.__listIndexes:
-                print("Packet: {}, Node pairs: {}".format(
-                        index.get_packet_num(), 
-                        len(index.get_node_pair_time_blocks_list())))
-
-        listOfListWrappers: List[ListWrapper] = []
-
-        # Create a list of in-order ListWrappers based on the node names
-        for i in range(0, len(self.__nodesList) - 1):
-            # Create the queue list for this node
-            queueName = "{}_QUEUE".format(self.__nodesList[i].get_name())
-            listOfListWrappers.append(ListWrapper(queueName))
-
-            # Create the processing list for this node
-            procName = "{}_PROC".format(self.__nodesList[i].get_name())
-            listOfListWrappers.append(ListWrapper(procName))
-
-            # Create the transmission list for this node
-            transName = "{}_TRANS".format(self.__nodesList[i].get_name())
-            listOfListWrappers.append(ListWrapper(transName))
-
-            # Create the propagation list for this node
-            propName = "{}_PROP".format(self.__nodesList[i].get_name())
-            listOfListWrappers.append(ListWrapper(propName))
-
-        # Get a list of all the packets
-        packetsList = []
-        counter = 0
-        for index in self.__listIndexes:
-            packetsList.append(index.get_packet_num())
-            counter = 0 # Reset the counter value
-            # Go through each of the packets time block lists
-            for nodePair in index.get_node_pair_time_blocks_list():
-                queueBlock = nodePair.get_queue_block()
-
-                if queueBlock == None:
-                    listOfListWrappers[counter].add_to_list_data(0)
-                else:
-                    listOfListWrappers[counter].add_to_list_data(
-                            round(queueBlock.get_total_delay()*1000,3))
-                
-                counter += 1
-
-                procBlock = nodePair.get_processing_block()
-                listOfListWrappers[counter].add_to_list_data(
-                        round(procBlock.get_total_delay()*1000,3))
-                
-                counter += 1
-
-                transBlock = nodePair.get_transmission_block()
-                listOfListWrappers[counter].add_to_list_data(
-                        round(transBlock.get_total_delay()*1000,3))
-
-                counter += 1
-
-                propBlock = nodePair.get_propagation_block()
-                listOfListWrappers[counter].add_to_list_data(
-                        round(propBlock.get_total_delay()*1000,3))
-                
-                counter += 1
-        
-        if __DEBUG_ENABLED__:
-            print("Counter value: {}".format(counter))
-
-        # Display all the data
-        graphDataList = []
-        graphListNames = []
-        coloursList = [
-            # S
-            '#ef5350',
-            '#ff867c',
-            '#b61827',
-            '#ef5350',
-            # S4
-            '#ec407a',
-            '#ff77a9',
-            '#b4004e',
-            '#eb4b7a',
-            # S2
-            '#ab47bc',
-            '#df78ef',
-            '#790e8b',
-            '#ab47bc',
-            # S1
-            '#5c6bc0',
-            '#8e99f3',
-            '#26418f',
-            '#5c6bc0'
-            # C
-        ]
-        
-        counter = 0
-        for _ in listOfListWrappers:
-            graphListNames.append(listOfListWrappers[counter]\
-                        .get_list_name())
-            counter += 1
-
-        counter = 0
-        fig, ax = plt.subplots()
-        previousWrapper: List[float] = [0]*len(packetsList)
-        for _ in listOfListWrappers:
-            if counter == 0:
-                barH = ax.barh(packetsList, 
-                        listOfListWrappers[counter].get_list_data(),
-                        color=coloursList[counter])
-                ax.bar_label(barH, label_type='center')
-                graphDataList.append(barH)
-            else:
-                barH = ax.barh(packetsList, 
-                        listOfListWrappers[counter].get_list_data(), 
-                        left=previousWrapper,
-                        color=coloursList[counter])
-                ax.bar_label(barH, label_type='center')
-                graphDataList.append(barH)
-
-            for i in range(0,len(listOfListWrappers[counter].get_list_data())):
-                previousWrapper[i] += listOfListWrappers[counter]\
-                        .get_list_data()[i]
-            counter += 1
-            
-            
-            
-        
         if __DEBUG_ENABLED__:
-            print("\nWrapper values (ms):\n")
+            print("Packets: {}, drawn: {}, blocks: {}".format(numPackets,
+                    len(packetsList), len(packetIds)))
+
+        # One series (and colour) per hop and delay type
+        seriesOfType = np.zeros(max(t.value for t in TimeBlockTypes) + 1,
+                dtype=np.int64)
+        for j in range(0, len(DELAY_SERIES)):
+            seriesOfType[DELAY_SERIES[j][0].value] = j
+        seriesIndexes = hops*len(DELAY_SERIES) + seriesOfType[delayTypes]
+        coloursList = self.__get_series_colours(numHops)
+
+        # Rectangle corners of every block
+        halfHeight = 0.4*stride
+        verts = np.empty((len(packetIds), 4, 2))
+        verts[:, 0, 0] = startTimes
+        verts[:, 1, 0] = startTimes
+        verts[:, 2, 0] = stopTimes
+        verts[:, 3, 0] = stopTimes
+        verts[:, 0, 1] = packetIds - halfHeight
+        verts[:, 1, 1] = packetIds + halfHeight
+        verts[:, 2, 1] = packetIds + halfHeight
+        verts[:, 3, 1] = packetIds - halfHeight
+
+        fig, ax = self.__create_figure(headless=outputPath is not None)
+        ax.add_collection(PolyCollection(verts,
+                facecolors=coloursList[seriesIndexes], edgecolors="none"))
+        ax.autoscale_view()
+
+        # Label the blocks with their delay (ms) if there's room
+        if len(packetsList) <= self.__maxLabelledPackets:
+            for i in np.flatnonzero(stopTimes > startTimes):
+                ax.text((startTimes[i] + stopTimes[i])/2, packetIds[i],
+                        "{:g}".format(round(
+                                float(stopTimes[i] - startTimes[i]), 3)),
+                        ha="center", va="center", fontsize="small")
+
+        # Legend (one entry per series), kept outside the axes since placing
+        # it "best" means checking every block
+        handlesList = []
+        for i in range(0, numHops):
+            for j in range(0, len(DELAY_SERIES)):
+                handlesList.append(Patch(
+                        facecolor=coloursList[i*len(DELAY_SERIES) + j],
+                        label="{}_{}".format(self.__nodesList[i].get_name(),
+                                DELAY_SERIES[j][1])))
+        ax.legend(handles=handlesList,
+                ncol=max(1, int(np.ceil(len(handlesList)/16))),
+                fontsize="small", loc="upper left", bbox_to_anchor=(1.0, 1.0))
+
+        ax.set_ylabel("Packet number")
+        ax.set_xlabel("Time (ms)")
+        ax.set_title("Packet delays visualised")
+
+        if outputPath is not None:
+            fig.savefig(outputPath)
+        else:
+            from matplotlib import pyplot as plt
+            plt.show()
 
-            for wrapper in listOfListWrappers:
-                print("{}: {}".format(
-                        wrapper.get_list_name(), wrapper.get_list_data()))
+    # ? PRIVATE METHODS --------------------------------------------------------
 
-        plt.legend(graphDataList, graphListNames)
-        plt.ylabel("Packet number")
-        plt.xlabel("Time (ms)")
-        plt.title("Packet delays visualised")
-        plt.show()
-        
-            
+    def __get_series_colours(self, numHops: int):
+        """ Generates a colour (RGBA row) for every hop and delay type.
 
+        Each hop gets its own hue, and the delay types at that hop are
+            lighter / darker shades of it, so any path length works.
+        """
+        from matplotlib import colormaps
 
-        
-        
+        colourMap = colormaps["hsv"]
+        hopColours = colourMap(np.arange(0, numHops)/max(numHops, 1)*0.85)
 
-        
+        coloursList = np.empty((numHops*len(DELAY_SERIES), 4))
+        for j in range(0, len(DELAY_SERIES)):
+            shade = DELAY_SERIES[j][2]
+            if shade >= 0:
+                colours = hopColours[:, :3] + (1 - hopColours[:, :3])*shade
+            else:
+                colours = hopColours[:, :3]*(1 + shade)
+            coloursList[j::len(DELAY_SERIES), :3] = colours
+            coloursList[j::len(DELAY_SERIES), 3] = 1.0
+        return coloursList
+
+    def __create_figure(self, headless: bool):
+        """ Creates the figure and axes to draw on.
+
+        Headless figures aren't registered with pyplot, so no GUI backend is
+            ever loaded (png files are rendered by Agg).
+        """
+        if headless:
+            from matplotlib.figure import Figure
+            fig = Figure(tight_layout=True)
+            ax = fig.subplots()
+        else:
+            from matplotlib import pyplot as plt
+            fig, ax = plt.subplots(tight_layout=True)
+        return fig, ax
@@ -0,0 +1,240 @@
+# Standard libs
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Local libs
+from NetworkComponents import Link
+from NetworkComponents import Node
+
+from NetworkHelpers import SwitchingModes
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class Topology:
+    def __init__(self, nodesList: Optional[List[Node]] = None):
+        """ Graph of the nodes in a network and the links between them.
+
+        Keeps a (node, node) -> link index so that finding the link between
+            two nodes is a single dictionary lookup. The index is built
+            lazily and thrown away whenever the links of a registered node
+            change.
+        """
+        self.__nodesList: List[Node] = []
+        self.__nodesByName: Dict[str, Node] = {}
+
+        # (current node, next node) -> link, None when it needs rebuilding
+        self.__linkIndex: Optional[Dict[Tuple[Node, Node], Link]] = None
+
+        # node -> list of (neighbouring node, link)
+        self.__neighbourIndex: Optional[Dict[Node, List[Tuple[Node, Link]]]] \
+                = None
+
+        # Links we're listening to for parameter changes (by id)
+        self.__watchedLinks: Dict[int, Link] = {}
+
+        # Bumped whenever the structure or any parameter changes
+        self.__version = 0
+
+        if nodesList is not None:
+            for node in nodesList:
+                self.add_node(node)
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def add_node(self, nodeToAdd: Node):
+        """ Adds a node to the topology.
+
+        RAISES:
+        - Exception if a different node with the same name was already added.
+        """
+        name = nodeToAdd.get_name()
+        if name in self.__nodesByName:
+            if self.__nodesByName[name] is nodeToAdd:
+                return
+            raise Exception("Topology already has a node named {}".format(
+                    name))
+
+        self.__nodesList.append(nodeToAdd)
+        self.__nodesByName[name] = nodeToAdd
+        nodeToAdd.add_change_listener(self.__on_node_changed)
+        self.__watch_links(nodeToAdd)
+        self.invalidate()
+
+    def remove_node(self, nodeToRemove: Node):
+        self.__nodesList.remove(nodeToRemove)
+        del self.__nodesByName[nodeToRemove.get_name()]
+        nodeToRemove.remove_change_listener(self.__on_node_changed)
+        self.invalidate()
+
+    def get_nodes(self):
+        return self.__nodesList
+
+    def get_node(self, name: str):
+        """ Returns the node with the given name (or None). """
+        return self.__nodesByName.get(name)
+
+    def get_links(self):
+        """ Returns every link used by the nodes in the topology (each link
+                appears once). """
+        linksList: List[Link] = []
+        seen = set()
+        for node in self.__nodesList:
+            for link in node.get_links():
+                if id(link) not in seen:
+                    seen.add(id(link))
+                    linksList.append(link)
+        return linksList
+
+    def get_link(self, currentNode: Node, nextNode: Node):
+        """ Returns the link connecting `currentNode` to `nextNode`, or None
+                if they aren't directly connected. """
+        if self.__linkIndex is None:
+            self.__build_index()
+        return self.__linkIndex.get((currentNode, nextNode))
+
+    def get_neighbours(self, node: Node):
+        """ Returns a list of (neighbouring node, link) pairs for a node. """
+        if self.__neighbourIndex is None:
+            self.__build_index()
+        return self.__neighbourIndex.get(node, [])
+
+    def to_description(self):
+        """ Returns a compact, JSON compatible description of the topology:
+
+        {
+            "links": [{"name", "transmissionRate", "length", "propSpeed"}],
+            "nodes": [{"name", "processingDelay", "links": [link names]}]
+        }
+
+        Links without a name are named after their position ("L1", ...).
+            Circuit switching parameters ("reservedRate" for links,
+            "switchingMode" and "circuitSetupDelay" for nodes) are only
+            included when they're set.
+        """
+        linkNames: Dict[int, str] = {}
+        linksList: List[Dict[str, Any]] = []
+        for link in self.get_links():
+            name = link.get_name()
+            if name is None:
+                name = "L{}".format(len(linksList) + 1)
+            linkNames[id(link)] = name
+            linksList.append({
+                "name": name,
+                "transmissionRate": link.get_transmission_rate(),
+                "length": link.get_length(),
+                "propSpeed": link.get_prop_speed()
+            })
+            if link.has_reserved_rate():
+                linksList[-1]["reservedRate"] = link.get_reserved_rate()
+
+        nodesList: List[Dict[str, Any]] = []
+        for node in self.__nodesList:
+            nodesList.append({
+                "name": node.get_name(),
+                "processingDelay": node.get_processing_delay(),
+                "links": [linkNames[id(link)] for link in node.get_links()]
+            })
+            if node.is_circuit_switched():
+                nodesList[-1]["switchingMode"] = \
+                        node.get_switching_mode().name
+                nodesList[-1]["circuitSetupDelay"] = \
+                        node.get_circuit_setup_delay()
+
+        return {"links": linksList, "nodes": nodesList}
+
+    @staticmethod
+    def from_description(description: Dict[str, Any]):
+        """ Builds a topology (and its nodes and links) from a description
+                made by `to_description`.
+
+        RAISES:
+        - Exception if a node refers to a link that isn't described.
+        """
+        linksByName: Dict[str, Link] = {}
+        for linkDescription in description["links"]:
+            linksByName[linkDescription["name"]] = Link(
+                    transmissionRate=linkDescription["transmissionRate"],
+                    length=linkDescription["length"],
+                    propSpeed=linkDescription["propSpeed"],
+                    name=linkDescription["name"],
+                    reservedRate=linkDescription.get("reservedRate"))
+
+        nodesList: List[Node] = []
+        for nodeDescription in description["nodes"]:
+            linkNames = nodeDescription.get("links", [])
+            for linkName in linkNames:
+                if linkName not in linksByName:
+                    raise Exception("Node {} uses unknown link {}".format(
+                            nodeDescription["name"], linkName))
+            nodesList.append(Node(
+                    processingDelay=nodeDescription["processingDelay"],
+                    name=nodeDescription["name"],
+                    links=[linksByName[linkName]
+                            for linkName in linkNames],
+                    switchingMode=SwitchingModes[nodeDescription.get(
+                            "switchingMode", "PACKET_SWITCHED")],
+                    circuitSetupDelay=nodeDescription.get(
+                            "circuitSetupDelay", 0.0)))
+
+        return Topology(nodesList)
+
+    def get_link_by_name(self, name: str):
+        """ Returns the link with the given name (or None). """
+        for link in self.get_links():
+            if link.get_name() == name:
+                return link
+        return None
+
+    def get_version(self):
+        """ Returns a number that changes whenever a node or link of the
+                topology changes (use it to tell if cached results built from
+                the topology are still valid). """
+        return self.__version
+
+    def invalidate(self):
+        """ Throws away the link index (it is rebuilt on the next lookup). """
+        self.__linkIndex = None
+        self.__neighbourIndex = None
+        self.__version += 1
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __watch_links(self, node: Node):
+        for link in node.get_links():
+            if id(link) not in self.__watchedLinks:
+                self.__watchedLinks[id(link)] = link
+                link.add_change_listener(self.__on_link_changed)
+
+    def __on_node_changed(self, node: Node):
+        self.__watch_links(node)
+        self.invalidate()
+
+    def __on_link_changed(self, link: Link):
+        # The index doesn't depend on link parameters
+        self.__version += 1
+
+    def __build_index(self):
+        # Group the nodes by the links they have
+        nodesByLink: Dict[int, List[Node]] = {}
+        for node in self.__nodesList:
+            for link in node.get_links():
+                nodesByLink.setdefault(id(link), []).append(node)
+
+        linkIndex: Dict[Tuple[Node, Node], Link] = {}
+        neighbourIndex: Dict[Node, List[Tuple[Node, Link]]] = {}
+        for node1 in self.__nodesList:
+            neighbourIndex[node1] = []
+            for link in node1.get_links():
+                for node2 in nodesByLink[id(link)]:
+                    # Keep the first shared link in `node1`'s link order
+                    # (same as the nested loop in the path computer did)
+                    if node2 is node1 or (node1, node2) in linkIndex:
+                        continue
+                    linkIndex[(node1, node2)] = link
+                    neighbourIndex[node1].append((node2, link))
+
+        self.__linkIndex = linkIndex
+        self.__neighbourIndex = neighbourIndex
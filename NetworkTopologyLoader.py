@@ -0,0 +1,280 @@
+# Standard libs
+import hashlib
+import json
+import math
+import os
+import tempfile
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkComponents import Link
+from NetworkComponents import Node
+
+from NetworkHelpers import SwitchingModes
+
+from NetworkTopology import Topology
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Bump this whenever the layout of the cache files changes
+CACHE_FORMAT_VERSION = 2
+
+# Directory (next to the topology file) the compiled caches are written to
+DEFAULT_CACHE_DIR_NAME = "__topocache__"
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class TopologyLoader:
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def load(filePath: str, useCache: bool = True,
+            cacheDir: Optional[str] = None):
+        """ Loads a topology from a JSON or TOML file.
+
+        The file holds the same structure as `Topology.to_description`, i.e.
+            a list of `links` (name, transmissionRate, length, propSpeed and
+            optionally reservedRate) and a list of `nodes` (name,
+            processingDelay and optionally links, switchingMode and
+            circuitSetupDelay). In TOML these
+            are `[[links]]` and `[[nodes]]` tables.
+
+        The first time a file is loaded, the validated topology is compiled
+            into a `.npz` cache keyed by a hash of the file's contents. Later
+            loads of the same contents skip parsing and validation.
+
+        ARGS:
+        - filePath: Path to a `.json` or `.toml` file.
+        - useCache: Whether to read / write the compiled cache.
+        - cacheDir: Where to keep the caches (defaults to a `__topocache__`
+                directory next to the file).
+
+        RETURNS:
+        - A `Topology` object.
+        """
+        with open(filePath, "rb") as topologyFile:
+            contents = topologyFile.read()
+
+        cachePath = None
+        if useCache:
+            if cacheDir is None:
+                cacheDir = os.path.join(
+                        os.path.dirname(os.path.abspath(filePath)),
+                        DEFAULT_CACHE_DIR_NAME)
+            cachePath = os.path.join(cacheDir, "{}-{}.npz".format(
+                    os.path.splitext(os.path.basename(filePath))[0],
+                    TopologyLoader.get_content_hash(contents)))
+
+            if os.path.exists(cachePath):
+                return TopologyLoader.read_cache(cachePath)
+
+        description = TopologyLoader.parse(contents,
+                os.path.splitext(filePath)[1].lower())
+        TopologyLoader.validate_description(description)
+
+        if cachePath is not None:
+            # The cache is only an optimisation, e.g. the directory could be
+            # read only
+            try:
+                os.makedirs(cacheDir, exist_ok=True)
+                TopologyLoader.write_cache(cachePath, description)
+            except OSError:
+                pass
+
+        return Topology.from_description(description)
+
+    @staticmethod
+    def get_content_hash(contents: bytes):
+        """ Hash of a topology file's contents (and the cache format). """
+        digest = hashlib.sha256(contents)
+        digest.update(str(CACHE_FORMAT_VERSION).encode())
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def parse(contents: bytes, extension: str):
+        """ Parses the contents of a `.json` or `.toml` topology file into a
+                description dictionary. """
+        if extension == ".json":
+            return json.loads(contents)
+
+        if extension == ".toml":
+            try:
+                import tomllib
+            except ImportError:
+                raise Exception("Loading TOML topologies needs Python 3.11+ "
+                        "(tomllib)")
+            return tomllib.loads(contents.decode("utf-8"))
+
+        raise Exception("Unknown topology file type {}".format(extension))
+
+    @staticmethod
+    def validate_description(description: Dict[str, Any]):
+        """ Checks a topology description makes sense.
+
+        RAISES:
+        - Exception describing the first problem found.
+        """
+        for key in ("links", "nodes"):
+            if not isinstance(description.get(key), list):
+                raise Exception("Topology needs a list of {}".format(key))
+
+        linkNames = set()
+        for link in description["links"]:
+            name = link.get("name")
+            if not isinstance(name, str) or name in linkNames:
+                raise Exception("Links need unique names (got {})".format(
+                        name))
+            linkNames.add(name)
+
+            for parameter in ("transmissionRate", "propSpeed"):
+                if not TopologyLoader.__is_number(link.get(parameter)) or \
+                        link[parameter] <= 0:
+                    raise Exception("Link {} needs a positive {}".format(
+                            name, parameter))
+            if not TopologyLoader.__is_number(link.get("length")) or \
+                    link["length"] < 0:
+                raise Exception("Link {} needs a non-negative length".format(
+                        name))
+            if "reservedRate" in link and (not TopologyLoader.__is_number(
+                    link["reservedRate"]) or link["reservedRate"] <= 0):
+                raise Exception("Link {} needs a positive reservedRate".format(
+                        name))
+
+        nodeNames = set()
+        for node in description["nodes"]:
+            name = node.get("name")
+            if not isinstance(name, str) or name in nodeNames:
+                raise Exception("Nodes need unique names (got {})".format(
+                        name))
+            nodeNames.add(name)
+
+            if not TopologyLoader.__is_number(node.get("processingDelay")) or \
+                    node["processingDelay"] < 0:
+                raise Exception("Node {} needs a non-negative "
+                        "processingDelay".format(name))
+
+            if node.get("switchingMode", "PACKET_SWITCHED") not in \
+                    SwitchingModes.__members__:
+                raise Exception("Node {} has an unknown switchingMode "
+                        "{}".format(name, node["switchingMode"]))
+            if not TopologyLoader.__is_number(node.get("circuitSetupDelay",
+                    0.0)) or node.get("circuitSetupDelay", 0.0) < 0:
+                raise Exception("Node {} needs a non-negative "
+                        "circuitSetupDelay".format(name))
+
+            for linkName in node.get("links", []):
+                if linkName not in linkNames:
+                    raise Exception("Node {} uses unknown link {}".format(
+                            name, linkName))
+
+    @staticmethod
+    def write_cache(cachePath: str, description: Dict[str, Any]):
+        """ Writes a (validated) description as flat arrays.
+
+        Node links are stored in compressed sparse row form: the links of
+            node `i` are `nodeLinks[nodeLinkOffsets[i]:nodeLinkOffsets[i+1]]`
+            (indexes into the link arrays). Links without a reserved rate
+            have a NaN one.
+        """
+        linkIndexes = {link["name"]: i
+                for i, link in enumerate(description["links"])}
+
+        nodeLinks: List[int] = []
+        nodeLinkOffsets = [0]
+        for node in description["nodes"]:
+            nodeLinks.extend(linkIndexes[name]
+                    for name in node.get("links", []))
+            nodeLinkOffsets.append(len(nodeLinks))
+
+        links = description["links"]
+        nodes = description["nodes"]
+        arrays = {
+            "linkNames": np.array([link["name"] for link in links],
+                    dtype=str),
+            "linkRates": np.array([link["transmissionRate"]
+                    for link in links], dtype=np.float64),
+            "linkLengths": np.array([link["length"] for link in links],
+                    dtype=np.float64),
+            "linkPropSpeeds": np.array([link["propSpeed"] for link in links],
+                    dtype=np.float64),
+            "linkReservedRates": np.array([link.get("reservedRate", np.nan)
+                    for link in links], dtype=np.float64),
+            "nodeNames": np.array([node["name"] for node in nodes],
+                    dtype=str),
+            "nodeProcDelays": np.array([node["processingDelay"]
+                    for node in nodes], dtype=np.float64),
+            "nodeSwitchingModes": np.array([SwitchingModes[node.get(
+                            "switchingMode", "PACKET_SWITCHED")].value
+                    for node in nodes], dtype=np.int8),
+            "nodeSetupDelays": np.array([node.get("circuitSetupDelay", 0.0)
+                    for node in nodes], dtype=np.float64),
+            "nodeLinkOffsets": np.array(nodeLinkOffsets, dtype=np.int64),
+            "nodeLinks": np.array(nodeLinks, dtype=np.int64)
+        }
+
+        # Write to a temporary file of our own first, so a crash can't leave
+        # half a cache and concurrent writers don't clobber each other
+        temporaryFile = tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(cachePath) or ".", suffix=".tmp.npz",
+                delete=False)
+        try:
+            with temporaryFile:
+                np.savez(temporaryFile, **arrays)
+            os.replace(temporaryFile.name, cachePath)
+        except BaseException:
+            if os.path.exists(temporaryFile.name):
+                os.remove(temporaryFile.name)
+            raise
+
+    @staticmethod
+    def read_cache(cachePath: str):
+        """ Builds a topology from a cache written by `write_cache`. """
+        with np.load(cachePath) as cache:
+            linksList = [Link(transmissionRate=rate, length=length,
+                            propSpeed=propSpeed, name=name,
+                            reservedRate=None if math.isnan(reservedRate)
+                                    else reservedRate)
+                    for name, rate, length, propSpeed, reservedRate in zip(
+                            cache["linkNames"].tolist(),
+                            cache["linkRates"].tolist(),
+                            cache["linkLengths"].tolist(),
+                            cache["linkPropSpeeds"].tolist(),
+                            cache["linkReservedRates"].tolist())]
+
+            offsets = cache["nodeLinkOffsets"].tolist()
+            nodeLinks = cache["nodeLinks"].tolist()
+            nodesList = [Node(processingDelay=procDelay, name=name,
+                            links=[linksList[j]
+                                    for j in nodeLinks[offsets[i]:
+                                            offsets[i + 1]]],
+                            switchingMode=SwitchingModes(switchingMode),
+                            circuitSetupDelay=setupDelay)
+                    for i, (name, procDelay, switchingMode, setupDelay) in
+                            enumerate(zip(cache["nodeNames"].tolist(),
+                                    cache["nodeProcDelays"].tolist(),
+                                    cache["nodeSwitchingModes"].tolist(),
+                                    cache["nodeSetupDelays"].tolist()))]
+
+        return Topology(nodesList)
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    @staticmethod
+    def __is_number(value: Any):
+        """ Whether a value is a finite number (NaN or infinity would pass
+                every comparison check, or be compiled into the cache). """
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        try:
+            return math.isfinite(value)
+        except OverflowError:
+            # An int too large to be a float
+            return False
@@ -0,0 +1,264 @@
+# Standard libs
+import os
+
+from typing import Optional
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkBatchSolver import BatchPathResult
+
+from NetworkHelpers import TimeBlockTypes
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# One record per (packet, hop). The start of each delay is the stop of the
+# previous one (arrival -> queue stop -> processing stop -> transmission stop
+# -> propagation stop)
+RECORD_DTYPE = np.dtype([
+    ("packetId", "<i8"),
+    ("hop", "<i4"),
+    ("arrival", "<f8"),
+    ("queueStop", "<f8"),
+    ("processingStop", "<f8"),
+    ("transmissionStop", "<f8"),
+    ("propagationStop", "<f8")
+])
+
+# Start and stop fields of each delay type
+DELAY_FIELDS = {
+    TimeBlockTypes.QUEUING_DELAY: ("arrival", "queueStop"),
+    TimeBlockTypes.PROCESSING_DELAY: ("queueStop", "processingStop"),
+    TimeBlockTypes.TRANSMISSION_DELAY: ("processingStop", "transmissionStop"),
+    TimeBlockTypes.PROPAGATION_DELAY: ("transmissionStop", "propagationStop")
+}
+
+# Number of records buffered in memory before they're written out
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Size reserved for the `.npy` header, so it can be rewritten with the final
+# number of records once the file is closed
+NPY_HEADER_SIZE = 512
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class TraceWriter:
+    def __init__(self, filePath: str, chunkSize: int = DEFAULT_CHUNK_SIZE):
+        """ Streams per (packet, hop) time records to a file.
+
+        Records are buffered and written a chunk at a time, so traces of any
+            size can be written in constant memory. The format depends on the
+            extension of `filePath`:
+
+        - `.npy`: A 1D NumPy array of `RECORD_DTYPE` records. The header is
+                filled in with the number of records when the writer is
+                closed.
+        - `.parquet`: A Parquet file with a column per field and a row group
+                per chunk (needs `pyarrow`).
+
+        Use the writer as a context manager (or call `close`).
+
+        RAISES:
+        - Exception if the extension isn't supported, or `pyarrow` isn't
+                installed for `.parquet`.
+        """
+        self.__filePath = filePath
+        self.__extension = os.path.splitext(filePath)[1].lower()
+        self.__numRecords = 0
+        self.__nextPacketId = 0
+
+        self.__buffer = np.empty(chunkSize, dtype=RECORD_DTYPE)
+        self.__fill = 0
+
+        self.__file = None
+        self.__parquetWriter = None
+        if self.__extension == ".npy":
+            self.__file = open(filePath, "wb")
+            self.__write_npy_header()
+        elif self.__extension == ".parquet":
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise Exception("Writing Parquet traces needs pyarrow")
+            self.__parquetWriter = pyarrow.parquet.ParquetWriter(filePath,
+                    pyarrow.schema([(name,
+                            pyarrow.from_numpy_dtype(RECORD_DTYPE[name]))
+                            for name in RECORD_DTYPE.names]))
+        else:
+            raise Exception("Unknown trace file type {}".format(
+                    self.__extension))
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+    def get_num_records(self):
+        """ Number of records written so far (including buffered ones). """
+        return self.__numRecords + self.__fill
+
+    def write_records(self, packetIds: np.ndarray, hops: np.ndarray,
+            arrivals: np.ndarray, queueStops: np.ndarray,
+            processingStops: np.ndarray, transmissionStops: np.ndarray,
+            propagationStops: np.ndarray):
+        """ Writes a record per entry of the (broadcastable) arrays. """
+        columns = np.broadcast_arrays(packetIds, hops, arrivals, queueStops,
+                processingStops, transmissionStops, propagationStops)
+        numRows = columns[0].size
+
+        start = 0
+        while start < numRows:
+            count = min(numRows - start, len(self.__buffer) - self.__fill)
+            rows = self.__buffer[self.__fill:self.__fill + count]
+            for name, column in zip(RECORD_DTYPE.names, columns):
+                rows[name] = column.ravel()[start:start + count]
+
+            self.__fill += count
+            start += count
+            if self.__fill == len(self.__buffer):
+                self.flush()
+
+    def write_batch_result(self, result: BatchPathResult,
+            firstPacketId: Optional[int] = None):
+        """ Writes every (packet, hop) of a `BatchPathResult`.
+
+        ARGS:
+        - result: The packets' times.
+        - firstPacketId: Id of the first packet in the result (by default,
+                the packets carry on from the last result written).
+        """
+        if firstPacketId is None:
+            firstPacketId = self.__nextPacketId
+
+        arrivals = result.get_arrival_times()
+        numPackets, numHops = arrivals.shape
+        self.__nextPacketId = firstPacketId + numPackets
+        self.write_records(
+                np.arange(firstPacketId, firstPacketId + numPackets)\
+                        [:, np.newaxis],
+                np.arange(0, numHops)[np.newaxis, :],
+                arrivals,
+                result.get_queue_stop_times(),
+                result.get_processing_stop_times(),
+                result.get_transmission_stop_times(),
+                result.get_propagation_stop_times())
+
+    def flush(self):
+        """ Writes the buffered records out. """
+        if self.__fill == 0:
+            return
+
+        rows = self.__buffer[:self.__fill]
+        if self.__file is not None:
+            self.__file.write(rows.tobytes())
+        else:
+            import pyarrow
+            self.__parquetWriter.write_table(pyarrow.table(
+                    {name: rows[name] for name in RECORD_DTYPE.names}))
+
+        self.__numRecords += self.__fill
+        self.__fill = 0
+
+    def close(self):
+        """ Flushes the records and finishes the file. """
+        self.flush()
+        if self.__file is not None and not self.__file.closed:
+            self.__write_npy_header()
+            self.__file.close()
+        elif self.__parquetWriter is not None:
+            self.__parquetWriter.close()
+            self.__parquetWriter = None
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __write_npy_header(self):
+        """ Writes (or rewrites) a version 1.0 `.npy` header of exactly
+                `NPY_HEADER_SIZE` bytes. """
+        header = "{{'descr': {}, 'fortran_order': False, 'shape': ({},), }}"\
+                .format(np.lib.format.dtype_to_descr(RECORD_DTYPE),
+                        self.__numRecords)
+
+        # Magic string, version, header length, then the padded header
+        prefixSize = 10
+        header = header.ljust(NPY_HEADER_SIZE - prefixSize - 1) + "\n"
+
+        position = self.__file.tell()
+        self.__file.seek(0)
+        self.__file.write(b"\x93NUMPY\x01\x00")
+        self.__file.write(np.uint16(len(header)).astype("<u2").tobytes())
+        self.__file.write(header.encode("latin1"))
+        if position > 0:
+            self.__file.seek(position)
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class TraceReader:
+    def __init__(self, filePath: str):
+        """ Reads a trace written by `TraceWriter`.
+
+        A `.npy` trace is memory-mapped: nothing is read until it's used, and
+            the columns are views into the file (no copies), so traces larger
+            than memory can be analysed. A `.parquet` trace is read with
+            `pyarrow` (memory-mapped, but decoded into memory).
+        """
+        extension = os.path.splitext(filePath)[1].lower()
+        if extension == ".npy":
+            self.__records = np.load(filePath, mmap_mode="r")
+            if self.__records.dtype != RECORD_DTYPE:
+                raise Exception("{} isn't a trace file".format(filePath))
+            self.__columns = None
+        elif extension == ".parquet":
+            try:
+                import pyarrow.parquet
+            except ImportError:
+                raise Exception("Reading Parquet traces needs pyarrow")
+            table = pyarrow.parquet.read_table(filePath, memory_map=True)
+            self.__records = None
+            self.__columns = {name: table.column(name).to_numpy()
+                    for name in RECORD_DTYPE.names}
+        else:
+            raise Exception("Unknown trace file type {}".format(extension))
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_num_records(self):
+        return len(self.get_column("packetId"))
+
+    def get_records(self):
+        """ Returns the records as a (memory-mapped) structured array (`.npy`
+                traces only, None otherwise). """
+        return self.__records
+
+    def get_column(self, name: str):
+        """ Returns a field of every record (see `RECORD_DTYPE`). """
+        if self.__records is not None:
+            return self.__records[name]
+        return self.__columns[name]
+
+    def get_packet_ids(self):
+        return self.get_column("packetId")
+
+    def get_hops(self):
+        return self.get_column("hop")
+
+    def get_delays(self, delayType: TimeBlockTypes,
+            start: int = 0, stop: Optional[int] = None):
+        """ Returns the delay of one type for the records in [start, stop).
+
+        Only that range is read from the file, so a large trace can be worked
+            through in chunks.
+        """
+        startField, stopField = DELAY_FIELDS[delayType]
+        return self.get_column(stopField)[start:stop] - \
+                self.get_column(startField)[start:stop]
+
+    def iter_chunks(self, chunkSize: int = DEFAULT_CHUNK_SIZE):
+        """ Yields (start, stop) ranges covering every record. """
+        numRecords = self.get_num_records()
+        for start in range(0, numRecords, chunkSize):
+            yield start, min(numRecords, start + chunkSize)
@@ -0,0 +1,332 @@
+# Standard libs
+import io
+import mmap
+import os
+import re
+
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+# Third party libs
+import numpy as np
+
+# Local libs
+from NetworkComponents import Node
+from NetworkComponents import Packet
+from NetworkComponents import TimeBlock
+
+from NetworkPathComputer import NetworkPathComputer
+
+from NetworkPathStreamer import PacketDelivery
+
+from NetworkTopology import Topology
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Layout of a fixed width binary packet record (little endian, no padding)
+PACKET_RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("size", "<u4"),
+    ("flow", "<i4")
+])
+
+# Fields of a binary record (or columns of a CSV file) holding the timestamp,
+# size and flow of each packet
+DEFAULT_FIELDS = ("timestamp", "size", "flow")
+
+# Number of binary records parsed at a time
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Number of bytes of a CSV file parsed at a time
+DEFAULT_CHUNK_BYTES = 1 << 22
+
+# Lines of a CSV file holding only whitespace, after the first line of a
+# chunk (NumPy skips empty lines, but fails to parse these)
+WHITESPACE_LINE_PATTERN = re.compile(rb"\n[ \t\r\f\v]+(?=\n|\Z)")
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class TraceReplay:
+    def __init__(self, filePath: str,
+            fields: Sequence[Optional[Union[str, int]]] = DEFAULT_FIELDS,
+            recordDtype: np.dtype = PACKET_RECORD_DTYPE,
+            headerSize: int = 0, delimiter: str = ",",
+            sizeScale: float = 1.0, startTime: Optional[float] = None,
+            chunkSize: int = DEFAULT_CHUNK_SIZE,
+            chunkBytes: int = DEFAULT_CHUNK_BYTES):
+        """ Replays the packets of a captured trace, a chunk at a time.
+
+        The trace file is memory-mapped, so only the chunk being parsed is
+            ever in memory, however large the file is. Two kinds of files are
+            read:
+
+        - `.csv` (or `.txt`): One packet per line. Each chunk of lines is
+                parsed at once with NumPy. A header line is skipped (and
+                lets `fields` name columns rather than number them).
+        - Anything else: Fixed width binary records of `recordDtype`,
+                starting `headerSize` bytes into the file. Each chunk is a
+                slice of the mapped records.
+
+        Packets must be in time order. Every packet has a timestamp (its
+            injection time), a size and a flow number (0 if the trace has no
+            flow field).
+
+        ARGS:
+        - filePath: The trace file.
+        - fields: The names (or CSV column numbers) of the timestamp, size
+                and flow fields. The flow can be None. CSV files without a
+                header have their columns in this order.
+        - recordDtype: Layout of a binary record.
+        - headerSize: Bytes to skip at the start of a binary file.
+        - delimiter: Separator of the CSV columns.
+        - sizeScale: Factor turning the trace's sizes into bits (e.g. 8 if
+                they're in bytes).
+        - startTime: Shift the timestamps so the first packet is injected at
+                this time (e.g. 0 for traces with wall clock timestamps).
+                The timestamps are used as they are if None.
+        - chunkSize: Number of binary records parsed at a time.
+        - chunkBytes: Number of bytes of a CSV file parsed at a time.
+        """
+        self.__filePath = filePath
+        self.__sizeScale = sizeScale
+        self.__startTime = startTime
+        self.__chunkSize = chunkSize
+        self.__chunkBytes = chunkBytes
+        self.__delimiter = delimiter
+
+        extension = os.path.splitext(filePath)[1].lower()
+        self.__isCsv = extension in (".csv", ".txt")
+
+        if self.__isCsv:
+            self.__records = None
+            self.__columns, self.__dataStart = self.__read_csv_header(fields)
+        else:
+            for field in fields:
+                if field is not None and field not in recordDtype.names:
+                    raise Exception("Record has no field {}".format(field))
+            self.__fields = fields
+            numRecords = (os.path.getsize(filePath) - headerSize)//\
+                    recordDtype.itemsize
+            self.__records = np.memmap(filePath, dtype=recordDtype,
+                    mode="r", offset=headerSize, shape=(numRecords,)) \
+                    if numRecords > 0 else np.empty(0, dtype=recordDtype)
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_file_path(self):
+        return self.__filePath
+
+    def get_num_records(self):
+        """ Returns the number of packets in a binary trace (None for CSV
+                traces, which would have to be read to find out). """
+        if self.__records is None:
+            return None
+        return len(self.__records)
+
+    def chunks(self):
+        """ Yields (timestamps, sizes in bits, flows) arrays, a chunk of
+                packets at a time.
+
+        RAISES:
+        - Exception if the packets aren't in time order.
+        """
+        rawChunks = self.__csv_chunks() if self.__isCsv else \
+                self.__binary_chunks()
+
+        offset = None
+        lastTime = -np.inf
+        for timestamps, sizes, flows in rawChunks:
+            if len(timestamps) == 0:
+                continue
+
+            if self.__startTime is not None:
+                if offset is None:
+                    offset = self.__startTime - timestamps[0]
+                timestamps += offset
+
+            if timestamps[0] < lastTime or np.any(np.diff(timestamps) < 0):
+                raise Exception("Packets of {} aren't in time order".format(
+                        self.__filePath))
+            lastTime = timestamps[-1]
+
+            yield timestamps, sizes*self.__sizeScale, flows
+
+    def batches(self, flow: Optional[int] = None):
+        """ Yields (injection times, packet sizes) batches, the format of
+                `NetworkTrafficGenerators` (e.g. for
+                `NetworkBatchSolver.solve_batches`).
+
+        ARGS:
+        - flow: Only replay the packets of this flow (all if None).
+        """
+        for timestamps, sizes, flows in self.chunks():
+            if flow is not None:
+                inFlow = flows == flow
+                timestamps, sizes = timestamps[inFlow], sizes[inFlow]
+            if len(timestamps) > 0:
+                yield timestamps, sizes
+
+    def __iter__(self):
+        return self.batches()
+
+    def packets(self, flow: Optional[int] = None):
+        """ Yields (packet size, injection time) pairs, the format of
+                `PathStreamer.stream`. """
+        for timestamps, sizes in self.batches(flow):
+            yield from zip(sizes.tolist(), timestamps.tolist())
+
+    def replay_path(self, path: List[Node], flow: Optional[int] = None,
+            topology: Optional[Topology] = None):
+        """ Sends the trace's packets along a path through the node queues,
+                one packet at a time with `compute_path_step` (each packet
+                enters the source node at its timestamp).
+
+        Each packet is taken off the destination's queue once it's
+            delivered, so replaying a long trace doesn't keep every packet
+            alive.
+
+        ARGS:
+        - path: The nodes the packets travel through.
+        - flow: Only replay the packets of this flow (all if None).
+        - topology: The topology containing the path (optional).
+
+        RETURNS:
+        - A generator of `PacketDelivery` objects (see
+                `NetworkPathStreamer.py`).
+        """
+        for node in path[:-1]:
+            NetworkPathComputer.check_packet_switched(node)
+
+        previousBlocksSteps: List[List[TimeBlock]] = [[]
+                for _ in range(0, len(path) - 1)]
+        packetNum = 0
+        for packetSize, injectionTime in self.packets(flow):
+            packet = Packet(packetSize=packetSize)
+            path[0].add_packet_to_queue(packet)
+
+            t0 = injectionTime
+            hopTimes: List[Tuple[float, float, float, float, float]] = []
+            for i in range(0, len(path) - 1):
+                blocks = NetworkPathComputer.compute_path_step(
+                        currentNode=path[i],
+                        nextNode=path[i + 1],
+                        t0=t0,
+                        previousBlocksList=previousBlocksSteps[i],
+                        topology=topology)
+                previousBlocksSteps[i] = blocks
+
+                # Processing, transmission and propagation always come last
+                hopTimes.append((t0, blocks[-3].get_start_time(),
+                        blocks[-2].get_start_time(),
+                        blocks[-1].get_start_time(),
+                        blocks[-1].get_stop_time()))
+                t0 = blocks[-1].get_stop_time()
+
+            path[-1].get_next_packet()
+            yield PacketDelivery(packetNum=packetNum,
+                    injectionTime=injectionTime, delay=packet.get_delay(),
+                    hopTimes=hopTimes)
+            packetNum += 1
+
+    @staticmethod
+    def write_binary(filePath: str, timestamps: np.ndarray,
+            sizes: np.ndarray, flows: Optional[np.ndarray] = None,
+            recordDtype: np.dtype = PACKET_RECORD_DTYPE):
+        """ Writes packets as fixed width binary records (e.g. to convert a
+                CSV trace once, so later replays don't have to parse it). """
+        records = np.empty(len(timestamps), dtype=recordDtype)
+        records["timestamp"] = timestamps
+        records["size"] = sizes
+        records["flow"] = 0 if flows is None else flows
+        records.tofile(filePath)
+
+    # ? PRIVATE METHODS --------------------------------------------------------
+
+    def __binary_chunks(self):
+        """ Yields (timestamps, sizes, flows) arrays from a binary trace. """
+        timestampField, sizeField, flowField = self.__fields
+        for start in range(0, len(self.__records), self.__chunkSize):
+            rows = self.__records[start:start + self.__chunkSize]
+            flows = np.zeros(len(rows), dtype=np.int64) if flowField is None \
+                    else rows[flowField].astype(np.int64)
+            yield (rows[timestampField].astype(np.float64),
+                    rows[sizeField].astype(np.float64), flows)
+
+    def __csv_chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray,
+            np.ndarray]]:
+        """ Yields (timestamps, sizes, flows) arrays from a CSV trace, parsing
+                a chunk of whole lines at a time. """
+        if os.path.getsize(self.__filePath) == 0:
+            return
+
+        with open(self.__filePath, "rb") as traceFile, \
+                mmap.mmap(traceFile.fileno(), 0, access=mmap.ACCESS_READ) \
+                        as mapped:
+            start = self.__dataStart
+            while start < len(mapped):
+                end = mapped.find(b"\n", start + self.__chunkBytes)
+                end = len(mapped) if end == -1 else end + 1
+
+                # Skip chunks of blank lines (e.g. at the end of the file),
+                # and empty out whitespace only lines among the data
+                chunk = mapped[start:end]
+                start = end
+                if not chunk.strip():
+                    continue
+                chunk = TraceReplay.__empty_whitespace_lines(chunk)
+
+                table = np.loadtxt(io.BytesIO(chunk),
+                        delimiter=self.__delimiter,
+                        usecols=[column for column in self.__columns
+                                if column is not None],
+                        dtype=np.float64, ndmin=2)
+
+                flows = table[:, 2].astype(np.int64) \
+                        if self.__columns[2] is not None else \
+                        np.zeros(len(table), dtype=np.int64)
+                yield table[:, 0].copy(), table[:, 1].copy(), flows
+
+    @staticmethod
+    def __empty_whitespace_lines(chunk: bytes):
+        """ Returns the chunk with its whitespace only lines emptied. """
+        firstEnd = chunk.find(b"\n")
+        if firstEnd > 0 and chunk[:firstEnd].isspace():
+            chunk = chunk[firstEnd:]
+        return WHITESPACE_LINE_PATTERN.sub(b"\n", chunk)
+
+    def __read_csv_header(self,
+            fields: Sequence[Optional[Union[str, int]]]):
+        """ Works out the column of each field, and where the data starts.
+
+        RETURNS:
+        - (columns, offset of the first data line)
+        """
+        with open(self.__filePath, "rb") as traceFile:
+            firstLine = traceFile.readline()
+
+        names = [name.strip() for name in
+                firstLine.decode().strip().split(self.__delimiter)]
+        try:
+            [float(name) for name in names if name != ""]
+            hasHeader = False
+        except ValueError:
+            hasHeader = True
+
+        columns: List[Optional[int]] = []
+        for i, field in enumerate(fields):
+            if field is None or isinstance(field, int):
+                columns.append(field)
+            elif hasHeader:
+                columns.append(names.index(field) if field in names else None)
+            else:
+                # Without a header, the columns are in the order of `fields`
+                columns.append(i if i < len(names) else None)
+
+        if columns[0] is None or columns[1] is None:
+            raise Exception("{} needs a timestamp and a size column".format(
+                    self.__filePath))
+        return columns, len(firstLine) if hasHeader else 0
@@ -0,0 +1,169 @@
+# Standard libs
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# Local libs
+from NetworkHelpers import __DEBUG_ENABLED__
+
+# * SINKS ----------------------------------------------------------------------
+
+class RingBufferSink:
+    def __init__(self, maxRecords: int = 100000):
+        """ Keeps the most recent `maxRecords` trace records in memory. """
+        self.__records: Deque[Tuple[Any, ...]] = deque(maxlen=maxRecords)
+
+    def write(self, record: Tuple[Any, ...]):
+        self.__records.append(record)
+
+    def get_records(self):
+        return list(self.__records)
+
+    def close(self):
+        pass
+
+class FileSink:
+    def __init__(self, filePath: str, bufferSize: int = 1 << 20):
+        """ Writes trace records to a file, one comma separated record per
+                line. Writes are buffered (`bufferSize` bytes). """
+        self.__file = open(filePath, "w", buffering=bufferSize)
+
+    def write(self, record: Tuple[Any, ...]):
+        self.__file.write(",".join(map(str, record)))
+        self.__file.write("\n")
+
+    def close(self):
+        self.__file.close()
+
+class PrintSink:
+    def write(self, record: Tuple[Any, ...]):
+        """ Prints hop records the way the path computer's debug output
+                used to. """
+        if record[0] != "hop":
+            return
+        _, _, _, _, t1, t2, t3, t4 = record
+        print("\nFinished Queue: {}ms, ".format(round((t1)*1000,5)), end="")
+        print("Finished Processing: {}ms, ".format(
+                round((t2)*1000,5)), end="")
+        print("Finished transmission: {}ms, ".format(
+                round((t3)*1000,5)), end="")
+        print("Finished Propagation: {}ms\n".format(round((t4)*1000,5)))
+
+    def close(self):
+        pass
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+HopHook = Callable[[str, str, float, float, float, float, float], None]
+
+class Tracer:
+    def __init__(self, sink: Optional[Any] = None):
+        """ Collects trace records, counters and timers from the simulators.
+
+        Nothing is traced unless a tracer is installed with `set_tracer`.
+            The hot paths only check whether `NetworkTracing.TRACER` is None,
+            so tracing costs nothing when it is disabled.
+
+        ARGS:
+        - sink: Where trace records go (an object with `write(record)` and
+                `close()`, e.g. a `RingBufferSink` or `FileSink`). If not
+                given, only the counters and timers are kept.
+        """
+        self.__sink = sink
+        self.__hopHooks: List[HopHook] = []
+        self.__counters: Dict[str, int] = {}
+        self.__timers: Dict[str, List[float]] = {}
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_sink(self):
+        return self.__sink
+
+    def add_hop_hook(self, hook: HopHook):
+        """ Registers a callback called for every hop a packet makes, with
+                (node name, next node name, arrival, queue stop, processing
+                stop, transmission stop, propagation stop). """
+        self.__hopHooks.append(hook)
+
+    def remove_hop_hook(self, hook: HopHook):
+        self.__hopHooks.remove(hook)
+
+    def on_hop(self, nodeName: str, nextNodeName: str, t0: float, t1: float,
+            t2: float, t3: float, t4: float):
+        """ Records a packet moving from one node to the next. """
+        counters = self.__counters
+        counters["hops"] = counters.get("hops", 0) + 1
+        if t1 > t0:
+            counters["queue_events"] = counters.get("queue_events", 0) + 1
+
+        for hook in self.__hopHooks:
+            hook(nodeName, nextNodeName, t0, t1, t2, t3, t4)
+
+        if self.__sink is not None:
+            self.__sink.write(("hop", nodeName, nextNodeName, t0, t1, t2, t3,
+                    t4))
+
+    def on_packet_delivered(self, packetNum: int, delay: float,
+            flowName: Optional[str] = None):
+        """ Records a packet reaching the end of its path (as part of flow
+                `flowName`, if known). """
+        self.count("packets")
+        if self.__sink is not None:
+            self.__sink.write(("delivery", packetNum, delay, flowName))
+
+    def count(self, name: str, amount: int = 1):
+        self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float):
+        """ Adds a measured duration to the timer `name`. """
+        timer = self.__timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        """ Times the body of a `with` block into the timer `name`. """
+        startTime = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - startTime)
+
+    def get_counters(self):
+        return dict(self.__counters)
+
+    def get_timers(self):
+        """ Returns a dictionary of timer name -> (calls, total seconds). """
+        return {name: (int(timer[0]), timer[1])
+                for name, timer in self.__timers.items()}
+
+    def close(self):
+        if self.__sink is not None:
+            self.__sink.close()
+
+# * GLOBAL TRACER --------------------------------------------------------------
+
+# The installed tracer (None when tracing is disabled). Read it as
+# `NetworkTracing.TRACER` so that changes made by `set_tracer` are seen.
+TRACER: Optional[Tracer] = None
+
+def set_tracer(tracer: Optional[Tracer]):
+    """ Installs a tracer (or disables tracing if None). Returns the tracer
+            that was installed before. """
+    global TRACER
+    previousTracer = TRACER
+    TRACER = tracer
+    return previousTracer
+
+def get_tracer():
+    return TRACER
+
+if __DEBUG_ENABLED__:
+    set_tracer(Tracer(sink=PrintSink()))
@@ -0,0 +1,268 @@
+# Standard libs
+from abc import ABC
+from abc import abstractmethod
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+# Third party libs
+import numpy as np
+
+# * CONSTANTS ------------------------------------------------------------------
+
+# Number of packets generated per batch
+DEFAULT_BATCH_SIZE = 1 << 16
+
+# * AUXILIARY CLASSES ----------------------------------------------------------
+
+class ConstantSizes:
+    def __init__(self, packetSize: float):
+        """ Every packet has the same size (in bits). """
+        self.__packetSize = float(packetSize)
+
+    def get_packet_size(self):
+        return self.__packetSize
+
+    def sample(self, rng: np.random.Generator, numPackets: int):
+        return np.full(numPackets, self.__packetSize)
+
+class EmpiricalSizes:
+    def __init__(self, packetSizes: Sequence[float],
+            weights: Optional[Sequence[float]] = None):
+        """ Packet sizes drawn from an empirical distribution.
+
+        ARGS:
+        - packetSizes: The possible sizes (in bits), or a sample of observed
+                sizes (e.g. taken from a trace).
+        - weights: Relative frequency of each size (defaults to equal, i.e.
+                resampling `packetSizes`).
+        """
+        self.__packetSizes = np.asarray(packetSizes, dtype=np.float64)
+        if len(self.__packetSizes) == 0:
+            raise Exception("Empirical distribution needs at least one size")
+
+        self.__probabilities = None
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            if weights.shape != self.__packetSizes.shape or \
+                    np.any(weights < 0) or weights.sum() <= 0:
+                raise Exception("Need a non-negative weight per packet size")
+            self.__probabilities = weights/weights.sum()
+
+    def get_mean_packet_size(self):
+        if self.__probabilities is None:
+            return float(self.__packetSizes.mean())
+        return float(np.dot(self.__packetSizes, self.__probabilities))
+
+    def sample(self, rng: np.random.Generator, numPackets: int):
+        return rng.choice(self.__packetSizes, size=numPackets,
+                p=self.__probabilities)
+
+# * MAIN CLASS -----------------------------------------------------------------
+
+class TrafficGenerator(ABC):
+    def __init__(self, packetSizes: Union[float, ConstantSizes,
+                    EmpiricalSizes] = 8000,
+            numPackets: Optional[int] = None, startTime: float = 0.0,
+            seed: Optional[int] = None, batchSize: int = DEFAULT_BATCH_SIZE):
+        """ Base class of the arrival processes.
+
+        A generator lazily yields (injection times, packet sizes) batches as
+            arrays, so a workload of any length can be fed to the solvers
+            (see `NetworkBatchSolver.solve_batches`) without holding it all
+            in memory. Subclasses only have to implement `generate_times`.
+
+        ARGS:
+        - packetSizes: A fixed size in bits, or a size distribution
+                (`ConstantSizes` / `EmpiricalSizes`).
+        - numPackets: Total number of packets (None for an endless stream).
+        - startTime: Time of the start of the stream.
+        - seed: Seed of the random number generator. Iterating over the same
+                generator again (with a seed) yields exactly the same
+                packets.
+        - batchSize: Number of packets per batch.
+        """
+        if not isinstance(packetSizes, (ConstantSizes, EmpiricalSizes)):
+            packetSizes = ConstantSizes(packetSizes)
+
+        self.__packetSizes = packetSizes
+        self.__numPackets = numPackets
+        self.__startTime = startTime
+        self.__seed = seed
+        self.__batchSize = batchSize
+
+    # ? PUBLIC METHODS ---------------------------------------------------------
+
+    def get_packet_sizes(self):
+        return self.__packetSizes
+
+    def get_num_packets(self):
+        return self.__numPackets
+
+    def get_start_time(self):
+        return self.__startTime
+
+    def get_seed(self):
+        return self.__seed
+
+    def batches(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """ Lazily yields (injection times, packet sizes) batches. The times
+                are non-decreasing across the whole stream. """
+        rng = np.random.default_rng(self.__seed)
+        self.reset()
+
+        lastTime = self.__startTime
+        remaining = self.__numPackets
+        while remaining is None or remaining > 0:
+            numPackets = self.__batchSize if remaining is None \
+                    else min(self.__batchSize, remaining)
+
+            packetSizes = self.__packetSizes.sample(rng, numPackets)
+            injectionTimes = self.generate_times(rng, packetSizes, lastTime)
+            lastTime = float(injectionTimes[-1])
+
+            if remaining is not None:
+                remaining -= numPackets
+            yield injectionTimes, packetSizes
+
+    def __iter__(self):
+        return self.batches()
+
+    def reset(self):
+        """ Called at the start of every iteration, for generators that keep
+                state between batches. """
+        pass
+
+    @abstractmethod
+    def generate_times(self, rng: np.random.Generator,
+            packetSizes: np.ndarray, lastTime: float) -> np.ndarray:
+        """ Returns the injection times of the next batch of packets (every
+                arrival process must implement this).
+
+        ARGS:
+        - rng: The generator's random number generator.
+        - packetSizes: The sizes of the packets in the batch.
+        - lastTime: The injection time of the previous packet (or the start
+                time for the first batch).
+        """
+
+class PoissonTraffic(TrafficGenerator):
+    def __init__(self, rate: float, **kwargs):
+        """ Poisson arrivals (exponential inter-arrival times).
+
+        ARGS:
+        - rate: The mean number of packets per second.
+        - kwargs: See `TrafficGenerator`.
+        """
+        if rate <= 0:
+            raise Exception("Poisson traffic needs a positive rate")
+        super().__init__(**kwargs)
+        self.__rate = rate
+
+    def get_rate(self):
+        return self.__rate
+
+    def generate_times(self, rng: np.random.Generator,
+            packetSizes: np.ndarray, lastTime: float):
+        gaps = rng.exponential(1/self.__rate, size=len(packetSizes))
+        return lastTime + np.cumsum(gaps)
+
+class ConstantBitRateTraffic(TrafficGenerator):
+    def __init__(self, bitRate: float, **kwargs):
+        """ Constant bit rate traffic: each packet is sent as soon as the
+                previous one would have finished at `bitRate` (so with
+                constant sizes, the packets are evenly spaced). The first
+                packet is injected at the start time.
+
+        ARGS:
+        - bitRate: The rate of the source in bits per second.
+        - kwargs: See `TrafficGenerator`.
+        """
+        if bitRate <= 0:
+            raise Exception("Constant bit rate traffic needs a positive rate")
+        super().__init__(**kwargs)
+        self.__bitRate = bitRate
+
+    def get_bit_rate(self):
+        return self.__bitRate
+
+    def reset(self):
+        self.__previousSize: Optional[float] = None
+
+    def generate_times(self, rng: np.random.Generator,
+            packetSizes: np.ndarray, lastTime: float):
+        # The gap before each packet is the time the previous packet takes
+        gaps = np.empty(len(packetSizes))
+        gaps[0] = 0.0 if self.__previousSize is None \
+                else self.__previousSize/self.__bitRate
+        gaps[1:] = packetSizes[:-1]/self.__bitRate
+
+        self.__previousSize = float(packetSizes[-1])
+        return lastTime + np.cumsum(gaps)
+
+class OnOffTraffic(TrafficGenerator):
+    def __init__(self, peakRate: float, meanOnTime: float,
+            meanOffTime: float, **kwargs):
+        """ Bursty on/off traffic.
+
+        The source alternates between exponentially distributed on and off
+            periods, starting with an on period. While on, it sends packets
+            at a constant `peakRate`; while off, it sends nothing.
+
+        ARGS:
+        - peakRate: Packets per second sent during an on period.
+        - meanOnTime: Mean length of the on periods (seconds).
+        - meanOffTime: Mean length of the off periods (seconds).
+        - kwargs: See `TrafficGenerator`.
+        """
+        if peakRate <= 0 or meanOnTime <= 0 or meanOffTime < 0:
+            raise Exception("On/off traffic needs a positive peak rate and "
+                    "on time, and a non-negative off time")
+        super().__init__(**kwargs)
+        self.__peakRate = peakRate
+        self.__meanOnTime = meanOnTime
+        self.__meanOffTime = meanOffTime
+
+    def get_peak_rate(self):
+        return self.__peakRate
+
+    def get_mean_rate(self):
+        """ The long run average number of packets per second. """
+        return self.__peakRate*self.__meanOnTime/(self.__meanOnTime +
+                self.__meanOffTime)
+
+    def reset(self):
+        # Time the next packet would be sent and the end of the on period it
+        # falls in (None until the first period is drawn)
+        self.__nextTime: Optional[float] = None
+        self.__onEnd = 0.0
+
+    def generate_times(self, rng: np.random.Generator,
+            packetSizes: np.ndarray, lastTime: float):
+        interval = 1/self.__peakRate
+        if self.__nextTime is None:
+            self.__nextTime = lastTime
+            self.__onEnd = lastTime + rng.exponential(self.__meanOnTime)
+
+        times = np.empty(len(packetSizes))
+        count = 0
+        while count < len(times):
+            # Packets that still fit in the current on period
+            numFit = int(np.ceil((self.__onEnd - self.__nextTime)/interval))
+            if numFit <= 0:
+                offTime = rng.exponential(self.__meanOffTime) \
+                        if self.__meanOffTime > 0 else 0.0
+                self.__nextTime = self.__onEnd + offTime
+                self.__onEnd = self.__nextTime + \
+                        rng.exponential(self.__meanOnTime)
+                continue
+
+            numPackets = min(numFit, len(times) - count)
+            times[count:count + numPackets] = self.__nextTime + \
+                    interval*np.arange(0, numPackets)
+            self.__nextTime += interval*numPackets
+            count += numPackets
+
+        return times
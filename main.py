@@ -1,5 +1,8 @@
 # Standard Libs
+import argparse
+
 from typing import List
+from typing import Optional
 
 # Local libs
 from NetworkComponents import Link
@@ -8,20 +11,43 @@ from NetworkComponents import Packet
 
 from NetworkPathComputer import NetworkPathComputer
 
+from NetworkBatchSolver import NetworkBatchSolver
+
+from NetworkBottleneckAnalyzer import BottleneckAnalyzer
+
+from NetworkEventSimulator import EventSimulator
+from NetworkEventSimulator import Flow
+
+from NetworkTopology import Topology
+
+from NetworkRouter import Router
+
+from NetworkSweep import ParameterSweep
+
+import NetworkTracing
+
 from NetworkHelpers import __DEBUG_ENABLED__
-from NetworkTimeblockVisualiser import PacketTimeBlocksIndex, TimeblockVisualiser
+from NetworkTimeblockVisualiser import TimeblockVisualiser
+
+from NetworkTimeBlockRecorder import TimeBlockRecorder
 
 # * MAIN CLASSES ---------------------------------------------------------------
 
 class GlobalNetwork(object):
     def __init__(self):
         # Links
-        self.__L1 = Link(transmissionRate=100e6, length=240, propSpeed=2e8)
-        self.__L2 = Link(transmissionRate=100e3, length=42000e3, propSpeed=3e8)
-        self.__L3 = Link(transmissionRate=100e6, length=60, propSpeed=3e8)
-        self.__L4 = Link(transmissionRate=500e6, length=3300e3, propSpeed=3e8)
-        self.__L5 = Link(transmissionRate=200e6, length=500, propSpeed=2e8)
-        self.__L6 = Link(transmissionRate=50e6, length=60, propSpeed=2e8)
+        self.__L1 = Link(transmissionRate=100e6, length=240, propSpeed=2e8,
+                name="L1")
+        self.__L2 = Link(transmissionRate=100e3, length=42000e3, propSpeed=3e8,
+                name="L2")
+        self.__L3 = Link(transmissionRate=100e6, length=60, propSpeed=3e8,
+                name="L3")
+        self.__L4 = Link(transmissionRate=500e6, length=3300e3, propSpeed=3e8,
+                name="L4")
+        self.__L5 = Link(transmissionRate=200e6, length=500, propSpeed=2e8,
+                name="L5")
+        self.__L6 = Link(transmissionRate=50e6, length=60, propSpeed=2e8,
+                name="L6")
 
         # Nodes
         self.__C = Node(processingDelay=0, name="C", links=[self.__L1])
@@ -37,10 +63,21 @@ class GlobalNetwork(object):
                 links=[self.__L4, self.__L5])
         self.__S4 = Node(processingDelay=0.25e-3, name="S4",
                 links=[self.__L3, self.__L6])
+
+        # Index of which links connect which nodes
+        self.__topology = Topology([self.__C, self.__D1, self.__S, self.__S1,
+                self.__S2, self.__S3, self.__S4])
+
+        # Minimum latency routes over the topology
+        self.__router = Router(self.__topology)
     
     # ? PUBLIC METHODS ---------------------------------------------------------
 
-    def queueing_example(self):
+    def get_topology(self):
+        return self.__topology
+
+    def queueing_example(self, plot: bool = True,
+            outputPath: Optional[str] = None):
         """ In event 6, how long does it take for C to receive:
         
         - the FIRST HTTP packet
@@ -50,6 +87,11 @@ class GlobalNetwork(object):
         CONTEXT:
         - Event 6: Server S sends the web page to to client C, segmented into
             7 packets, which includes the HTTP response plus the HTML file.
+
+        ARGS:
+        - plot: Whether to plot the time blocks (matplotlib is only imported
+                if this is True).
+        - outputPath: Save the plot to this file rather than showing it.
         """
         # Clear the queues before we begin
         self.__clear_queues()
@@ -65,11 +107,13 @@ class GlobalNetwork(object):
         
         previousBlocksSteps = []
 
-        # List to gather all the timeblocks, used for visualising the route
-        tbv = TimeblockVisualiser(nodesList=path)
+        # Gathers all the timeblocks, used for visualising the route
+        recorder = TimeBlockRecorder()
+
+        # End-to-end delay of each packet, as it's taken off C's queue
+        delays: List[float] = []
         counter = 0
         while len(self.__S.get_packets()) > 0:
-            currentPacketTimeBlockIndex = PacketTimeBlocksIndex(counter)
             t0 = 0
             if __DEBUG_ENABLED__:
                 print("\n--------- Packet {} ---------".format(counter))
@@ -93,11 +137,11 @@ class GlobalNetwork(object):
                             currentNode=currentNode,
                             nextNode=nextNode, 
                             previousBlocksList=previousBlocks,
-                            t0=t0)
+                            t0=t0,
+                            topology=self.__topology)
 
                     # Save the time block 
-                    currentPacketTimeBlockIndex.add_node_pair_time_blocks_list(
-                            currentNode.get_name(), blocks)
+                    recorder.record_blocks(counter, i, blocks)
 
                     # Compute the new starting point
                     t0 = blocks[-1].get_stop_time()
@@ -108,21 +152,114 @@ class GlobalNetwork(object):
                     
                 else:
                     continue
+
+            # Take the delivered packet off C's queue, so C doesn't hold on
+            # to every packet of the train
+            delays.append(self.__C.get_next_packet().get_delay())
+            if NetworkTracing.TRACER is not None:
+                NetworkTracing.TRACER.on_packet_delivered(counter, t0)
             counter += 1
-            tbv.add_packet_blocks_index_to_record(currentPacketTimeBlockIndex)
         
         # Print out the total delay (rounded to 3 decimal places)
-        counter = 0
+        print("\nQuestion 8 Results " + "-" * \
+                (80 - len("Question 8 Results ")) + '\n')
+        for counter, delay in enumerate(delays):
+            print("Packet {}: {}ms".format(counter, round(delay*1000,3)))
+
+        # Plot the result
+        if plot:
+            tbv = TimeblockVisualiser(nodesList=path, recorder=recorder)
+            tbv.visualise_timeblock(outputPath=outputPath)
+
+
+    def batch_queueing_example(self, numPackets: int = 7):
+        """ Same question as `queueing_example`, but solved for the whole
+                packet train at once using the `NetworkBatchSolver`.
+
+        ARGS:
+        - numPackets: The number of 1000 byte packets sent from S to C.
+        """
+        path = self.__router.get_path(source=self.__S, destination=self.__C,
+                packetSize=1000*8)
+
+        result = NetworkBatchSolver.solve_path(path=path,
+                packetSizes=[1000*8]*numPackets, topology=self.__topology)
 
         print("\nQuestion 8 Results " + "-" * \
                 (80 - len("Question 8 Results ")) + '\n')
-        for packet in self.__C.get_packets():
-            print("Packet {}: {}ms".format(counter, round(packet.get_delay()*1000,3)))
+        counter = 0
+        for delay in result.get_end_to_end_delays():
+            print("Packet {}: {}ms".format(counter, round(delay*1000,3)))
             counter += 1
 
-        # Plot the result
-        tbv.visualise_timeblock()
+    def analytic_queueing_example(self, numPackets: int = 7):
+        """ Same question as `queueing_example`, but answered in closed form
+                from the path's bottleneck (see `BottleneckAnalyzer`).
+
+        ARGS:
+        - numPackets: The number of 1000 byte packets sent from S to C.
+        """
+        path = self.__router.get_path(source=self.__S, destination=self.__C,
+                packetSize=1000*8)
+
+        analyzer = BottleneckAnalyzer(path=path, packetSizes=1000*8,
+                topology=self.__topology, numPackets=numPackets)
+
+        print("\nQuestion 8 Results " + "-" * \
+                (80 - len("Question 8 Results ")) + '\n')
+        print("Bottleneck: {} ({}ms per packet)".format(
+                analyzer.get_bottleneck_node().get_name(),
+                round(analyzer.get_spacing()*1000,3)))
+        for counter in range(0, numPackets):
+            print("Packet {}: {}ms".format(counter,
+                    round(analyzer.get_end_to_end_delay(counter)*1000,3)))
+
+    def contention_example(self, numPackets: int = 7):
+        """ S sends a web page to C while D1 sends the same amount of data to
+                C, so both flows contend for `L2` at S2.
+
+        ARGS:
+        - numPackets: The number of 1000 byte packets in each flow.
+        """
+        sim = EventSimulator(self.__topology)
+        sim.add_flow(Flow(name="S->C",
+                path=[self.__S, self.__S4, self.__S2, self.__S1, self.__C],
+                packetSizes=[1000*8]*numPackets))
+        sim.add_flow(Flow(name="D1->C",
+                path=[self.__D1, self.__S3, self.__S2, self.__S1, self.__C],
+                packetSizes=[1000*8]*numPackets))
+        result = sim.run()
 
+        print("\nContention Results " + "-" * \
+                (80 - len("Contention Results ")) + '\n')
+        for flowName in result.get_flow_names():
+            counter = 0
+            for delay in result.get_end_to_end_delays(flowName):
+                print("{} packet {}: {}ms".format(flowName, counter,
+                        round(delay*1000,3)))
+                counter += 1
+
+    def sweep_example(self, numPackets: int = 7):
+        """ What if L2 were faster, and S2 slower at processing packets?
+
+        ARGS:
+        - numPackets: The number of 1000 byte packets sent from S to C.
+        """
+        sweep = ParameterSweep(
+                description=self.__topology.to_description(),
+                pathNames=["S", "S4", "S2", "S1", "C"],
+                packetSizes=[1000*8]*numPackets)
+        sweep.add_parameter("L2.transmissionRate", [100e3, 1e6, 10e6])
+        sweep.add_parameter("S2.processingDelay", [1e-3, 2e-3, 4e-3])
+        result = sweep.run()
+
+        print("\nSweep Results " + "-" * \
+                (80 - len("Sweep Results ")) + '\n')
+        for row in result.get_rows():
+            print("L2 rate: {}bps, S2 processing: {}ms, last packet: "
+                    "{}ms".format(row["L2.transmissionRate"],
+                            row["S2.processingDelay"]*1000,
+                            round(row["lastDelivery"]*1000,3)))
 
     # ? PRIVATE METHODS --------------------------------------------------------
 
@@ -135,5 +272,14 @@ class GlobalNetwork(object):
         self.__D1.clear_queue()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description="Computes the delays of the queueing example.")
+    parser.add_argument("--no-plot", action="store_true",
+            help="Only compute the delays (matplotlib is never imported).")
+    parser.add_argument("--output", default=None,
+            help="Render the plot off screen to this file (.png, .svg, .pdf)"
+                    " instead of showing it.")
+    args = parser.parse_args()
+
     gn = GlobalNetwork()
-    gn.queueing_example()
\ No newline at end of file
+    gn.queueing_example(plot=not args.no_plot, outputPath=args.output)
\ No newline at end of file